@@ -0,0 +1,114 @@
+# action_log.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Записи: create - начальное состояние целиком, update и scores - только
+# переданные поля верхнего уровня, которые заменяют прежние значения
+# (поля из removed записи update удаляются), undo - состояние целиком
+# после отмены последнего действия
+ACTION_TYPES = ("create", "update", "scores", "undo")
+
+
+def make_action(seq: int, action: str, round: Optional[int], delta: Dict[str, Any],
+                at: Optional[str] = None, removed: Optional[List[str]] = None) -> Dict[str, Any]:
+    record = {
+        "seq": seq,
+        "type": action,
+        "round": round,
+        "at": at or datetime.now().isoformat(timespec="milliseconds"),
+        "delta": delta,
+    }
+    if removed:
+        record["removed"] = removed
+    return record
+
+
+def apply_action(state: Dict[str, Any], record: Dict[str, Any]) -> None:
+    if record["type"] in ("create", "undo"):
+        state.clear()
+    state.update(record["delta"])
+    for key in record.get("removed", ()):
+        state.pop(key, None)
+
+
+class ActionLog:
+    """Журнал действий одной игры, из которого восстанавливается ее состояние.
+
+    Номера записей идут подряд с 1. Значения в записях не изменяются после
+    добавления, поэтому состояния разделяют их без копирования: контрольная
+    точка - это поверхностная копия словаря состояния. Точки создаются при
+    первом восстановлении через каждые checkpoint_every записей, и следующее
+    чтение того же или более позднего момента применяет не больше
+    checkpoint_every записей.
+    """
+
+    def __init__(self, checkpoint_every: int = 32):
+        self.checkpoint_every = checkpoint_every
+        self.records: List[Dict[str, Any]] = []
+        # Число примененных записей -> состояние после них
+        self._checkpoints: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+
+    def after(self, seq: int = 0) -> List[Dict[str, Any]]:
+        return self.records[max(seq, 0):]
+
+    def truncate(self, count: int) -> None:
+        """Оставляет первые count записей, например при откате к снимку."""
+        del self.records[count:]
+        for point in [point for point in self._checkpoints if point > count]:
+            del self._checkpoints[point]
+
+    def undo_point(self) -> Optional[int]:
+        """Число записей, состояние после которых возвращает отмена последнего
+        действия, или None, если отменять нечего.
+
+        Запись undo отменяет последнее еще не отмененное действие, поэтому
+        повторные отмены уходят дальше назад. Создание состояния не отменяется.
+        """
+        done: List[int] = []
+        for record in self.records:
+            if record["type"] == "create":
+                done = [record["seq"]]
+            elif record["type"] == "undo":
+                done.pop()
+            else:
+                done.append(record["seq"])
+        if len(done) < 2:
+            return None
+        # Состояние перед последним действием - после предыдущей записи
+        return done[-1] - 1
+
+    def count_for_round(self, round: int) -> int:
+        """Число записей до перехода игры в раунд, следующий за round."""
+        count = 0
+        for record in self.records:
+            if (record["round"] or 0) > round:
+                break
+            count += 1
+        return count
+
+    def state_at(self, seq: Optional[int] = None, round: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Состояние после записи seq или на конец раунда round; без параметров - текущее."""
+        count = len(self.records)
+        if seq is not None:
+            count = min(count, seq)
+        if round is not None:
+            count = min(count, self.count_for_round(round))
+        if count <= 0:
+            return None
+
+        step = self.checkpoint_every
+        start = count // step * step
+        while start and start not in self._checkpoints:
+            start -= step
+        state = dict(self._checkpoints[start]) if start else {}
+        for index in range(start, count):
+            apply_action(state, self.records[index])
+            if (index + 1) % step == 0 and index + 1 not in self._checkpoints:
+                self._checkpoints[index + 1] = dict(state)
+        return state
@@ -1,15 +1,160 @@
 # app.py
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, FastAPI, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 import uvicorn
+import asyncio
 import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from functools import partial, wraps
+from itertools import islice
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
+import logging
 import mock_data
+from fixtures import LazyGameStates, SyntheticTournament, parse_size
+from log_config import setup_logging, shutdown_logging
+from store import EntityStore, GameStateStore
+from persistence import FileJournal, NullJournal, replay
+from sqlite_store import ConnectionPool, SqliteEntityStore, SqliteGameStateStore
+from realtime import Hub, Subscription
+from changefeed import NullChangeFeed, SqliteChangeFeed
+from locks import KeyedLocks
+from archive import KINDS, ArchiveError, export_records, import_record, parse_record
+from patch import PatchConflict, PatchError, apply_json_patch, apply_merge_patch, changed_fields
+from leaderboard import CITY_ROLES, FINISHED_WITH_SCORES, MAFIA_ROLES, RATED_CATEGORIES, Leaderboards
+from response_cache import ResponseCache
+from fast_json import FastJSONResponse, dumps as encode_json
+from negotiation import JSON, VARY, NegotiationMiddleware, negotiated, negotiated_etag, represent
+from metrics import SIZE_BUCKETS, Counter, Gauge, Histogram, MetricsMiddleware, Registry, TimedStore
 
-app = FastAPI(title="Mafia Game Helper API", description="Заглушка API для приложения Mafia Game Helper")
+logger = setup_logging()
+
+# Режим хранения: "memory" (по умолчанию) или "sqlite"
+STORAGE = os.environ.get("MAFIA_STORAGE", "memory")
+# Каталог для журнала и снимков; без него данные в памяти теряются при перезапуске
+DATA_DIR = os.environ.get("MAFIA_DATA_DIR")
+SQLITE_PATH = os.environ.get("MAFIA_SQLITE_PATH", "mafia.db")
+# Синтетический турнир вместо тестовых данных: "мероприятия x столы x игры", например 1000x10x8
+SYNTHETIC = os.environ.get("MAFIA_SYNTHETIC")
+SEED = int(os.environ.get("MAFIA_SEED", "1"))
+# Число процессов сервера при запуске через python app.py; больше одного - только с SQLite
+WORKERS = int(os.environ.get("MAFIA_WORKERS", "1"))
+# Ответы короче этого размера (байт) не сжимаются
+COMPRESS_MIN_SIZE = int(os.environ.get("MAFIA_COMPRESS_MIN_SIZE", "1024"))
+# Как часто процесс читает изменения других процессов, секунды
+CHANGE_POLL_INTERVAL = float(os.environ.get("MAFIA_CHANGE_POLL_INTERVAL", "0.05"))
+
+def open_journal():
+    if not DATA_DIR:
+        return NullJournal()
+    return FileJournal(
+        DATA_DIR,
+        fsync_every=int(os.environ.get("MAFIA_FSYNC_EVERY", "32")),
+        fsync_interval=float(os.environ.get("MAFIA_FSYNC_INTERVAL", "0.5")),
+        compact_every=int(os.environ.get("MAFIA_COMPACT_EVERY", "10000")),
+    )
+
+def fixture_data():
+    """Стартовые данные: мероприятия и gameId -> состояние игры."""
+    if not SYNTHETIC:
+        return mock_data.events, {state["gameId"]: state for state in mock_data.game_states}
+    # Состояния синтетического турнира строятся по одному при чтении
+    tournament = SyntheticTournament(*parse_size(SYNTHETIC), seed=SEED)
+    return tournament.events(), tournament.game_states()
+
+def open_memory_stores():
+    # Загружаем последний снимок и хвост журнала, либо тестовые данные
+    journal = open_journal()
+    snapshot, records = journal.load()
+    if snapshot:
+        store = EntityStore(snapshot["events"])
+        # Незагруженные состояния синтетического турнира в снимок не попадают,
+        # вместо них записаны параметры турнира и список таких игр
+        states = SyntheticTournament(*snapshot["synthetic"]).game_states() if "synthetic" in snapshot else None
+        game_states = GameStateStore(snapshot.get("game_states", []), lazy=states, pending=snapshot.get("pending"),
+                                     actions=snapshot.get("actions"))
+    else:
+        events, states = fixture_data()
+        store = EntityStore(events)
+        game_states = GameStateStore([], lazy=states)
+    replay(records, {"events": store, "game_states": game_states})
+
+    def take_snapshot() -> Dict[str, Any]:
+        # Состояния игр восстанавливаются по журналам действий
+        if not isinstance(states, LazyGameStates):
+            return {"events": store.list_events(), "actions": game_states.action_logs()}
+        return {"events": store.list_events(), "actions": game_states.action_logs(load=False),
+                "synthetic": states.tournament.params(), "pending": game_states.pending_ids()}
+
+    store.journal = journal
+    game_states.journal = journal
+    journal.snapshot_provider = take_snapshot
+    if snapshot is None and DATA_DIR:
+        # Фиксируем стартовые данные, чтобы перезапуск не зависел от MAFIA_SYNTHETIC
+        # и MAFIA_SEED; синтетический турнир записывается параметрами, его
+        # состояния по-прежнему строит генератор
+        journal.compact(journal.snapshot_provider())
+    return store, game_states, NullChangeFeed(), journal.close
+
+def open_sqlite_stores():
+    pool = ConnectionPool(SQLITE_PATH, size=int(os.environ.get("MAFIA_SQLITE_POOL_SIZE", "4")))
+    store = SqliteEntityStore(pool)
+    game_states = SqliteGameStateStore(pool)
+    # Процессы стартуют одновременно: проверка и заполнение идут под блокировкой записи
+    with pool.connection(immediate=True):
+        if store.is_empty():
+            # Новая база заполняется тестовыми данными
+            events, states = fixture_data()
+            for event in events:
+                store.add_event(event)
+            for game_id, game_state in states.items():
+                game_states.create(game_id, game_state)
+    return store, game_states, SqliteChangeFeed(pool), pool.close
+
+if STORAGE == "sqlite":
+    store, game_states, change_feed, close_storage = open_sqlite_stores()
+else:
+    store, game_states, change_feed, close_storage = open_memory_stores()
+
+# Метрики в формате Prometheus (GET /metrics)
+metrics = Registry()
+http_requests = metrics.register(Counter(
+    "mafia_http_requests_total", "Число HTTP-запросов", ("method", "route", "status")))
+http_latency = metrics.register(Histogram(
+    "mafia_http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route")))
+http_response_size = metrics.register(Histogram(
+    "mafia_http_response_size_bytes", "Размер тела ответа", ("method", "route"), buckets=SIZE_BUCKETS))
+store_latency = metrics.register(Histogram(
+    "mafia_store_operation_duration_seconds", "Время операции хранилища", ("store", "operation")))
+
+store = TimedStore(store, "entities", store_latency)
+game_states = TimedStore(game_states, "game_states", store_latency)
+
+async def follow_changes() -> None:
+    # Изменения других процессов читаются в пуле потоков: запросы к SQLite блокирующие
+    while True:
+        await asyncio.sleep(CHANGE_POLL_INTERVAL)
+        try:
+            await asyncio.to_thread(apply_remote_changes)
+        except Exception:
+            logger.exception("Не удалось применить изменения других процессов")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    follower = asyncio.create_task(follow_changes()) if change_feed.enabled else None
+    yield
+    if follower is not None:
+        follower.cancel()
+    close_storage()
+    shutdown_logging()
+
+app = FastAPI(title="Mafia Game Helper API", description="Заглушка API для приложения Mafia Game Helper",
+              lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Настройка CORS
 app.add_middleware(
@@ -18,13 +163,131 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(NegotiationMiddleware, min_size=COMPRESS_MIN_SIZE)
+app.add_middleware(MetricsMiddleware, requests=http_requests, latency=http_latency, sizes=http_response_size)
 
-# Загружаем тестовые данные
-events = mock_data.events
-game_states = mock_data.game_states
 judges = mock_data.judges
 
+_id_lock = threading.Lock()
+_last_id = 0
+
+def new_id() -> int:
+    """ID нового объекта из текущего времени в миллисекундах.
+
+    Объекты, созданные в одну миллисекунду (например, пакетом), получают
+    следующие по порядку номера.
+    """
+    global _last_id
+    with _id_lock:
+        _last_id = max(int(datetime.now().timestamp() * 1000), _last_id + 1)
+        return _last_id
+
+# Подписки клиентов на изменения игр и мероприятий
+hub = Hub(max_queue=int(os.environ.get("MAFIA_STREAM_QUEUE", "100")))
+
+# Сериализованные ответы GET по ключу ресурса и версии
+response_cache = ResponseCache(max_entries=int(os.environ.get("MAFIA_RESPONSE_CACHE_SIZE", "1024")))
+
+# Подключенные клиенты потоков изменений по типу соединения
+stream_clients = {"websocket": 0, "sse": 0}
+
+def collect_entity_counts():
+    counts = store.counts()
+    counts["game_states"] = len(game_states)
+    return [((kind,), count) for kind, count in counts.items()]
+
+def collect_cache_stats():
+    stats = response_cache.stats()
+    return [((name,), stats[name]) for name in ("entries", "hits", "misses", "evictions", "invalidations")]
+
+metrics.register(Gauge("mafia_stream_clients", "Подключенные клиенты WebSocket и SSE", ("transport",),
+                       lambda: [((transport,), count) for transport, count in stream_clients.items()]))
+metrics.register(Gauge("mafia_store_entities", "Число объектов в хранилище", ("kind",), collect_entity_counts))
+metrics.register(Gauge("mafia_response_cache", "Состояние кеша ответов", ("stat",), collect_cache_stats))
+
+# Изменения данных выполняются под замками своих игр и мероприятий
+entity_locks = KeyedLocks()
+# Хранилище в памяти без журнала на диске не блокирует поток, его операции
+# выполняются прямо в цикле событий; запросы к SQLite и запись журнала - в пуле потоков
+STORE_BLOCKS = STORAGE == "sqlite" or bool(DATA_DIR)
+# Ключи замков разделяют только разные игры и мероприятия, а версии, общие
+# списки и порядок записей журнала у хранилища в памяти общие. Поэтому в пуле
+# потоков его изменения вместе с записью журнала идут по одному
+memory_lock = threading.Lock()
+
+def _locked(func, *args, **kwargs):
+    with memory_lock:
+        return func(*args, **kwargs)
+
+async def run_store(func, *args, **kwargs):
+    """Выполняет изменение хранилища в цикле событий или в пуле потоков."""
+    if not STORE_BLOCKS:
+        return func(*args, **kwargs)
+    if STORAGE == "sqlite":
+        return await asyncio.to_thread(partial(func, *args, **kwargs))
+    return await asyncio.to_thread(partial(_locked, func, *args, **kwargs))
+
+def serialized(lock_keys):
+    """Делает обработчик изменения асинхронным и выполняет его под замками.
+
+    lock_keys получает аргументы обработчика и возвращает ключи замков.
+    Изменения одной игры идут по очереди, изменения разных игр и столов -
+    независимо друг от друга. Ключам может понадобиться чтение хранилища,
+    поэтому с SQLite они вычисляются в пуле потоков.
+    """
+    def decorate(func):
+        @wraps(func)
+        async def handler(**kwargs):
+            if STORAGE == "sqlite":
+                keys = await asyncio.to_thread(partial(lock_keys, **kwargs))
+            else:
+                keys = lock_keys(**kwargs)
+            async with entity_locks.hold(*keys):
+                return await run_store(func, **kwargs)
+        return handler
+    return decorate
+
+def reads_store(func):
+    """Делает обработчик чтения асинхронным и выполняет его там же, где изменения.
+
+    Хранилище в памяти без журнала изменяется в цикле событий, поэтому и
+    читается в нем, а с журналом на диске чтение берет memory_lock: иначе
+    обработчик из пула потоков обходил бы индексы и загружал состояния игр
+    одновременно с изменением. SQLite читается в пуле потоков, как и раньше.
+    """
+    @wraps(func)
+    async def handler(**kwargs):
+        return await run_store(func, **kwargs)
+    return handler
+
+def events_lock(**kwargs) -> List[str]:
+    return ["events"]
+
+def event_lock(event_id: int, **kwargs) -> List[str]:
+    return [f"event:{event_id}"]
+
+def game_lock(game_id: int, **kwargs) -> List[str]:
+    return [f"game:{game_id}"]
+
+def setup_lock(event_id: int, setup: "EventSetup", **kwargs) -> List[str]:
+    game_ids = [game.id for table in setup.tables for game in table.games if game.id is not None]
+    return [f"event:{event_id}"] + [f"game:{game_id}" for game_id in game_ids]
+
+def event_games_lock(event_id: int, table_id: Optional[int] = None, game_id: Optional[int] = None,
+                     **kwargs) -> List[str]:
+    # Удаление мероприятия или стола не должно идти параллельно с изменением его игр
+    if game_id is not None:
+        game_ids = [game_id]
+    elif table_id is not None:
+        table = store.get_table(event_id, table_id)
+        game_ids = [game["id"] for game in table.get("games", [])] if table else []
+    else:
+        event = store.get_event(event_id)
+        game_ids = [game["id"] for table in (event or {}).get("tables", []) for game in table.get("games", [])]
+    return [f"event:{event_id}"] + [f"game:{gid}" for gid in game_ids]
+
 # Добавим новые классы для перечислений
 class EventStatus(str, Enum):
     PLANNED = "planned"
@@ -80,26 +343,187 @@ class GameUpdate(BaseModel):
     gameSubstatus: Optional[GameSubstatus] = None
     isCriticalRound: Optional[bool] = None
 
+# Пакетная настройка турнира
+
+PLAYER_ROLES = CITY_ROLES + MAFIA_ROLES
+
+class Seat(BaseModel):
+    id: int = Field(ge=1, le=10)  # номер места за столом
+    name: str = Field(min_length=1)
+    role: Optional[str] = None
+
+class GameSetup(BaseModel):
+    # Прочие поля сохраняются в карточке игры как есть
+    model_config = ConfigDict(extra="allow")
+    
+    id: Optional[int] = None  # указан - игра уже есть и обновляется
+    seating: Optional[List[Seat]] = None
+    state: Optional[Dict[str, Any]] = None  # дополнительные поля начального состояния
+
+class TableSetup(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    
+    id: Optional[int] = None
+    games: List[GameSetup] = []
+
+class EventSetup(BaseModel):
+    tables: List[TableSetup]
+
+class LeaderboardSort(str, Enum):
+    TOTAL = "total"
+    AVERAGE = "average"
+    RATING = "rating"
+
+# Версии и условные запросы (ETag, If-None-Match, If-Match)
+
+def make_etag(kind: str, entity_id: Optional[int], version: int) -> str:
+    return f'"{kind}-{entity_id}-{version}"' if entity_id is not None else f'"{kind}-{version}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Сравнение слабое: префикс W/ не учитывается
+    tags = [tag.strip() for tag in header.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def not_modified(response: Response, etag: str, if_none_match: Optional[str]) -> Optional[Response]:
+    """Ставит ETag в ответ; если у клиента та же версия, возвращает ответ 304."""
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": negotiated_etag(etag)})
+    response.headers["ETag"] = negotiated_etag(etag)
+    return None
+
+def check_precondition(if_match: Optional[str], etag: Optional[str]) -> None:
+    # etag = None означает, что ресурса еще нет
+    if if_match and (etag is None or not etag_matches(if_match, etag)):
+        raise HTTPException(status_code=412, detail="Версия ресурса изменилась")
+
+def event_etag(event_id: int) -> str:
+    return make_etag("event", event_id, store.version("event", event_id))
+
+def table_etag(table_id: int) -> str:
+    return make_etag("table", table_id, store.version("table", table_id))
+
+def game_etag(game_id: int) -> str:
+    return make_etag("game", game_id, store.version("game", game_id))
+
+def state_etag(game_id: int) -> str:
+    return make_etag("state", game_id, game_states.version(game_id))
+
+def json_response(data: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """Ответ без обхода данных jsonable_encoder.
+
+    Данные хранилищ уже состоят из типов JSON, поэтому их можно сразу
+    кодировать. Заголовки, выставленные через параметр response, переносятся.
+    Код ответа маршрута (status_code в декораторе) к готовому ответу не
+    применяется, поэтому маршруты с кодом 201 передают его сюда.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(data, status_code=status_code, headers=headers)
+
+def cached_json(key: tuple, etag: str, if_none_match: Optional[str], build) -> Response:
+    """Ответ из кеша сериализованных ответов; build вызывается только при промахе.
+
+    Ключ - путь ресурса, версия - его ETag. build должен сам выбрасывать 404.
+    """
+    body = response_cache.get(key, etag)
+    headers = {"ETag": negotiated_etag(etag), "Vary": VARY}
+    if if_none_match and etag_matches(if_none_match, etag):
+        if body is None:
+            # Версия известна без сериализации; build только проверяет, что ресурс есть
+            build()
+        return Response(status_code=304, headers=headers)
+    if body is None:
+        body = response_cache.put(key, etag, build())
+    
+    # Сжатый ответ и MessagePack строятся один раз на версию и тоже хранятся в кеше
+    media, encoding = negotiated.get()
+    applied = None
+    if (media, encoding) != (JSON, None):
+        body, applied = response_cache.variant(key, etag, (media, encoding),
+                                               lambda: represent(body, media, encoding, COMPRESS_MIN_SIZE))
+    if applied:
+        headers["Content-Encoding"] = applied
+    return Response(content=body, media_type=media, headers=headers)
+
 @app.get("/")
 def read_root():
     return {"message": "Mafia Game Helper API - Заглушка работает!"}
 
+def project_event(event: Dict[str, Any], fields: Optional[List[str]], include: List[str]) -> Dict[str, Any]:
+    """Оставляет в мероприятии выбранные поля и уровни вложенности."""
+    if fields:
+        result = {key: event[key] for key in ["id", *fields] if key in event and key != "tables"}
+    else:
+        result = {key: value for key, value in event.items() if key != "tables"}
+    
+    if "games" in include:
+        result["tables"] = event.get("tables", [])
+    elif "tables" in include:
+        result["tables"] = [{key: value for key, value in table.items() if key != "games"}
+                            for table in event.get("tables", [])]
+    return result
+
 # Получить все мероприятия
+def event_filters(status: Optional[EventStatus], category: Optional[EventCategory],
+                  language: Optional[str]) -> Dict[str, Any]:
+    return {name: value.value if isinstance(value, Enum) else value
+            for name, value in (("status", status), ("category", category), ("language", language))
+            if value is not None}
+
 @app.get("/api/events")
-def get_events():
-    return events
+@reads_store
+def get_events(response: Response,
+               status: Optional[EventStatus] = None,
+               category: Optional[EventCategory] = None,
+               language: Optional[str] = None,
+               date_from: Optional[str] = Query(None, alias="dateFrom"),
+               date_to: Optional[str] = Query(None, alias="dateTo"),
+               cursor: Optional[int] = None,
+               limit: Optional[int] = Query(None, ge=1, le=1000),
+               fields: Optional[str] = None,
+               include: Optional[str] = None,
+               if_none_match: Optional[str] = Header(None)):
+    etag = make_etag("events", None, store.version("events"))
+    cached = not_modified(response, etag, if_none_match)
+    if cached:
+        return cached
+    
+    filters = event_filters(status, category, language)
+    
+    # Без параметров отдаем полный список, как раньше
+    if not filters and not any(p is not None for p in (date_from, date_to, cursor, limit, fields, include)):
+        return cached_json(("events",), etag, None, store.list_events)
+    
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    include_list = [i.strip() for i in include.split(",") if i.strip()] if include else []
+    projected = fields is not None or include is not None
+    with_tables = not projected or "tables" in include_list or "games" in include_list
+    
+    events, next_cursor = store.query_events(filters, date_from, date_to, cursor, limit, with_tables=with_tables)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    
+    if not projected:
+        return json_response(events, response)
+    return json_response([project_event(event, field_list, include_list) for event in events], response)
 
 # Получить мероприятие по ID
 @app.get("/api/events/{event_id}")
-def get_event(event_id: int):
-    event = next((e for e in events if e["id"] == event_id), None)
-    if not event:
-        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
-    return event
+@reads_store
+def get_event(event_id: int, if_none_match: Optional[str] = Header(None)):
+    def build():
+        event = store.get_event(event_id)
+        if not event:
+            raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+        return event
+    
+    return cached_json((event_id,), event_etag(event_id), if_none_match, build)
 
 # Создать новое мероприятие
 @app.post("/api/events", status_code=201)
-def create_event(event_data: Dict[str, Any]):
+@serialized(events_lock)
+def create_event(event_data: Dict[str, Any], response: Response):
     if "category" in event_data and event_data["category"] not in [cat.value for cat in EventCategory]:
         raise HTTPException(status_code=400, detail=f"Неверная категория. Допустимые значения: {[cat.value for cat in EventCategory]}")
     
@@ -113,143 +537,153 @@ def create_event(event_data: Dict[str, Any]):
         event_data["category"] = EventCategory.FUNKY.value
         
     new_event = {
-        "id": int(datetime.now().timestamp() * 1000),
+        "id": new_id(),
         **event_data,
         "tables": []
     }
-    events.append(new_event)
-    return new_event
+    store.add_event(new_event)
+    response.headers["ETag"] = event_etag(new_event["id"])
+    return json_response(new_event, response, 201)
 
 # Обновить мероприятие
 @app.put("/api/events/{event_id}")
-def update_event(event_id: int, event_data: Dict[str, Any]):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
-        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+@serialized(event_lock)
+def update_event(event_id: int, event_data: Dict[str, Any], response: Response,
+                 if_match: Optional[str] = Header(None)):
+    if if_match:
+        exists = store.get_event(event_id) is not None
+        check_precondition(if_match, event_etag(event_id) if exists else None)
     
-    events[event_index].update({
-        **event_data,
-        "id": event_id
-    })
-    
-    if "tables" not in event_data:
-        events[event_index]["tables"] = events[event_index].get("tables", [])
-        
-    return events[event_index]
+    event = store.update_event(event_id, event_data)
+    if not event:
+        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+    if "tables" in event_data:
+        # Замененные столы и игры могут вернуться с теми же ID
+        response_cache.invalidate(event_id)
+    if "category" in event_data:
+        rerate_event(event)
+    if "tables" in event_data or "category" in event_data:
+        change_feed.append([], {"type": "event", "eventId": event_id, "fields": list(event_data)})
+    response.headers["ETag"] = event_etag(event_id)
+    return json_response(event, response)
 
 # Получить столы для мероприятия
 @app.get("/api/events/{event_id}/tables")
-def get_tables(event_id: int):
-    event = next((e for e in events if e["id"] == event_id), None)
-    if not event:
-        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
-    return event.get("tables", [])
+@reads_store
+def get_tables(event_id: int, if_none_match: Optional[str] = Header(None)):
+    def build():
+        event = store.get_event(event_id)
+        if not event:
+            raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+        return event.get("tables", [])
+    
+    return cached_json((event_id, "tables"), event_etag(event_id), if_none_match, build)
 
 # Получить стол по ID
 @app.get("/api/events/{event_id}/tables/{table_id}")
-def get_table(event_id: int, table_id: int):
-    event = next((e for e in events if e["id"] == event_id), None)
-    if not event:
-        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
-    
-    table = next((t for t in event.get("tables", []) if t["id"] == table_id), None)
-    if not table:
-        raise HTTPException(status_code=404, detail="Стол не найден")
+@reads_store
+def get_table(event_id: int, table_id: int, if_none_match: Optional[str] = Header(None)):
+    def build():
+        if not store.get_event(event_id):
+            raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+        
+        table = store.get_table(event_id, table_id)
+        if not table:
+            raise HTTPException(status_code=404, detail="Стол не найден")
+        return table
     
-    return table
+    return cached_json((event_id, table_id), table_etag(table_id), if_none_match, build)
 
 # Создать новый стол
 @app.post("/api/events/{event_id}/tables", status_code=201)
+@serialized(event_lock)
 def create_table(event_id: int, table_data: Dict[str, Any]):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
+    event = store.get_event(event_id)
+    if not event:
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     
-    if events[event_index]["status"] == EventStatus.COMPLETED.value:
+    if event["status"] == EventStatus.COMPLETED.value:
         raise HTTPException(status_code=403, detail="Невозможно добавить стол к завершенному мероприятию")
     
     new_table = {
-        "id": int(datetime.now().timestamp() * 1000),
+        "id": new_id(),
         **table_data,
         "games": []
     }
     
-    if "tables" not in events[event_index]:
-        events[event_index]["tables"] = []
-        
-    events[event_index]["tables"].append(new_table)
-    return new_table
+    return json_response(store.add_table(event_id, new_table), status_code=201)
 
 # Обновить стол
 @app.put("/api/events/{event_id}/tables/{table_id}")
-def update_table(event_id: int, table_id: int, table_data: Dict[str, Any]):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
+@serialized(event_lock)
+def update_table(event_id: int, table_id: int, table_data: Dict[str, Any], response: Response,
+                 if_match: Optional[str] = Header(None)):
+    if not store.get_event(event_id):
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     
-    table_index = next((i for i, t in enumerate(events[event_index].get("tables", [])) 
-                        if t["id"] == table_id), -1)
-    if table_index == -1:
-        raise HTTPException(status_code=404, detail="Стол не найден")
-    
-    events[event_index]["tables"][table_index].update({
-        **table_data,
-        "id": table_id
-    })
+    if if_match:
+        exists = store.get_table(event_id, table_id) is not None
+        check_precondition(if_match, table_etag(table_id) if exists else None)
     
-    if "games" not in table_data:
-        games = events[event_index]["tables"][table_index].get("games", [])
-        events[event_index]["tables"][table_index]["games"] = games
+    table = store.update_table(event_id, table_id, table_data)
+    if not table:
+        raise HTTPException(status_code=404, detail="Стол не найден")
         
-    return events[event_index]["tables"][table_index]
+    response.headers["ETag"] = table_etag(table_id)
+    return json_response(table, response)
 
 # Получить игры для стола
 @app.get("/api/events/{event_id}/tables/{table_id}/games")
-def get_games(event_id: int, table_id: int):
-    event = next((e for e in events if e["id"] == event_id), None)
-    if not event:
-        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
-    
-    table = next((t for t in event.get("tables", []) if t["id"] == table_id), None)
-    if not table:
-        raise HTTPException(status_code=404, detail="Стол не найден")
+@reads_store
+def get_games(event_id: int, table_id: int, if_none_match: Optional[str] = Header(None)):
+    def build():
+        if not store.get_event(event_id):
+            raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+        
+        table = store.get_table(event_id, table_id)
+        if not table:
+            raise HTTPException(status_code=404, detail="Стол не найден")
+        return table.get("games", [])
     
-    return table.get("games", [])
+    return cached_json((event_id, table_id, "games"), table_etag(table_id), if_none_match, build)
 
 # Получить игру по ID
 @app.get("/api/events/{event_id}/tables/{table_id}/games/{game_id}")
-def get_game(event_id: int, table_id: int, game_id: int):
-    event = next((e for e in events if e["id"] == event_id), None)
-    if not event:
-        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
-    
-    table = next((t for t in event.get("tables", []) if t["id"] == table_id), None)
-    if not table:
-        raise HTTPException(status_code=404, detail="Стол не найден")
-    
-    game = next((g for g in table.get("games", []) if g["id"] == game_id), None)
-    if not game:
-        raise HTTPException(status_code=404, detail="Игра не найдена")
+@reads_store
+def get_game(event_id: int, table_id: int, game_id: int, if_none_match: Optional[str] = Header(None)):
+    def build():
+        if not store.get_event(event_id):
+            raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+        
+        if not store.get_table(event_id, table_id):
+            raise HTTPException(status_code=404, detail="Стол не найден")
+        
+        game = store.get_game(event_id, table_id, game_id)
+        if not game:
+            raise HTTPException(status_code=404, detail="Игра не найдена")
+        return game
     
-    return game
+    return cached_json((event_id, table_id, game_id), game_etag(game_id), if_none_match, build)
 
 # Создать новую игру
 @app.post("/api/events/{event_id}/tables/{table_id}/games", status_code=201)
+@serialized(event_lock)
 def create_game(event_id: int, table_id: int, game_data: Dict[str, Any]):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
+    event = store.get_event(event_id)
+    if not event:
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
 
-    if events[event_index]["status"] == EventStatus.COMPLETED.value:
+    if event["status"] == EventStatus.COMPLETED.value:
         raise HTTPException(status_code=403, detail="Невозможно добавить игру к завершенному мероприятию")
     
-    table_index = next((i for i, t in enumerate(events[event_index].get("tables", [])) 
-                        if t["id"] == table_id), -1)
-    if table_index == -1:
+    if not store.get_table(event_id, table_id):
         raise HTTPException(status_code=404, detail="Стол не найден")
     
-    new_game = {
-        "id": int(datetime.now().timestamp() * 1000),
+    return json_response(store.add_game(event_id, table_id, new_game(game_data)), status_code=201)
+
+def new_game(game_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": new_id(),
         "created": datetime.now().isoformat(),
         "status": "not_started",
         "currentRound": 0,
@@ -260,261 +694,774 @@ def create_game(event_id: int, table_id: int, game_data: Dict[str, Any]):
         "isCriticalRound": False,
         **game_data
     }
+
+def seat_players(seating: List[Seat]) -> List[Dict[str, Any]]:
+    """Игроки состояния игры по рассадке; без роли игрок считается мирным."""
+    players = []
+    for seat in sorted(seating, key=lambda seat: seat.id):
+        role = seat.role or "Мирный"
+        players.append({
+            "id": seat.id,
+            "name": seat.name,
+            "role": role,
+            "originalRole": role,
+            "fouls": 0,
+            "nominated": None,
+            "isAlive": True,
+            "isEliminated": False,
+            "isSilent": False,
+            "silentNextRound": False
+        })
+    return players
+
+def check_seating(place: str, seating: List[Seat]) -> None:
+    if len({seat.id for seat in seating}) != len(seating):
+        raise HTTPException(status_code=422, detail=f"{place}: места за столом повторяются")
+    if len({seat.name for seat in seating}) != len(seating):
+        raise HTTPException(status_code=422, detail=f"{place}: игрок посажен дважды")
+    for seat in seating:
+        if seat.role is not None and seat.role not in PLAYER_ROLES:
+            raise HTTPException(status_code=422, detail=f"{place}: неизвестная роль {seat.role}")
+
+def check_setup(event_id: int, setup: EventSetup) -> None:
+    """Проверяет весь пакет до первого изменения, чтобы он применился целиком или никак."""
+    table_ids = [table.id for table in setup.tables if table.id is not None]
+    if len(set(table_ids)) != len(table_ids):
+        raise HTTPException(status_code=422, detail="Стол указан в пакете дважды")
+    game_ids = [game.id for table in setup.tables for game in table.games if game.id is not None]
+    if len(set(game_ids)) != len(game_ids):
+        raise HTTPException(status_code=422, detail="Игра указана в пакете дважды")
     
-    if "games" not in events[event_index]["tables"][table_index]:
-        events[event_index]["tables"][table_index]["games"] = []
-        
-    events[event_index]["tables"][table_index]["games"].append(new_game)
-    return new_game
+    for i, table_setup in enumerate(setup.tables):
+        if table_setup.id is not None and not store.get_table(event_id, table_setup.id):
+            raise HTTPException(status_code=404, detail=f"tables[{i}]: Стол не найден")
+        for j, game_setup in enumerate(table_setup.games):
+            place = f"tables[{i}].games[{j}]"
+            if game_setup.id is not None:
+                if table_setup.id is None or not store.get_game(event_id, table_setup.id, game_setup.id):
+                    raise HTTPException(status_code=404, detail=f"{place}: Игра не найдена")
+            if game_setup.seating:
+                check_seating(place, game_setup.seating)
+
+def setup_state_data(game_setup: GameSetup) -> Dict[str, Any]:
+    state_data = dict(game_setup.state or {})
+    if game_setup.seating:
+        state_data["players"] = seat_players(game_setup.seating)
+    state_data.pop("gameId", None)
+    return state_data
+
+# Создать или обновить столы, игры и рассадку мероприятия одним запросом
+@app.post("/api/events/{event_id}/setup", status_code=201)
+@serialized(setup_lock)
+def setup_event(event_id: int, setup: EventSetup):
+    event = store.get_event(event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+    
+    if event["status"] == EventStatus.COMPLETED.value:
+        raise HTTPException(status_code=403, detail="Невозможно изменить столы завершенного мероприятия")
+    
+    check_setup(event_id, setup)
+    
+    tables = []
+    changed_states = []
+    with store.transaction(), game_states.transaction():
+        for table_setup in setup.tables:
+            table_data = table_setup.model_dump(exclude={"id", "games"}, exclude_unset=True)
+            if table_setup.id is None:
+                table = store.add_table(event_id, {"id": new_id(), **table_data, "games": []})
+            elif table_data:
+                table = store.update_table(event_id, table_setup.id, table_data)
+            else:
+                table = store.get_table(event_id, table_setup.id)
+            
+            games = []
+            for game_setup in table_setup.games:
+                game_data = game_setup.model_dump(exclude={"id", "seating", "state"}, exclude_unset=True)
+                if game_setup.id is None:
+                    game = store.add_game(event_id, table["id"], new_game(game_data))
+                elif game_data:
+                    game = store.update_game(event_id, table["id"], game_setup.id, game_data)
+                else:
+                    game = store.get_game(event_id, table["id"], game_setup.id)
+                
+                state_data = setup_state_data(game_setup)
+                if state_data:
+                    if game_states.get(game["id"]) is None:
+                        game_states.create(game["id"], new_game_state(game["id"], state_data))
+                    else:
+                        game_states.update(game["id"], state_data)
+                    sync_game_status(game["id"], state_data)
+                    changed_states.append((game["id"], state_data))
+                games.append({"id": game["id"], "created": game_setup.id is None, "state": bool(state_data)})
+            tables.append({"id": table["id"], "created": table_setup.id is None, "games": games})
+    
+    # Рейтинги и подписчики узнают об изменениях после фиксации всего пакета
+    for game_id, state_data in changed_states:
+        update_leaderboards(game_id, state_data)
+        publish_game_change(game_id, "state", state_data)
+    
+    logger.info("Пакетная настройка мероприятия", extra={
+        "eventId": event_id, "tables": len(tables), "games": sum(len(t["games"]) for t in tables),
+    })
+    return json_response({"eventId": event_id, "tables": tables}, status_code=201)
 
 # Обновить игру
 @app.put("/api/events/{event_id}/tables/{table_id}/games/{game_id}")
-def update_game(event_id: int, table_id: int, game_id: int, game_data: GameUpdate):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
+@serialized(game_lock)
+def update_game(event_id: int, table_id: int, game_id: int, game_data: GameUpdate, response: Response,
+                if_match: Optional[str] = Header(None)):
+    if not store.get_event(event_id):
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     
-    table_index = next((i for i, t in enumerate(events[event_index].get("tables", [])) 
-                        if t["id"] == table_id), -1)
-    if table_index == -1:
+    if not store.get_table(event_id, table_id):
         raise HTTPException(status_code=404, detail="Стол не найден")
     
-    game_index = next((i for i, g in enumerate(events[event_index]["tables"][table_index].get("games", [])) 
-                        if g["id"] == game_id), -1)
-    if game_index == -1:
-        raise HTTPException(status_code=404, detail="Игра не найдена")
+    if if_match:
+        exists = store.get_game(event_id, table_id, game_id) is not None
+        check_precondition(if_match, game_etag(game_id) if exists else None)
     
     # Преобразуем Pydantic модель в словарь, исключая None значения
     update_data = game_data.dict(exclude_unset=True)
     
-    events[event_index]["tables"][table_index]["games"][game_index].update({
-        **update_data,
-        "id": game_id
-    })
+    game = store.update_game(event_id, table_id, game_id, update_data)
+    if not game:
+        raise HTTPException(status_code=404, detail="Игра не найдена")
     
-    return events[event_index]["tables"][table_index]["games"][game_index]
+    response.headers["ETag"] = game_etag(game_id)
+    return json_response(game, response)
 
 # Получить состояние игры
 @app.get("/api/games/{game_id}/state")
-def get_game_state(game_id: int):
-    game_state = next((gs for gs in game_states if gs["gameId"] == game_id), None)
+@reads_store
+def get_game_state(game_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                   seq: Optional[int] = Query(None, ge=1), round: Optional[int] = Query(None, ge=0)):
+    if seq is not None or round is not None:
+        # Прошлое состояние: после действия seq журнала или на конец раунда round
+        game_state = game_states.state_at(game_id, seq=seq, round=round)
+        if game_state is None:
+            raise HTTPException(status_code=404, detail="Состояние игры не найдено")
+        return json_response(game_state)
+    
+    cached = not_modified(response, state_etag(game_id), if_none_match)
+    if cached:
+        return cached
+    
+    game_state = game_states.get(game_id)
     if not game_state:
         # Возвращаем дефолтное состояние с новыми полями
-        return mock_data.default_game_state
-    return game_state
+        return json_response(mock_data.default_game_state, response)
+    return json_response(game_state, response)
+
+def game_sync_fields(state_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Поля игры, которые нужно обновить по изменениям ее состояния."""
+    changes = {}
+    
+    # Обновляем статус игры на основе gameStatus
+    if "gameStatus" in state_data:
+        game_status = state_data["gameStatus"]
+        if game_status == mock_data.GAME_STATUSES["IN_PROGRESS"]:
+            changes["status"] = "in_progress"
+        elif game_status in [
+                mock_data.GAME_STATUSES["FINISHED_NO_SCORES"],
+                mock_data.GAME_STATUSES["FINISHED_WITH_SCORES"]
+        ]:
+            changes["status"] = "finished"
+        else:
+            changes["status"] = "not_started"
+        changes["gameStatus"] = game_status
+        
+    # Обновляем gameSubstatus, критический раунд и номер раунда в игре
+    if "gameSubstatus" in state_data:
+        changes["gameSubstatus"] = state_data["gameSubstatus"]
+    if "isCriticalRound" in state_data:
+        changes["isCriticalRound"] = state_data["isCriticalRound"]
+    if "round" in state_data:
+        changes["currentRound"] = state_data["round"]
+        
+    return changes
+
+def publish_game_change(game_id: int, change_type: str, delta: Dict[str, Any]) -> None:
+    # Без подписчиков и других процессов не тратим время на поиск мероприятия
+    if not hub.active and not change_feed.enabled:
+        return
+    
+    topics = [f"game:{game_id}"]
+    location = store.locate_game(game_id)
+    event_id = location[0]["id"] if location else None
+    if event_id is not None:
+        topics.append(f"event:{event_id}")
+    
+    payload = {
+        "type": change_type,
+        "gameId": game_id,
+        "eventId": event_id,
+        "version": game_states.version(game_id),
+        "delta": delta,
+    }
+    hub.publish(topics, payload)
+    change_feed.append(topics, payload)
+
+# Рейтинги турниров: игра учитывается, когда получает статус finished_with_scores
+
+def load_leaderboards(record) -> None:
+    """Учитывает игры, завершенные до запуска сервера.
+
+    Вызывается рейтингами при первом обращении к ним, а не при импорте.
+    Состояния читаются только у игр турниров, завершенных по карточке игры,
+    и через peek, чтобы не загружать в память состояния синтетического турнира.
+    """
+    for event in store.list_events():
+        if event.get("category") not in RATED_CATEGORIES:
+            continue
+        for table in event.get("tables", []):
+            for game in table.get("games", []):
+                if game.get("gameStatus") != FINISHED_WITH_SCORES:
+                    continue
+                state = game_states.peek(game["id"])
+                if state and state.get("gameStatus") == FINISHED_WITH_SCORES:
+                    record(event["id"], game["id"], state)
+
+leaderboards = Leaderboards(load_leaderboards)
+
+def rated_event_id(game_id: int, state: Optional[Dict[str, Any]]) -> Optional[int]:
+    """ID турнира, в рейтинг которого идет игра, или None."""
+    if not state or state.get("gameStatus") != FINISHED_WITH_SCORES:
+        return None
+    location = store.locate_game(game_id)
+    if location and location[0].get("category") in RATED_CATEGORIES:
+        return location[0]["id"]
+    return None
+
+def rate_game(game_id: int, state: Optional[Dict[str, Any]]) -> None:
+    event_id = rated_event_id(game_id, state)
+    if event_id is None:
+        leaderboards.retract(game_id)
+    else:
+        leaderboards.record(event_id, game_id, state)
+
+def update_leaderboards(game_id: int, state_data: Dict[str, Any]) -> None:
+    # Рейтинг зависит только от статуса игры, баллов и состава игроков
+    if not any(field in state_data for field in ("gameStatus", "scores", "players")):
+        return
+    rate_game(game_id, game_states.get(game_id))
+
+def rerate_event(event: Dict[str, Any]) -> None:
+    # Смена категории включает турнир в рейтинг или исключает из него
+    rated = event.get("category") in RATED_CATEGORIES
+    if rated == (leaderboards.event(event["id"]) is not None):
+        return
+    leaderboards.remove_event(event["id"])
+    for table in event.get("tables", []):
+        for game in table.get("games", []):
+            rate_game(game["id"], game_states.get(game["id"]))
+
+def sync_game_status(game_id: int, state_data: Dict[str, Any]) -> None:
+    # Синхронизируем статус игры в основной структуре событий
+    if "isGameStarted" not in state_data and "gameStatus" not in state_data:
+        return
+    
+    location = store.locate_game(game_id)
+    if not location:
+        logger.warning("Игра не найдена в структуре событий", extra={"gameId": game_id})
+        return
+    
+    event, table, game = location
+    old_status = game.get("status", "not_started")
+    game = store.update_game(event["id"], table["id"], game_id, game_sync_fields(state_data))
+    logger.info("Статус игры изменен", extra={
+        "gameId": game_id, "eventId": event["id"], "tableId": table["id"],
+        "oldStatus": old_status, "newStatus": game.get("status", old_status),
+    })
+
+def new_game_state(game_id: int, state_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "gameId": game_id,
+        # Устанавливаем значения по умолчанию для новых полей (убираем phase)
+        "gameStatus": mock_data.GAME_STATUSES["SEATING_READY"],
+        "gameSubstatus": None,
+        "isCriticalRound": False,
+        "scores": {str(i): {"baseScore": 0, "additionalScore": 0} for i in range(1, 11)},
+        **state_data
+    }
 
 # Обновить состояние игры
 @app.put("/api/games/{game_id}/state")
-def update_game_state(game_id: int, state_data: Dict[str, Any]):
-    print(f"=== ОБНОВЛЕНИЕ СОСТОЯНИЯ ИГРЫ {game_id} ===")
-    print(f"Входящие данные: {state_data}")
-    
-    game_state_index = next((i for i, gs in enumerate(game_states) if gs["gameId"] == game_id), -1)
-    
-    if game_state_index == -1:
-        print(f"Создание нового состояния для игры {game_id}")
-        new_game_state = {
-            "gameId": game_id,
-            # Устанавливаем значения по умолчанию для новых полей (убираем phase)
-            "gameStatus": mock_data.GAME_STATUSES["SEATING_READY"],
-            "gameSubstatus": None,
-            "isCriticalRound": False,
-            "scores": {str(i): {"baseScore": 0, "additionalScore": 0} for i in range(1, 11)},
-            **state_data
-        }
-        game_states.append(new_game_state)
-        game_state = new_game_state
+@serialized(game_lock)
+def update_game_state(game_id: int, state_data: Dict[str, Any], response: Response,
+                      if_match: Optional[str] = Header(None)):
+    # Полные данные пишем только на уровне DEBUG, чтобы не форматировать их зря
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Входящие данные состояния игры", extra={"gameId": game_id, "payload": state_data})
+    
+    game_state = game_states.get(game_id)
+    check_precondition(if_match, state_etag(game_id) if game_state is not None else None)
+    
+    if game_state is None:
+        logger.info("Создание нового состояния игры", extra={"gameId": game_id})
+        game_state = game_states.create(game_id, new_game_state(game_id, state_data))
     else:
-        print(f"Обновление существующего состояния для игры {game_id}")
-        game_states[game_state_index].update({
-            **state_data,
-            "gameId": game_id
-        })
-        game_state = game_states[game_state_index]
+        logger.debug("Обновление состояния игры", extra={"gameId": game_id, "fields": list(state_data)})
+        game_state = game_states.update(game_id, state_data)
         
-    # Синхронизируем статус игры в основной структуре событий
-    if "isGameStarted" in state_data or "gameStatus" in state_data:
-        game_found = False
-        for event in events:
-            for table in event.get("tables", []):
-                for game in table.get("games", []):
-                    if game["id"] == game_id:
-                        print(f"Найдена игра в событии {event['id']}, столе {table['id']}")
-                        old_status = game.get("status", "not_started")
-                        
-                        # Обновляем статус игры на основе gameStatus
-                        if "gameStatus" in state_data:
-                            game_status = state_data["gameStatus"]
-                            if game_status == mock_data.GAME_STATUSES["IN_PROGRESS"]:
-                                game["status"] = "in_progress"
-                            elif game_status in [
-                                    mock_data.GAME_STATUSES["FINISHED_NO_SCORES"],
-                                    mock_data.GAME_STATUSES["FINISHED_WITH_SCORES"]
-                            ]:
-                                game["status"] = "finished"
-                            else:
-                                game["status"] = "not_started"
-                                
-                        # Обновляем gameStatus и gameSubstatus в игре
-                        if "gameStatus" in state_data:
-                            game["gameStatus"] = state_data["gameStatus"]
-                        if "gameSubstatus" in state_data:
-                            game["gameSubstatus"] = state_data["gameSubstatus"]
-                        if "isCriticalRound" in state_data:
-                            game["isCriticalRound"] = state_data["isCriticalRound"]
-                            
-                        if "round" in state_data:
-                            game["currentRound"] = state_data["round"]
-                            
-                        print(f"Статус игры изменен с '{old_status}' на '{game['status']}'")
-                        game_found = True
-                        break
-                if game_found:
-                    break
-            if game_found:
-                break
+    sync_game_status(game_id, state_data)
+    update_leaderboards(game_id, state_data)
+    publish_game_change(game_id, "state", state_data)
             
-        if not game_found:
-            print(f"ВНИМАНИЕ: Игра с ID {game_id} не найдена в структуре событий!")
-            
-    print(f"Итоговое состояние игры: {game_state}")
-    return game_state
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Итоговое состояние игры", extra={"gameId": game_id, "state": game_state})
+    response.headers["ETag"] = state_etag(game_id)
+    return json_response(game_state, response)
+
+# Частично обновить состояние игры (JSON Patch или JSON Merge Patch)
+@app.patch("/api/games/{game_id}/state")
+@serialized(game_lock)
+def patch_game_state(game_id: int,
+                     response: Response,
+                     patch: Union[List[Dict[str, Any]], Dict[str, Any]] = Body(...),
+                     content_type: Optional[str] = Header(None),
+                     if_match: Optional[str] = Header(None)):
+    game_state = game_states.get(game_id)
+    if game_state is None:
+        raise HTTPException(status_code=404, detail="Состояние игры не найдено")
+    check_precondition(if_match, state_etag(game_id))
+    
+    is_json_patch = (content_type or "").startswith("application/json-patch+json")
+    if is_json_patch and not isinstance(patch, list):
+        raise HTTPException(status_code=400, detail="JSON Patch должен быть массивом операций")
+    
+    try:
+        if isinstance(patch, list):
+            new_state, changes = apply_json_patch(game_state, patch)
+        else:
+            new_state, changes = apply_merge_patch(game_state, patch)
+    except PatchConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    # В хранилище передаем только изменившиеся поля верхнего уровня;
+    # удаленные поля (в fields они None) удаляются и из хранилища
+    fields = changed_fields(game_state, new_state)
+    fields.pop("gameId", None)
+    if fields:
+        removed = [key for key in fields if key not in new_state]
+        game_states.update(game_id, {key: value for key, value in fields.items() if key in new_state}, removed)
+        sync_game_status(game_id, fields)
+        update_leaderboards(game_id, fields)
+        publish_game_change(game_id, "state", fields)
+    
+    response.headers["ETag"] = state_etag(game_id)
+    return json_response({"gameId": game_id, "version": game_states.version(game_id), "changes": changes},
+                         response)
+
+# Отменить последнее действие в игре (обновление состояния или баллов)
+@app.post("/api/games/{game_id}/undo")
+@serialized(game_lock)
+def undo_game_action(game_id: int, response: Response, if_match: Optional[str] = Header(None)):
+    previous = game_states.get(game_id)
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Состояние игры не найдено")
+    check_precondition(if_match, state_etag(game_id))
+    
+    game_state = game_states.undo(game_id)
+    if game_state is None:
+        raise HTTPException(status_code=409, detail="Нет действий для отмены")
+    
+    # Подписчикам и связанным данным передаем только изменившиеся поля
+    fields = changed_fields(previous, game_state)
+    fields.pop("gameId", None)
+    if fields:
+        sync_game_status(game_id, fields)
+        update_leaderboards(game_id, fields)
+        publish_game_change(game_id, "state", fields)
+    
+    response.headers["ETag"] = state_etag(game_id)
+    return json_response(game_state, response)
 
 # НОВЫЕ ЭНДПОИНТЫ ДЛЯ РАБОТЫ С БАЛЛАМИ
 
+# Журнал действий игры построчно (NDJSON) для разбора партии
+@app.get("/api/games/{game_id}/replay")
+@reads_store
+def replay_game(game_id: int, after: int = Query(0, ge=0)):
+    actions = game_states.actions(game_id, after)
+    if actions is None:
+        raise HTTPException(status_code=404, detail="Журнал игры не найден")
+    
+    def lines():
+        for action in actions:
+            yield encode_json(action) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # Получить баллы игроков для игры
 @app.get("/api/games/{game_id}/scores")
-def get_game_scores(game_id: int):
-    game_state = next((gs for gs in game_states if gs["gameId"] == game_id), None)
+@reads_store
+def get_game_scores(game_id: int, response: Response, if_none_match: Optional[str] = Header(None)):
+    game_state = game_states.get(game_id)
     if not game_state:
         raise HTTPException(status_code=404, detail="Состояние игры не найдено")
     
-    return game_state.get("scores", {})
+    return not_modified(response, state_etag(game_id), if_none_match) or json_response(game_state.get("scores", {}), response)
 
 # Обновить баллы игроков
 @app.put("/api/games/{game_id}/scores")
-def update_game_scores(game_id: int, scores: Dict[str, PlayerScore]):
-    game_state_index = next((i for i, gs in enumerate(game_states) if gs["gameId"] == game_id), -1)
-    if game_state_index == -1:
+@serialized(game_lock)
+def update_game_scores(game_id: int, scores: Dict[str, PlayerScore], response: Response,
+                       if_match: Optional[str] = Header(None)):
+    if game_states.get(game_id) is None:
         raise HTTPException(status_code=404, detail="Состояние игры не найдено")
+    check_precondition(if_match, state_etag(game_id))
     
     # Преобразуем Pydantic модели в словари
     scores_dict = {}
     for player_id, score in scores.items():
         scores_dict[player_id] = score.dict()
     
-    game_states[game_state_index]["scores"] = scores_dict
+    game_states.set_scores(game_id, scores_dict)
+    update_leaderboards(game_id, {"scores": scores_dict})
+    publish_game_change(game_id, "scores", {"scores": scores_dict})
     
-    return {"message": "Баллы успешно обновлены", "scores": scores_dict}
+    response.headers["ETag"] = state_etag(game_id)
+    return json_response({"message": "Баллы успешно обновлены", "scores": scores_dict}, response)
 
 # Получить статистику игры
 @app.get("/api/games/{game_id}/statistics")
-def get_game_statistics(game_id: int):
-    game_state = next((gs for gs in game_states if gs["gameId"] == game_id), None)
-    if not game_state:
+@reads_store
+def get_game_statistics(game_id: int, response: Response, if_none_match: Optional[str] = Header(None)):
+    # Статистика обновляется хранилищем при каждом изменении состояния
+    statistics = game_states.statistics(game_id)
+    if statistics is None:
         raise HTTPException(status_code=404, detail="Состояние игры не найдено")
     
-    players = game_state.get("players", [])
-    scores = game_state.get("scores", {})
+    cached = not_modified(response, state_etag(game_id), if_none_match)
+    if cached:
+        return cached
+    return json_response(statistics, response)
+
+# РЕЙТИНГИ ТУРНИРОВ
+
+# Рейтинг игроков турнира
+@app.get("/api/events/{event_id}/leaderboard")
+@reads_store
+def get_event_leaderboard(event_id: int, response: Response,
+                          sort: LeaderboardSort = LeaderboardSort.TOTAL,
+                          limit: Optional[int] = Query(None, ge=1),
+                          if_none_match: Optional[str] = Header(None)):
+    event = store.get_event(event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+    if event.get("category") not in RATED_CATEGORIES:
+        raise HTTPException(status_code=404, detail="Рейтинг ведется только для турниров")
     
-    alive_players = [p for p in players if p.get("isAlive", True) and not p.get("isEliminated", False)]
-    dead_players = game_state.get("deadPlayers", [])
-    eliminated_players = game_state.get("eliminatedPlayers", [])
+    cached = not_modified(response, make_etag("leaderboard", event_id, leaderboards.version), if_none_match)
+    if cached:
+        return cached
+    return json_response(leaderboards.ranking(event_id, sort.value)[:limit], response)
+
+# Общий рейтинг игроков по всем турнирам
+@app.get("/api/leaderboard")
+@reads_store
+def get_leaderboard(response: Response,
+                    sort: LeaderboardSort = LeaderboardSort.TOTAL,
+                    limit: Optional[int] = Query(None, ge=1),
+                    if_none_match: Optional[str] = Header(None)):
+    cached = not_modified(response, make_etag("leaderboard", None, leaderboards.version), if_none_match)
+    if cached:
+        return cached
+    return json_response(leaderboards.ranking(None, sort.value)[:limit], response)
+
+# ПОДПИСКА НА ИЗМЕНЕНИЯ В РЕАЛЬНОМ ВРЕМЕНИ
+
+async def stream_to_websocket(websocket: WebSocket, subscription: Subscription) -> None:
+    async def send_changes():
+        while True:
+            message = await subscription.get()
+            await websocket.send_text(message.text)
     
-    # Подсчет ролей
-    role_stats = {}
-    for player in players:
-        role = player.get("originalRole", "Неизвестно")
-        if role not in role_stats:
-            role_stats[role] = {"total": 0, "alive": 0, "dead": 0, "eliminated": 0}
-        
-        role_stats[role]["total"] += 1
-        
-        if player["id"] in dead_players:
-            role_stats[role]["dead"] += 1
-        elif player["id"] in eliminated_players:
-            role_stats[role]["eliminated"] += 1
-        elif player.get("isAlive", True) and not player.get("isEliminated", False):
-            role_stats[role]["alive"] += 1
-    
-    # Подсчет баллов
-    total_scores = {}
-    for player_id, score in scores.items():
-        total_scores[player_id] = score.get("baseScore", 0) + score.get("additionalScore", 0)
+    await websocket.accept()
+    sender = asyncio.ensure_future(send_changes())
+    stream_clients["websocket"] += 1
+    try:
+        # Входящие сообщения не нужны, ждем только отключения клиента
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        stream_clients["websocket"] -= 1
+        sender.cancel()
+        hub.unsubscribe(subscription)
+
+def stream_sse(subscription: Subscription) -> StreamingResponse:
+    async def frames():
+        stream_clients["sse"] += 1
+        try:
+            yield b": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Комментарий-пинг, чтобы прокси не закрывали соединение
+                    yield b": keepalive\n\n"
+                    continue
+                yield message.sse
+        finally:
+            stream_clients["sse"] -= 1
+            hub.unsubscribe(subscription)
     
-    return {
-        "gameId": game_id,
-        "round": game_state.get("round", 0),
-        "gameStatus": game_state.get("gameStatus"),
-        "gameSubstatus": game_state.get("gameSubstatus"),
-        "isCriticalRound": game_state.get("isCriticalRound", False),
-        "playersAlive": len(alive_players),
-        "playersDead": len(dead_players),
-        "playersEliminated": len(eliminated_players),
-        "roleStatistics": role_stats,
-        "scores": total_scores
-    }
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws/games/{game_id}")
+async def game_changes_websocket(websocket: WebSocket, game_id: int):
+    await stream_to_websocket(websocket, hub.subscribe(f"game:{game_id}"))
+
+@app.websocket("/ws/events/{event_id}")
+async def event_changes_websocket(websocket: WebSocket, event_id: int):
+    await stream_to_websocket(websocket, hub.subscribe(f"event:{event_id}"))
+
+@app.get("/api/games/{game_id}/stream")
+async def game_changes_stream(game_id: int):
+    return stream_sse(hub.subscribe(f"game:{game_id}"))
+
+@app.get("/api/events/{event_id}/stream")
+async def event_changes_stream(event_id: int):
+    return stream_sse(hub.subscribe(f"event:{event_id}"))
+
+def remove_game_states(table: Dict[str, Any]) -> List[int]:
+    game_ids = [game["id"] for game in table.get("games", [])]
+    for game_id in game_ids:
+        game_states.remove(game_id)
+        leaderboards.retract(game_id)
+    return game_ids
+
+def publish_removal(path: List[int], game_ids: List[int]) -> None:
+    # Другие процессы очищают свой кеш ответов и рейтинги
+    change_feed.append([], {"type": "deleted", "path": path, "gameIds": game_ids})
 
 # Удалить мероприятие
 @app.delete("/api/events/{event_id}")
+@serialized(event_games_lock)
 def delete_event(event_id: int):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
+    deleted_event = store.remove_event(event_id)
+    if not deleted_event:
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     
-    deleted_event = events.pop(event_index)
-    return {"detail": "Мероприятие успешно удалено", "deleted": deleted_event["id"]}
+    # Состояния игр удаленных столов больше недоступны
+    game_ids = []
+    for table in deleted_event.get("tables", []):
+        game_ids.extend(remove_game_states(table))
+    response_cache.invalidate(event_id)
+    publish_removal([event_id], game_ids)
+    
+    return json_response({"detail": "Мероприятие успешно удалено", "deleted": deleted_event["id"]})
 
 @app.delete("/api/events/{event_id}/tables/{table_id}")
+@serialized(event_games_lock)
 def delete_table(event_id: int, table_id: int):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
+    if not store.get_event(event_id):
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     
-    tables = events[event_index].get("tables", [])
-    table_index = next((i for i, t in enumerate(tables) if t["id"] == table_id), -1)
-    if table_index == -1:
+    deleted_table = store.remove_table(event_id, table_id)
+    if not deleted_table:
         raise HTTPException(status_code=404, detail="Стол не найден")
     
-    deleted_table = tables.pop(table_index)
-    return {"detail": "Стол успешно удален", "deleted": deleted_table["id"]}
+    game_ids = remove_game_states(deleted_table)
+    response_cache.invalidate(event_id, table_id)
+    publish_removal([event_id, table_id], game_ids)
+    
+    return json_response({"detail": "Стол успешно удален", "deleted": deleted_table["id"]})
 
 # Получить список ведущих
 @app.get("/api/judges")
-def get_judges():
-    return judges
+def get_judges(if_none_match: Optional[str] = Header(None)):
+    # Список ведущих не меняется во время работы сервера
+    return cached_json(("judges",), make_etag("judges", None, 1), if_none_match, lambda: judges)
 
 # Получить ведущего по ID
 @app.get("/api/judges/{judge_id}")
-def get_judge(judge_id: int):
-    judge = next((j for j in judges if j["id"] == judge_id), None)
-    if not judge:
-        raise HTTPException(status_code=404, detail="Ведущий не найден")
-    return judge
+def get_judge(judge_id: int, if_none_match: Optional[str] = Header(None)):
+    def build():
+        judge = next((j for j in judges if j["id"] == judge_id), None)
+        if not judge:
+            raise HTTPException(status_code=404, detail="Ведущий не найден")
+        return judge
+    
+    return cached_json(("judges", judge_id), make_etag("judge", judge_id, 1), if_none_match, build)
+
+# Выгрузка и загрузка архива построчно (NDJSON, формат описан в archive.py)
+
+IMPORT_BATCH_SIZE = 500
+# Сколько записей архива выгрузка читает из хранилища за раз
+EXPORT_BATCH_SIZE = 500
+
+@app.get("/api/export")
+@reads_store
+def export_archive(event_id: Optional[int] = Query(None, alias="eventId"),
+                   status: Optional[EventStatus] = None,
+                   category: Optional[EventCategory] = None,
+                   language: Optional[str] = None,
+                   date_from: Optional[str] = Query(None, alias="dateFrom"),
+                   date_to: Optional[str] = Query(None, alias="dateTo")):
+    if event_id is not None and store.get_event(event_id) is None:
+        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+    
+    records = export_records(store, game_states, event_filters(status, category, language),
+                             date_from, date_to, event_id)
+    
+    async def lines():
+        # Записи строятся по мере отправки: каждую пачку читаем так же, как
+        # обработчики чтения, а не в пуле потоков без замка
+        while True:
+            batch = await run_store(lambda: list(islice(records, EXPORT_BATCH_SIZE)))
+            if not batch:
+                return
+            for record in batch:
+                yield encode_json(record) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="mafia-export.ndjson"'})
+
+def import_lock_keys(batch: List[tuple]) -> List[str]:
+    keys = set()
+    for _, record in batch:
+        data = record["data"]
+        if record["kind"] == "event":
+            keys.add(f"event:{data['id']}")
+        elif record["kind"] == "state":
+            keys.add(f"game:{data['gameId']}")
+        else:
+            keys.add(f"event:{record['eventId']}")
+            if record["kind"] == "game":
+                keys.add(f"game:{data['id']}")
+    return list(keys)
+
+def import_batch(batch: List[tuple], counts: Dict[str, int]) -> None:
+    # Пакет применяется целиком или не применяется вовсе
+    with store.transaction(), game_states.transaction():
+        for line_number, record in batch:
+            import_record(store, game_states, line_number, record)
+    for _, record in batch:
+        counts[record["kind"]] += 1
+    
+    # Загруженные объекты могли заменить прежние с теми же ID
+    response_cache.invalidate()
+    event_ids = [record["data"]["id"] for _, record in batch if record["kind"] == "event"]
+    game_ids = [record["data"]["gameId"] for _, record in batch if record["kind"] == "state"]
+    rate_imported(event_ids, game_ids)
+    change_feed.append([], {"type": "imported", "eventIds": event_ids, "gameIds": game_ids})
+
+def rate_imported(event_ids: List[int], game_ids: List[int]) -> None:
+    for event_id in event_ids:
+        event = store.get_event(event_id)
+        if event:
+            rerate_event(event)
+    for game_id in game_ids:
+        rate_game(game_id, game_states.get(game_id))
+
+@app.post("/api/import")
+async def import_archive(request: Request):
+    """Загружает архив по мере чтения тела запроса пакетами по IMPORT_BATCH_SIZE строк.
+
+    Объекты с существующими ID обновляются, поэтому архив можно загрузить повторно.
+    """
+    counts = dict.fromkeys(KINDS, 0)
+    batch: List[tuple] = []
+    line_number = 0
+    buffer = b""
+    
+    async def flush():
+        async with entity_locks.hold(*import_lock_keys(batch)):
+            await run_store(import_batch, batch, counts)
+    
+    try:
+        async for chunk in request.stream():
+            lines = (buffer + chunk).split(b"\n")
+            buffer = lines.pop()
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    batch.append((line_number, parse_record(line_number, line)))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+                batch = []
+        if buffer.strip():
+            line_number += 1
+            batch.append((line_number, parse_record(line_number, buffer)))
+        if batch:
+            await flush()
+    except ArchiveError as e:
+        logger.warning("Ошибка загрузки архива", extra={"line": e.line, "imported": counts})
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return json_response({"imported": counts, "lines": line_number})
+
+# Статистика кеша ответов
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return response_cache.stats()
+
+# Метрики для Prometheus
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.delete("/api/events/{event_id}/tables/{table_id}/games/{game_id}")
+@serialized(event_games_lock)
 def delete_game(event_id: int, table_id: int, game_id: int):
-    event_index = next((i for i, e in enumerate(events) if e["id"] == event_id), -1)
-    if event_index == -1:
+    if not store.get_event(event_id):
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
     
-    table_index = next((i for i, t in enumerate(events[event_index].get("tables", [])) 
-                       if t["id"] == table_id), -1)
-    if table_index == -1:
+    if not store.get_table(event_id, table_id):
         raise HTTPException(status_code=404, detail="Стол не найден")
     
-    games = events[event_index]["tables"][table_index].get("games", [])
-    game_index = next((i for i, g in enumerate(games) if g["id"] == game_id), -1)
-    if game_index == -1:
+    deleted_game = store.remove_game(event_id, table_id, game_id)
+    if not deleted_game:
         raise HTTPException(status_code=404, detail="Игра не найдена")
     
-    deleted_game = games.pop(game_index)
-    
     # Также удаляем состояние игры
-    global game_states
-    game_states = [gs for gs in game_states if gs["gameId"] != game_id]
+    game_states.remove(game_id)
+    leaderboards.retract(game_id)
+    response_cache.invalidate(event_id, table_id, game_id)
+    publish_removal([event_id, table_id, game_id], [game_id])
     
-    return {"detail": "Игра успешно удалена", "deleted": deleted_game["id"]}
+    return json_response({"detail": "Игра успешно удалена", "deleted": deleted_game["id"]})
+
+# Изменения, которые сделали другие процессы с той же базой.
+# Общие данные уже в SQLite; процесс обновляет только свое: подписчиков,
+# кеш ответов и рейтинги
+
+def apply_remote_change(topics: List[str], payload: Dict[str, Any]) -> None:
+    change_type = payload["type"]
+    if change_type == "deleted":
+        response_cache.invalidate(*payload["path"])
+        for game_id in payload["gameIds"]:
+            leaderboards.retract(game_id)
+    elif change_type == "imported":
+        response_cache.invalidate()
+        rate_imported(payload["eventIds"], payload["gameIds"])
+    elif change_type == "event":
+        if "tables" in payload["fields"]:
+            response_cache.invalidate(payload["eventId"])
+        event = store.get_event(payload["eventId"])
+        if event and "category" in payload["fields"]:
+            rerate_event(event)
+    else:
+        hub.publish(topics, payload)
+        update_leaderboards(payload["gameId"], payload["delta"])
+
+def apply_remote_changes() -> int:
+    changes = change_feed.poll()
+    for topics, payload in changes:
+        apply_remote_change(topics, payload)
+    return len(changes)
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=3000, reload=True)
+    if WORKERS > 1:
+        # Рабочий режим: процессы делят базу SQLite и узнают об изменениях друг друга
+        if STORAGE != "sqlite":
+            raise SystemExit("Для MAFIA_WORKERS > 1 нужно MAFIA_STORAGE=sqlite: "
+                             "в памяти у каждого процесса была бы своя копия данных")
+        uvicorn.run("app:app", host="0.0.0.0", port=3000, workers=WORKERS)
+    else:
+        uvicorn.run("app:app", host="0.0.0.0", port=3000, reload=True)
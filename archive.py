@@ -0,0 +1,113 @@
+# archive.py
+import json
+from typing import Any, Dict, Iterator, Optional
+
+# Строка архива - JSON-объект с полем kind. Родители идут раньше вложенных
+# объектов, поэтому архив можно загружать построчно:
+#   {"kind": "event", "data": {...}}                      - мероприятие без столов
+#   {"kind": "table", "eventId": 1, "data": {...}}        - стол без игр
+#   {"kind": "game", "eventId": 1, "tableId": 2, "data": {...}}
+#   {"kind": "state", "data": {"gameId": 3, ...}}         - состояние игры
+KINDS = ("event", "table", "game", "state")
+
+EXPORT_PAGE_SIZE = 100
+
+
+class ArchiveError(ValueError):
+    """Ошибка в строке архива; line - номер строки с 1."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Строка {line}: {message}")
+        self.line = line
+
+
+def export_records(store: Any, game_states: Any, filters: Dict[str, Any],
+                   date_from: Optional[str] = None, date_to: Optional[str] = None,
+                   event_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Записи архива мероприятий по фильтрам.
+
+    Мероприятия читаются страницами по EXPORT_PAGE_SIZE, состояния игр - по
+    одному, поэтому в памяти одновременно находится только текущая страница.
+    """
+    if event_id is not None:
+        event = store.get_event(event_id)
+        pages = iter([[event] if event else []])
+    else:
+        pages = _event_pages(store, filters, date_from, date_to)
+
+    for events in pages:
+        for event in events:
+            yield {"kind": "event", "data": {k: v for k, v in event.items() if k != "tables"}}
+            for table in event.get("tables", []):
+                yield {"kind": "table", "eventId": event["id"],
+                       "data": {k: v for k, v in table.items() if k != "games"}}
+                for game in table.get("games", []):
+                    yield {"kind": "game", "eventId": event["id"], "tableId": table["id"], "data": game}
+                    state = game_states.peek(game["id"])
+                    if state is not None:
+                        yield {"kind": "state", "data": state}
+
+
+def _event_pages(store: Any, filters: Dict[str, Any], date_from: Optional[str],
+                 date_to: Optional[str]) -> Iterator[list]:
+    cursor = None
+    while True:
+        events, cursor = store.query_events(filters, date_from, date_to, cursor, EXPORT_PAGE_SIZE)
+        yield events
+        if cursor is None:
+            return
+
+
+def parse_record(line_number: int, line: bytes) -> Dict[str, Any]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise ArchiveError(line_number, "некорректный JSON")
+    if not isinstance(record, dict) or record.get("kind") not in KINDS:
+        raise ArchiveError(line_number, "ожидается объект с kind из " + ", ".join(KINDS))
+
+    data = record.get("data")
+    id_field = "gameId" if record["kind"] == "state" else "id"
+    if not isinstance(data, dict) or not isinstance(data.get(id_field), int):
+        raise ArchiveError(line_number, f"в data нет целого {id_field}")
+    for parent in {"table": ("eventId",), "game": ("eventId", "tableId")}.get(record["kind"], ()):
+        if not isinstance(record.get(parent), int):
+            raise ArchiveError(line_number, f"нет целого {parent}")
+    return record
+
+
+def import_record(store: Any, game_states: Any, line_number: int, record: Dict[str, Any]) -> None:
+    """Создает объект записи или заменяет поля существующего с тем же ID."""
+    kind, data = record["kind"], record["data"]
+    if kind == "event":
+        fields = {k: v for k, v in data.items() if k != "tables"}
+        if store.get_event(data["id"]) is None:
+            store.add_event({**fields, "tables": []})
+        else:
+            store.update_event(data["id"], fields)
+    elif kind == "table":
+        if store.get_event(record["eventId"]) is None:
+            raise ArchiveError(line_number, "мероприятие стола не найдено")
+        owner = store.table_event(data["id"])
+        if owner is not None and owner != record["eventId"]:
+            raise ArchiveError(line_number, "стол с этим ID есть в другом мероприятии")
+        fields = {k: v for k, v in data.items() if k != "games"}
+        if owner is None:
+            store.add_table(record["eventId"], {**fields, "games": []})
+        else:
+            store.update_table(record["eventId"], data["id"], fields)
+    elif kind == "game":
+        if store.get_table(record["eventId"], record["tableId"]) is None:
+            raise ArchiveError(line_number, "стол игры не найден")
+        location = store.locate_game(data["id"])
+        if location and (location[0]["id"], location[1]["id"]) != (record["eventId"], record["tableId"]):
+            raise ArchiveError(line_number, "игра с этим ID есть за другим столом")
+        if location is None:
+            store.add_game(record["eventId"], record["tableId"], data)
+        else:
+            store.update_game(record["eventId"], record["tableId"], data["id"], data)
+    else:
+        if game_states.get(data["gameId"]) is None:
+            game_states.create(data["gameId"], data)
+        else:
+            game_states.update(data["gameId"], data)
@@ -0,0 +1,58 @@
+# benchmarks/bench_json.py
+"""Сравнение кодирования ответа: jsonable_encoder + json и fast_json.dumps.
+
+Запуск: python benchmarks/bench_json.py [--events N] [--repeat N]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+import fast_json
+import mock_data
+
+
+def make_events(count: int):
+    # Копии тестовых мероприятий с уникальными ID, со столами и играми
+    events = []
+    for i in range(count):
+        event = copy.deepcopy(mock_data.events[i % len(mock_data.events)])
+        event["id"] = 100000 + i
+        events.append(event)
+    return events
+
+
+def stdlib_response(data) -> bytes:
+    # Путь FastAPI по умолчанию: обход jsonable_encoder и кодирование JSONResponse
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    size = len(fast_json.dumps(events))
+    assert json.loads(stdlib_response(events)) == json.loads(fast_json.dumps(events))
+
+    print(f"/api/events: {args.events} мероприятий, {size / 1024:.0f} КБ, orjson: {fast_json.orjson is not None}")
+    results = {}
+    for name, func in (("jsonable_encoder + json", stdlib_response), ("fast_json.dumps", fast_json.dumps)):
+        seconds = min(timeit.repeat(lambda: func(events), number=args.repeat, repeat=3)) / args.repeat
+        results[name] = seconds
+        print(f"  {name:<25} {seconds * 1000:8.2f} мс")
+    baseline, fast = results.values()
+    print(f"  ускорение: {baseline / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
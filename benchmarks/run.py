@@ -0,0 +1,284 @@
+# benchmarks/run.py
+"""Нагрузочные замеры API на синтетических данных.
+
+Имитирует работу ведущих (обновления состояния игры), табло (опрос
+статистики) и зрителей (списки и карточки мероприятий). Запросы идут в
+ASGI-приложение в том же процессе и/или через локальный uvicorn.
+
+Запуск:
+    python benchmarks/run.py                         # замер и сравнение с baseline.json
+    python benchmarks/run.py --save-baseline         # записать новый baseline
+    python benchmarks/run.py --mode uvicorn --events 50 --tables 4 --games 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Замеры не должны писать журнал и засорять вывод логами
+os.environ.pop("MAFIA_DATA_DIR", None)
+os.environ.setdefault("MAFIA_LOG_LEVEL", "WARNING")
+
+import httpx
+import uvicorn
+
+import app as app_module
+from benchmarks.seed import build_dataset
+from leaderboard import Leaderboards
+from response_cache import ResponseCache
+from sqlite_store import ConnectionPool, SqliteEntityStore, SqliteGameStateStore
+from store import EntityStore, GameStateStore
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SUBSTATUSES = ["discussion", "voting", "night", "critical_discussion"]
+
+
+@contextmanager
+def use_dataset(storage: str, events: int, tables: int, games: int, seed: int) -> Iterator[Dict[str, Any]]:
+    """Подменяет хранилища приложения синтетическими данными на время замера.
+
+    Вместе с хранилищами подменяются и настройки режима хранения: от них
+    зависит, где выполняются обработчики и вычисляются ключи замков.
+    """
+    event_list, state_list = build_dataset(events, tables, games, seed)
+    saved = {name: getattr(app_module, name)
+             for name in ("store", "game_states", "response_cache", "leaderboards", "STORAGE", "STORE_BLOCKS")}
+    cleanup = None
+
+    tracemalloc.start()
+    if storage == "sqlite":
+        directory = tempfile.mkdtemp(prefix="mafia-bench-")
+        pool = ConnectionPool(os.path.join(directory, "bench.db"))
+        store, game_states = SqliteEntityStore(pool), SqliteGameStateStore(pool)
+        for event in event_list:
+            store.add_event(event)
+        for state in state_list:
+            game_states.create(state["gameId"], state)
+        cleanup = pool.close
+    else:
+        store, game_states = EntityStore(event_list), GameStateStore(state_list)
+    dataset_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    app_module.store = store
+    app_module.game_states = game_states
+    # Хранилища замера не пишут журнал: в памяти они не блокируют цикл событий
+    app_module.STORAGE = storage
+    app_module.STORE_BLOCKS = storage == "sqlite"
+    app_module.response_cache = ResponseCache(app_module.response_cache.max_entries)
+    app_module.leaderboards = Leaderboards(app_module.load_leaderboards)
+    try:
+        yield {
+            "event_ids": [event["id"] for event in event_list],
+            "games": [(event["id"], table["id"], game["id"])
+                      for event in event_list for table in event["tables"] for game in table["games"]],
+            "dataset_mb": round(dataset_bytes / 2 ** 20, 2),
+        }
+    finally:
+        for name, value in saved.items():
+            setattr(app_module, name, value)
+        if cleanup:
+            cleanup()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def make_request(role: str, data: Dict[str, Any], rng: random.Random, step: int):
+    """Запрос очередного шага клиента: (сценарий, метод, путь, тело)."""
+    event_id, table_id, game_id = rng.choice(data["games"])
+    if role == "judge":
+        body = {"round": step % 8, "gameSubstatus": SUBSTATUSES[step % len(SUBSTATUSES)],
+                "nominatedPlayers": [rng.randint(1, 10)]}
+        return "update_state", "PUT", f"/api/games/{game_id}/state", body
+    if role == "scoreboard":
+        return "statistics", "GET", f"/api/games/{game_id}/statistics", None
+    if step % 2:
+        return "get_event", "GET", f"/api/events/{event_id}", None
+    return "list_events", "GET", "/api/events?limit=20&fields=name,date,status", None
+
+
+async def drive(client: httpx.AsyncClient, data: Dict[str, Any], clients: int, requests: int,
+                think_time: float, seed: int) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    # Примерно как в зале: на одного ведущего приходятся табло и зрители
+    roles = ["judge", "scoreboard", "viewer", "viewer"]
+
+    async def run_client(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        role = roles[index % len(roles)]
+        for step in range(requests // clients):
+            scenario, method, path, body = make_request(role, data, rng, step)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.setdefault(scenario, []).append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[scenario] = errors.get(scenario, 0) + 1
+            if think_time:
+                await asyncio.sleep(rng.uniform(0, 2 * think_time))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 1),
+        "scenarios": {
+            name: {
+                "count": len(values),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+            }
+            for name, values in sorted(latencies.items())
+        },
+    }
+
+
+def run_inprocess(data: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    async def main():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, data, args.clients, args.requests, args.think_time, args.seed)
+    return asyncio.run(main())
+
+
+def run_uvicorn(data: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # lifespan выключен: завершение сервера не должно закрывать хранилища процесса
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port,
+                                           log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    async def main():
+        limits = httpx.Limits(max_connections=args.clients)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            return await drive(client, data, args.clients, args.requests, args.think_time, args.seed)
+    try:
+        return asyncio.run(main())
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+    report: Dict[str, Any] = {
+        "config": {key: getattr(args, key) for key in
+                   ("storage", "events", "tables", "games", "clients", "requests", "think_time", "seed")},
+        "results": {},
+    }
+    with use_dataset(args.storage, args.events, args.tables, args.games, args.seed) as data:
+        report["dataset_mb"] = data["dataset_mb"]
+        for mode in modes:
+            runner = run_inprocess if mode == "inprocess" else run_uvicorn
+            report["results"][mode] = runner(data, args)
+    # ru_maxrss в Linux - в килобайтах
+    report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Ухудшения относительно baseline больше чем на tolerance (доля)."""
+    regressions = []
+    for mode, result in report["results"].items():
+        base = baseline.get("results", {}).get(mode)
+        if base is None:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{mode}: пропускная способность {result['throughput']} < {base['throughput']}")
+        for name, stats in result["scenarios"].items():
+            base_stats = base["scenarios"].get(name)
+            if base_stats and stats["p95_ms"] > base_stats["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{mode}/{name}: p95 {stats['p95_ms']} мс > {base_stats['p95_ms']} мс")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print(f"Данные: {config['events']} x {config['tables']} x {config['games']} ({config['storage']}), "
+          f"{report['dataset_mb']} МБ; пиковый RSS {report['peak_rss_mb']} МБ")
+    for mode, result in report["results"].items():
+        print(f"\n{mode}: {result['requests']} запросов за {result['seconds']} с, {result['throughput']} запр/с")
+        print(f"  {'сценарий':<14}{'кол-во':>8}{'ошибки':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+        for name, stats in result["scenarios"].items():
+            print(f"  {name:<14}{stats['count']:>8}{stats['errors']:>8}"
+                  f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=4)
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=16, help="число одновременных клиентов")
+    parser.add_argument("--requests", type=int, default=4000, help="всего запросов на режим")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="средняя пауза клиента между запросами, с (0 - без пауз)")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="both")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="допустимое ухудшение относительно baseline (доля)")
+    parser.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    # При выводе в JSON сообщения идут в stderr, чтобы не портить отчет
+    out = sys.stderr if args.json else sys.stdout
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nBaseline записан в {args.baseline}", file=out)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("\nПараметры отличаются от baseline, сравнение пропущено", file=out)
+            return
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"РЕГРЕССИЯ {regression}", file=out)
+        if regressions:
+            sys.exit(1)
+        print("\nУхудшений относительно baseline нет", file=out)
+
+
+if __name__ == "__main__":
+    main()
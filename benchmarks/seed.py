@@ -0,0 +1,17 @@
+# benchmarks/seed.py
+"""Синтетические данные для замеров: N мероприятий x M столов x K игр."""
+from typing import Any, Dict, List, Tuple
+
+from fixtures import SyntheticTournament
+
+
+def build_dataset(events: int, tables: int, games: int,
+                  seed: int = 1) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Мероприятия со столами и играми и состояния всех игр.
+
+    Данные строит fixtures.SyntheticTournament, поэтому при одинаковом seed
+    они совпадают между запусками. Для замеров памяти состояния строятся
+    сразу, а не при первом чтении.
+    """
+    tournament = SyntheticTournament(events, tables, games, seed)
+    return tournament.events(), list(tournament.game_states().values())
@@ -0,0 +1,61 @@
+# changefeed.py
+import json
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from sqlite_store import ConnectionPool
+
+Change = Tuple[List[str], Dict[str, Any]]
+
+
+class NullChangeFeed:
+    """Лента по умолчанию: сервер работает одним процессом, сообщать некому."""
+
+    enabled = False
+
+    def append(self, topics: List[str], payload: Dict[str, Any]) -> None:
+        pass
+
+    def poll(self) -> List[Change]:
+        return []
+
+
+class SqliteChangeFeed:
+    """Лента изменений для нескольких процессов с общей базой SQLite.
+
+    Каждый процесс дописывает свои изменения в таблицу changes и читает
+    чужие записи с последнего прочитанного номера. Записи своего процесса
+    пропускаются: они уже обработаны в момент изменения. Хранятся только
+    последние keep записей.
+    """
+
+    enabled = True
+
+    def __init__(self, pool: ConnectionPool, keep: int = 10000):
+        self.pool = pool
+        self.keep = keep
+        self.origin = uuid.uuid4().hex
+        # Изменения до запуска процесса уже есть в общей базе
+        with self.pool.connection() as conn:
+            self._last = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def append(self, topics: List[str], payload: Dict[str, Any]) -> None:
+        with self.pool.connection(immediate=True) as conn:
+            seq = conn.execute(
+                "INSERT INTO changes (origin, topics, payload) VALUES (?, ?, ?)",
+                (self.origin, json.dumps(topics), json.dumps(payload, ensure_ascii=False)),
+            ).lastrowid
+            if seq % 1000 == 0:
+                conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - self.keep,))
+
+    def poll(self) -> List[Change]:
+        """Изменения других процессов, появившиеся с прошлого вызова."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT seq, origin, topics, payload FROM changes WHERE seq > ? ORDER BY seq",
+                (self._last,),
+            ).fetchall()
+        if rows:
+            self._last = rows[-1]["seq"]
+        return [(json.loads(row["topics"]), json.loads(row["payload"]))
+                for row in rows if row["origin"] != self.origin]
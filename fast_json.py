@@ -0,0 +1,34 @@
+# fast_json.py
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson не обязателен, без него работает стандартный json
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    """Кодирует данные в JSON (UTF-8) через orjson, если он установлен.
+
+    Результат совпадает с JSONResponse: ключи-числа становятся строками,
+    типы, которых нет в JSON (модели, даты), проходят через jsonable_encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=jsonable_encoder, ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, который кодирует ответ через dumps."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
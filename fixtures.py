@@ -0,0 +1,173 @@
+# fixtures.py
+"""Синтетический турнир произвольного размера для стендов и нагрузочных тестов."""
+import random
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import mock_data
+
+STATUSES = mock_data.GAME_STATUSES
+RESULTS = ("city_win", "mafia_win", "draw")
+
+_GAME_STATUSES = tuple(STATUSES.values())
+_EVENT_STATUSES = tuple(mock_data.EVENT_STATUSES.values())
+_CATEGORIES = tuple(mock_data.EVENT_CATEGORIES.values())
+_STARTED = (STATUSES["IN_PROGRESS"], STATUSES["FINISHED_NO_SCORES"], STATUSES["FINISHED_WITH_SCORES"])
+_FINISHED = (STATUSES["FINISHED_NO_SCORES"], STATUSES["FINISHED_WITH_SCORES"])
+
+_MASK = 2 ** 64 - 1
+
+# Outline: (gameStatus, номер раунда, результат или None)
+Outline = Tuple[str, int, Optional[str]]
+
+
+def parse_size(text: str) -> Tuple[int, int, int]:
+    """Размер турнира из строки вида "1000x10x8": мероприятия x столы x игры."""
+    parts = text.lower().split("x")
+    if len(parts) != 3 or not all(part.strip().isdigit() for part in parts):
+        raise ValueError(f"Ожидается размер вида 1000x10x8, получено {text!r}")
+    events, tables, games = (int(part) for part in parts)
+    return events, tables, games
+
+
+class SyntheticTournament:
+    """N мероприятий x M столов x K игр, однозначно заданные seed.
+
+    ID идут подряд с 1 отдельно для мероприятий, столов и игр. Случайные
+    значения игры выводятся из хеша пары (seed, gameId), поэтому любую игру
+    можно построить отдельно от остальных и в любом порядке: карточка игры
+    в мероприятии и ее состояние всегда согласованы, а при одинаковом seed
+    совпадают между запусками. Для карточки хватает самого хеша, генератор
+    random.Random нужен только при построении состояния.
+    """
+
+    def __init__(self, events: int, tables: int, games: int, seed: int = 1):
+        self.event_count = events
+        self.tables = tables
+        self.games = games
+        self.seed = seed
+
+    def params(self) -> Tuple[int, int, int, int]:
+        """Аргументы конструктора, по которым турнир строится заново."""
+        return self.event_count, self.tables, self.games, self.seed
+
+    @property
+    def game_count(self) -> int:
+        return self.event_count * self.tables * self.games
+
+    def _hash(self, game_id: int) -> int:
+        # splitmix64: соседние ID дают независимые значения
+        x = (self.seed * 0x9E3779B97F4A7C15 + game_id) & _MASK
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+        return x ^ (x >> 31)
+
+    @staticmethod
+    def _outline(h: int) -> Outline:
+        status = _GAME_STATUSES[h % len(_GAME_STATUSES)]
+        h //= len(_GAME_STATUSES)
+        round = h % 7 + 1 if status in _STARTED else 0
+        result = RESULTS[h // 7 % len(RESULTS)] if status in _FINISHED else None
+        return status, round, result
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Мероприятия со столами и карточками игр, без состояний."""
+        return [self.event(event_id) for event_id in range(1, self.event_count + 1)]
+
+    def event(self, event_id: int) -> Dict[str, Any]:
+        e = event_id - 1
+        return {
+            "id": event_id,
+            "name": f"Мероприятие {event_id}",
+            "description": "Синтетический турнир",
+            "date": f"2025-06-{e % 28 + 1:02d}",
+            "language": "ru" if e % 3 else "en",
+            "status": _EVENT_STATUSES[e % len(_EVENT_STATUSES)],
+            "category": _CATEGORIES[e % len(_CATEGORIES)],
+            "tables": [self._table(e, t) for t in range(self.tables)],
+        }
+
+    def _table(self, e: int, t: int) -> Dict[str, Any]:
+        table_id = e * self.tables + t + 1
+        first_game = (table_id - 1) * self.games + 1
+        return {
+            "id": table_id,
+            "name": f"Стол {t + 1}",
+            "capacity": 10,
+            "seatingType": "free",
+            "judge": mock_data.judges[t % len(mock_data.judges)]["name"],
+            "games": [self._game(e, first_game + g, g) for g in range(self.games)],
+        }
+
+    def _game(self, e: int, game_id: int, g: int) -> Dict[str, Any]:
+        status, round, result = self._outline(self._hash(game_id))
+        if status in _FINISHED:
+            progress = "finished"
+        else:
+            progress = "in_progress" if status in _STARTED else "not_started"
+        return {
+            "id": game_id,
+            "name": f"Игра #{g + 1}",
+            "created": f"2025-06-{e % 28 + 1:02d}T{18 + g % 6}:00:00",
+            "status": progress,
+            "currentRound": round,
+            "result": result,
+            "gameStatus": status,
+            "gameSubstatus": None,
+            "isCriticalRound": False,
+        }
+
+    def game_state(self, game_id: int) -> Dict[str, Any]:
+        h = self._hash(game_id)
+        status, round, result = self._outline(h)
+        rng = random.Random(h)
+        finished = status in _FINISHED
+        players = mock_data.generate_players(10, revealed=finished, rng=rng)
+        scored = status == STATUSES["FINISHED_WITH_SCORES"]
+        scores = mock_data.generate_player_scores(players, result if scored else None, rng)
+        return {
+            "gameId": game_id,
+            "round": round,
+            "isGameStarted": status == STATUSES["IN_PROGRESS"],
+            "gameStatus": status,
+            "gameSubstatus": None,
+            "isCriticalRound": False,
+            "scores": {str(player_id): score for player_id, score in scores.items()},
+            "players": players,
+            "nominatedPlayers": [],
+            "votingResults": {},
+            "shootoutPlayers": [],
+            "deadPlayers": [p["id"] for p in players if not p["isAlive"]],
+            "eliminatedPlayers": [],
+            "nightKill": None,
+            "bestMoveUsed": False,
+            "noCandidatesRounds": 0,
+            "mafiaTarget": None,
+            "donTarget": None,
+            "sheriffTarget": None,
+            "rolesVisible": finished,
+        }
+
+    def game_states(self) -> "LazyGameStates":
+        return LazyGameStates(self)
+
+
+class LazyGameStates(Mapping):
+    """gameId -> состояние игры турнира. Состояние строится при каждом
+    чтении и не запоминается: хранить его - забота хранилища."""
+
+    def __init__(self, tournament: SyntheticTournament):
+        self.tournament = tournament
+
+    def __getitem__(self, game_id: int) -> Dict[str, Any]:
+        if game_id not in self:
+            raise KeyError(game_id)
+        return self.tournament.game_state(game_id)
+
+    def __contains__(self, game_id: Any) -> bool:
+        return isinstance(game_id, int) and 1 <= game_id <= self.tournament.game_count
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(1, self.tournament.game_count + 1))
+
+    def __len__(self) -> int:
+        return self.tournament.game_count
@@ -0,0 +1,105 @@
+# game_stats.py
+from typing import Any, Dict, Optional
+
+# Поля состояния, от которых зависит каждая часть статистики
+HEADER_FIELDS = ("round", "gameStatus", "gameSubstatus", "isCriticalRound")
+ROLE_FIELDS = ("players", "deadPlayers", "eliminatedPlayers")
+SCORE_FIELDS = ("scores",)
+
+
+def _is_alive(player: Dict[str, Any]) -> bool:
+    return bool(player.get("isAlive", True)) and not player.get("isEliminated", False)
+
+
+class GameStatistics:
+    """Статистика одной игры, которая обновляется вместе с состоянием.
+
+    При изменении состояния пересчитываются только части, зависящие от
+    изменившихся полей, а готовый ответ собирается заранее, поэтому чтение
+    статистики не требует обхода игроков.
+    """
+
+    def __init__(self, game_id: int, state: Dict[str, Any]):
+        self.game_id = game_id
+        self._header: Dict[str, Any] = {}
+        self._roles: Dict[str, Any] = {}
+        self._scores: Dict[str, float] = {}
+        self._result: Dict[str, Any] = {}
+        # Новое состояние считается изменением всех полей
+        self.apply(state, dict.fromkeys(HEADER_FIELDS + ROLE_FIELDS + SCORE_FIELDS))
+
+    def apply(self, state: Dict[str, Any], changed: Dict[str, Any]) -> None:
+        """Учитывает изменение: state - состояние после него, changed - изменившиеся поля.
+
+        state может быть словарем или GameState: нужен только метод get.
+        Части пересчитываются целиком до того, как заменить прежние, поэтому
+        при исключении статистика остается прежней. Записи scores, которые не
+        являются словарями, не учитываются.
+        """
+        header, roles, scores = self._header, self._roles, self._scores
+        if any(field in changed for field in HEADER_FIELDS):
+            header = {
+                "round": state.get("round", 0),
+                "gameStatus": state.get("gameStatus"),
+                "gameSubstatus": state.get("gameSubstatus"),
+                "isCriticalRound": state.get("isCriticalRound", False),
+            }
+        if any(field in changed for field in ROLE_FIELDS):
+            roles = self._count_roles(state)
+        if any(field in changed for field in SCORE_FIELDS):
+            scores = self._count_scores(state.get("scores"))
+        self._result = {"gameId": self.game_id, **header, **roles, "scores": scores}
+        self._header, self._roles, self._scores = header, roles, scores
+
+    @staticmethod
+    def _count_scores(scores: Any) -> Dict[str, float]:
+        if not isinstance(scores, dict):
+            return {}
+        return {player_id: score.get("baseScore", 0) + score.get("additionalScore", 0)
+                for player_id, score in scores.items() if isinstance(score, dict)}
+
+    @staticmethod
+    def _count_roles(state: Dict[str, Any]) -> Dict[str, Any]:
+        players = state.get("players") or []
+        dead_players = state.get("deadPlayers") or []
+        eliminated_players = state.get("eliminatedPlayers") or []
+        # Множества вместо списков: проверка принадлежности за O(1)
+        dead = set(dead_players)
+        eliminated = set(eliminated_players)
+
+        role_stats: Dict[str, Dict[str, int]] = {}
+        alive_count = 0
+        for player in players:
+            role = player.get("originalRole", "Неизвестно")
+            stats = role_stats.get(role)
+            if stats is None:
+                stats = role_stats[role] = {"total": 0, "alive": 0, "dead": 0, "eliminated": 0}
+            stats["total"] += 1
+
+            alive = _is_alive(player)
+            alive_count += alive
+            player_id = player.get("id")
+            if player_id in dead:
+                stats["dead"] += 1
+            elif player_id in eliminated:
+                stats["eliminated"] += 1
+            elif alive:
+                stats["alive"] += 1
+
+        return {
+            "playersAlive": alive_count,
+            "playersDead": len(dead_players),
+            "playersEliminated": len(eliminated_players),
+            "roleStatistics": role_stats,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Готовый ответ эндпоинта статистики; изменять его нельзя."""
+        return self._result
+
+
+def build_statistics(game_id: int, state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Статистика, посчитанная по состоянию целиком."""
+    if state is None:
+        return None
+    return GameStatistics(game_id, state).as_dict()
@@ -0,0 +1,279 @@
+# leaderboard.py
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+FINISHED_WITH_SCORES = "finished_with_scores"
+# Категории мероприятий, игры которых идут в рейтинг
+RATED_CATEGORIES = ("tournament", "charity_tournament")
+
+CITY_ROLES = ("Мирный", "Шериф")
+MAFIA_ROLES = ("Мафия", "Дон")
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+SORT_KEYS = {
+    "total": lambda record: (record["totalScore"], record["rating"]),
+    "average": lambda record: (record["totalScore"] / record["games"], record["totalScore"]),
+    "rating": lambda record: (record["rating"], record["totalScore"]),
+}
+
+
+def _team(role: Optional[str]) -> Optional[str]:
+    if role in CITY_ROLES:
+        return "city"
+    if role in MAFIA_ROLES:
+        return "mafia"
+    return None
+
+
+def game_results(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Итоги игроков завершенной игры.
+
+    Игрок определяется по имени: номера игроков в разных играх - это места
+    за столом. Результат берется из базового балла: 1 - победа, 0.5 - ничья.
+    """
+    scores = state.get("scores") or {}
+    results = []
+    for player in state.get("players") or []:
+        player_id = player.get("id")
+        score = scores.get(str(player_id), scores.get(player_id))
+        if not isinstance(score, dict):
+            score = {}
+        base_score = score.get("baseScore", 0)
+        results.append({
+            "player": player.get("name") or f"Игрок {player_id}",
+            "role": player.get("originalRole"),
+            "score": base_score + score.get("additionalScore", 0),
+            "outcome": min(max(base_score, 0.0), 1.0),
+        })
+    return results
+
+
+class Leaderboard:
+    """Рейтинг игроков по набору игр, который обновляется по одной игре.
+
+    Суммы баллов и побед меняются на вклад добавленной или отозванной игры.
+    Рейтинг Эло зависит от порядка игр, поэтому при отзыве или исправлении
+    последней игры ее изменения рейтинга просто откатываются, а при отзыве
+    или исправлении более ранней рейтинг пересчитывается по сохраненным
+    итогам без обращения к состояниям.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._games: Dict[int, List[Dict[str, Any]]] = {}
+        self._players: Dict[str, Dict[str, Any]] = {}
+        self._rankings: Dict[str, List[Dict[str, Any]]] = {}
+
+    def __contains__(self, game_id: int) -> bool:
+        return game_id in self._games
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def games(self) -> List[int]:
+        return list(self._games)
+
+    def record(self, game_id: int, results: List[Dict[str, Any]]) -> bool:
+        """Учитывает итоги игры; повторная запись заменяет прежние итоги.
+
+        Исправленная игра остается на своем месте в последовательности игр,
+        поэтому рейтинг Эло считается в прежнем порядке.
+        """
+        previous = self._games.get(game_id)
+        last = True
+        if previous is not None:
+            if [{k: v for k, v in r.items() if k != "ratingDelta"} for r in previous] == results:
+                return False
+            last = next(reversed(self._games)) == game_id
+            self._subtract(previous)
+
+        # Замена значения не меняет место ключа в словаре игр
+        results = [dict(result) for result in results]
+        self._games[game_id] = results
+        self._add(results)
+        if last:
+            self._rate(results)
+        else:
+            self._rerate()
+        self._changed()
+        return True
+
+    def _add(self, results: List[Dict[str, Any]]) -> None:
+        for result in results:
+            record = self._players.get(result["player"])
+            if record is None:
+                record = self._players[result["player"]] = {
+                    "player": result["player"], "games": 0, "totalScore": 0.0,
+                    "wins": 0, "winsByRole": {}, "rating": INITIAL_RATING,
+                }
+            record["games"] += 1
+            record["totalScore"] += result["score"]
+            if result["outcome"] >= 1:
+                record["wins"] += 1
+                record["winsByRole"][result["role"]] = record["winsByRole"].get(result["role"], 0) + 1
+
+    def retract(self, *game_ids: int) -> bool:
+        """Убирает вклад игр из рейтинга; рейтинг Эло пересчитывается не более одного раза."""
+        removed = rerate = False
+        for game_id in game_ids:
+            if game_id not in self._games:
+                continue
+            rerate = rerate or next(reversed(self._games)) != game_id
+            self._subtract(self._games.pop(game_id))
+            removed = True
+
+        if rerate:
+            self._rerate()
+        if removed:
+            self._changed()
+        return removed
+
+    def _subtract(self, results: List[Dict[str, Any]]) -> None:
+        for result in results:
+            record = self._players[result["player"]]
+            record["games"] -= 1
+            record["totalScore"] -= result["score"]
+            record["rating"] -= result["ratingDelta"]
+            if result["outcome"] >= 1:
+                record["wins"] -= 1
+                wins_by_role = record["winsByRole"]
+                wins_by_role[result["role"]] -= 1
+                if not wins_by_role[result["role"]]:
+                    del wins_by_role[result["role"]]
+            if not record["games"]:
+                del self._players[result["player"]]
+
+    def _rate(self, results: List[Dict[str, Any]]) -> None:
+        # Каждый игрок играет против среднего рейтинга команды соперников
+        teams: Dict[str, List[float]] = {"city": [], "mafia": []}
+        for result in results:
+            team = _team(result["role"])
+            if team is not None:
+                teams[team].append(self._players[result["player"]]["rating"])
+        average = {team: sum(ratings) / len(ratings) for team, ratings in teams.items() if ratings}
+
+        for result in results:
+            team = _team(result["role"])
+            result["ratingDelta"] = 0.0
+            if team is None or len(average) < 2:
+                continue
+            opponents = average["mafia" if team == "city" else "city"]
+            rating = self._players[result["player"]]["rating"]
+            expected = 1 / (1 + 10 ** ((opponents - rating) / 400))
+            result["ratingDelta"] = K_FACTOR * (result["outcome"] - expected)
+
+        for result in results:
+            self._players[result["player"]]["rating"] += result["ratingDelta"]
+
+    def _rerate(self) -> None:
+        for record in self._players.values():
+            record["rating"] = INITIAL_RATING
+        for results in self._games.values():
+            self._rate(results)
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._rankings.clear()
+
+    def ranking(self, sort: str = "total") -> List[Dict[str, Any]]:
+        """Игроки по убыванию выбранного показателя; результат кешируется до изменения."""
+        ranking = self._rankings.get(sort)
+        if ranking is None:
+            records = sorted(self._players.values(), key=SORT_KEYS[sort], reverse=True)
+            ranking = self._rankings[sort] = [{
+                "rank": position,
+                "player": record["player"],
+                "games": record["games"],
+                "totalScore": round(record["totalScore"], 2),
+                "averageScore": round(record["totalScore"] / record["games"], 2),
+                "wins": record["wins"],
+                "winsByRole": dict(record["winsByRole"]),
+                "rating": round(record["rating"], 1),
+            } for position, record in enumerate(records, 1)]
+        return ranking
+
+
+class Leaderboards:
+    """Рейтинги турниров по мероприятиям и общий рейтинг по всем турнирам.
+
+    loader учитывает игры, завершенные до запуска: он получает функцию
+    record(event_id, game_id, state) и вызывается один раз, перед первым
+    обращением к рейтингам, а не при создании объекта.
+    """
+
+    def __init__(self, loader: Optional[Callable[[Callable[[int, int, Dict[str, Any]], None]], None]] = None):
+        self.overall = Leaderboard()
+        self._events: Dict[int, Leaderboard] = {}
+        self._game_events: Dict[int, int] = {}
+        # Игры завершаются в обработчиках из пула потоков
+        self._lock = threading.Lock()
+        self._loader = loader
+        self._load_lock = threading.Lock()
+
+    def _load(self) -> None:
+        if self._loader is None:
+            return
+        with self._load_lock:
+            # Другие потоки ждут, пока загрузка не закончится
+            if self._loader is not None:
+                self._loader(self._record)
+                self._loader = None
+
+    def __contains__(self, game_id: int) -> bool:
+        self._load()
+        return game_id in self._game_events
+
+    def event(self, event_id: int) -> Optional[Leaderboard]:
+        self._load()
+        return self._events.get(event_id)
+
+    def record(self, event_id: int, game_id: int, state: Dict[str, Any]) -> None:
+        self._load()
+        self._record(event_id, game_id, state)
+
+    def _record(self, event_id: int, game_id: int, state: Dict[str, Any]) -> None:
+        results = game_results(state)
+        with self._lock:
+            if self._game_events.get(game_id, event_id) != event_id:
+                self._retract(game_id)
+            self._game_events[game_id] = event_id
+            self._events.setdefault(event_id, Leaderboard()).record(game_id, results)
+            self.overall.record(game_id, results)
+
+    def retract(self, game_id: int) -> None:
+        self._load()
+        with self._lock:
+            self._retract(game_id)
+
+    def _retract(self, game_id: int) -> None:
+        event_id = self._game_events.pop(game_id, None)
+        if event_id is None:
+            return
+        self._events[event_id].retract(game_id)
+        self.overall.retract(game_id)
+
+    def remove_event(self, event_id: int) -> None:
+        self._load()
+        with self._lock:
+            board = self._events.pop(event_id, None)
+            if board is None:
+                return
+            for game_id in board.games():
+                del self._game_events[game_id]
+            self.overall.retract(*board.games())
+
+    @property
+    def version(self) -> int:
+        # Все учтенные игры входят в общий рейтинг, поэтому его версия
+        # меняется при любом изменении рейтингов мероприятий
+        self._load()
+        return self.overall.version
+
+    def ranking(self, event_id: Optional[int], sort: str = "total") -> List[Dict[str, Any]]:
+        """Игроки мероприятия (или всех турниров при event_id = None) по убыванию показателя."""
+        self._load()
+        with self._lock:
+            board = self.overall if event_id is None else self._events.get(event_id)
+            return board.ranking(sort) if board is not None else []
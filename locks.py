@@ -0,0 +1,49 @@
+# locks.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+
+class KeyedLocks:
+    """Замки asyncio по строковым ключам, например "game:3001" или "event:1001".
+
+    Замок создается при первом обращении и удаляется, когда его никто не
+    держит и не ждет, поэтому число замков не растет с числом игр. Несколько
+    ключей берутся в порядке сортировки, чтобы обработчики с пересекающимися
+    наборами ключей не ждали друг друга по кругу. Используется только из
+    цикла событий.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def locked(self, key: str) -> bool:
+        lock = self._locks.get(key)
+        return lock is not None and lock.locked()
+
+    @asynccontextmanager
+    async def hold(self, *keys: str) -> AsyncIterator[None]:
+        keys = sorted(set(keys))
+        for key in keys:
+            if key not in self._locks:
+                self._locks[key] = asyncio.Lock()
+            self._users[key] = self._users.get(key, 0) + 1
+
+        acquired: List[str] = []
+        try:
+            for key in keys:
+                await self._locks[key].acquire()
+                acquired.append(key)
+            yield
+        finally:
+            for key in reversed(acquired):
+                self._locks[key].release()
+            for key in keys:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    del self._locks[key]
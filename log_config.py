@@ -0,0 +1,83 @@
+# log_config.py
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Optional
+
+# Атрибуты LogRecord, которые не относятся к пользовательским полям
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись; поля из extra попадают в нее как есть."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю отладочных записей; остальные уровни не трогает."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+def setup_logging(name: str = "mafia") -> logging.Logger:
+    """Настраивает логгер приложения с неблокирующей записью через очередь.
+
+    Обработчики запросов только кладут запись в очередь, а вывод в stderr
+    выполняет отдельный поток QueueListener.
+    Уровень задается MAFIA_LOG_LEVEL, доля отладочных записей - MAFIA_LOG_SAMPLE_RATE.
+    """
+    global _listener
+
+    logger = logging.getLogger(name)
+    if _listener is not None:
+        return logger
+
+    logger.setLevel(os.environ.get("MAFIA_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    logger.handlers.clear()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(float(os.environ.get("MAFIA_LOG_SAMPLE_RATE", "1"))))
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return logger
+
+
+def shutdown_logging() -> None:
+    """Дописывает оставшиеся в очереди записи и останавливает поток вывода."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,203 @@
+# metrics.py
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин.
+
+    observe хранит счетчик только своей корзины (поиск делением пополам),
+    накопленные значения считаются при выводе.
+    """
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # labels -> [счетчики корзин (+ корзина +Inf), сумма]
+        self._series: Dict[Labels, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labels, labels, 'le="' + le + '"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Gauge:
+    """Значение, которое вычисляется в момент сбора метрик."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...],
+                 collect: Callable[[], Iterable[Tuple[Labels, float]]]):
+        self.name, self.help, self.labels, self.collect = name, help, labels, collect
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: число запросов, задержка и размер ответа по маршрутам.
+
+    Меткой служит шаблон пути маршрута (например /api/events/{event_id}),
+    а не сам путь, чтобы число временных рядов не росло с числом ID.
+    """
+
+    def __init__(self, app: Any, requests: Counter, latency: Histogram, sizes: Histogram,
+                 skip_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.requests, self.latency, self.sizes = requests, latency, sizes
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.requests.inc(method, path, str(status))
+            self.latency.observe(elapsed, method, path)
+            self.sizes.observe(size, method, path)
+
+
+class TimedStore:
+    """Обертка хранилища, которая замеряет время вызова его методов.
+
+    Методы оборачиваются при первом обращении и кешируются в обертке;
+    атрибуты, которые не являются методами, читаются напрямую.
+    """
+
+    def __init__(self, store: Any, name: str, histogram: Histogram):
+        object.__setattr__(self, "_store", store)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_histogram", histogram)
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self._store, attr)
+        if attr.startswith("_") or not callable(value):
+            return value
+
+        histogram, name = self._histogram, self._name
+
+        @wraps(value)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, name, attr)
+
+        object.__setattr__(self, attr, timed)
+        return timed
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._store, attr, value)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._store
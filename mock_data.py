@@ -2,6 +2,8 @@
 import random
 from datetime import datetime, timedelta
 
+from state_models import freeze
+
 EVENT_STATUSES = {
     "PLANNED": "planned",
     "ACTIVE": "active",
@@ -35,8 +37,12 @@ GAME_SUBSTATUS = {
     "NIGHT": "night"
 }
 
+# Генератор случайных значений тестовых данных; с фиксированным seed данные
+# одинаковы при каждом запуске
+rng = random.Random(2025)
+
 # Функция для генерации статического списка игроков
-def generate_players(count, revealed=False):
+def generate_players(count, revealed=False, rng=random):
     roles = ["Мирный", "Мирный", "Мирный", "Мирный", "Мирный", "Мирный", "Мафия", "Мафия", "Дон", "Шериф"]
     players = []
     
@@ -47,9 +53,9 @@ def generate_players(count, revealed=False):
             "name": f"Игрок {i}",
             "role": role,
             "originalRole": role,
-            "fouls": random.randint(0, 2),
+            "fouls": rng.randint(0, 2),
             "nominated": None,
-            "isAlive": True if not revealed else random.random() > 0.3,
+            "isAlive": True if not revealed else rng.random() > 0.3,
             "isEliminated": False,
             "isSilent": False,
             "silentNextRound": False
@@ -79,7 +85,7 @@ def default_players(count, revealed=False):
     return players
 
 # Функция для генерации баллов игроков
-def generate_player_scores(players, game_result=None):
+def generate_player_scores(players, game_result=None, rng=random):
     scores = {}
     
     for player in players:
@@ -101,7 +107,7 @@ def generate_player_scores(players, game_result=None):
                 base_score = 0.0
             
             # Случайные дополнительные баллы для завершенных игр
-            additional_score = round(random.uniform(-1, 2), 1)
+            additional_score = round(rng.uniform(-1, 2), 1)
         
         scores[player["id"]] = {
             "baseScore": base_score,
@@ -286,7 +292,7 @@ game_states = [
         "isCriticalRound": False,
         "scores": {str(i): {"baseScore": 0, "additionalScore": 0} for i in range(1, 11)},
         
-        "players": generate_players(10),
+        "players": generate_players(10, rng=rng),
         "nominatedPlayers": [3, 7],
         "votingResults": {},
         "shootoutPlayers": [],
@@ -309,7 +315,7 @@ game_states = [
         "gameSubstatus": None,
         "isCriticalRound": False,
         
-        "players": generate_players(10, True),
+        "players": generate_players(10, True, rng),
         "nominatedPlayers": [],
         "votingResults": {},
         "shootoutPlayers": [],
@@ -333,7 +339,7 @@ game_states = [
         "isCriticalRound": False,
         "scores": {str(i): {"baseScore": 0, "additionalScore": 0} for i in range(1, 11)},
         
-        "players": generate_players(10, True),
+        "players": generate_players(10, True, rng),
         "nominatedPlayers": [],
         "votingResults": {},
         "shootoutPlayers": [],
@@ -351,10 +357,11 @@ game_states = [
 
 # Генерируем баллы для завершенной игры
 finished_game_players = game_states[2]["players"]  # Игра 3003
-game_states[2]["scores"] = generate_player_scores(finished_game_players, "city_win")
+game_states[2]["scores"] = generate_player_scores(finished_game_players, "city_win", rng)
 
-# Дефолтное состояние игры - убираем phase полностью
-default_game_state = {
+# Дефолтное состояние игры - убираем phase полностью. Шаблон общий для всех
+# запросов, поэтому заморожен: изменить его нельзя, deepcopy дает изменяемую копию
+default_game_state = freeze({
     "round": 0,
     "isGameStarted": False,
     # Новые поля - устанавливаем статус SEATING_READY для отладки
@@ -376,4 +383,4 @@ default_game_state = {
     "donTarget": None,
     "sheriffTarget": None,
     "rolesVisible": False
-}
+})
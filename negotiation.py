@@ -0,0 +1,246 @@
+# negotiation.py
+import gzip
+import zlib
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fast_json import loads as decode_json
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен, без него ответы сжимаются gzip
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # без msgpack ответы всегда в JSON
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+
+# Типы, которые имеет смысл сжимать; потоки SSE не сжимаются, чтобы
+# сообщения доходили до клиента сразу
+COMPRESSIBLE_TYPES = (JSON, "application/x-ndjson", MSGPACK, "text/plain")
+STREAMING_TYPES = ("application/x-ndjson",)
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+VARY = "Accept, Accept-Encoding"
+
+# Представление ответа: (тип содержимого, сжатие или None)
+Representation = Tuple[str, Optional[str]]
+negotiated: ContextVar[Representation] = ContextVar("negotiated", default=(JSON, None))
+
+
+def _weights(header: Optional[str]) -> Dict[str, float]:
+    weights = {}
+    for part in (header or "").split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[token.lower()] = q
+    return weights
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Лучшее сжатие из Accept-Encoding: br (если установлен brotli), затем gzip."""
+    weights = _weights(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def choose_media(accept: Optional[str]) -> str:
+    """MessagePack, если клиент предпочитает его JSON и msgpack установлен."""
+    if msgpack is None or not accept:
+        return JSON
+    weights = _weights(accept)
+    packed = max(weights.get(alias, 0.0) for alias in MSGPACK_ALIASES)
+    plain = max(weights.get(JSON, 0.0), weights.get("application/*", 0.0), weights.get("*/*", 0.0))
+    return MSGPACK if packed > 0 and packed >= plain else JSON
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def represent(json_body: bytes, media: str, encoding: Optional[str],
+              min_size: int) -> Tuple[bytes, Optional[str]]:
+    """Тело в нужном представлении и фактически примененное сжатие.
+
+    Ответы короче min_size не сжимаются: заголовки сжатия съели бы выигрыш.
+    """
+    body = msgpack.packb(decode_json(json_body)) if media == MSGPACK else json_body
+    if encoding is None or len(body) < min_size:
+        return body, None
+    return compress(body, encoding), encoding
+
+
+def weak_etag(etag: str) -> str:
+    # Сжатое или перекодированное тело побайтно отличается от исходного
+    return etag if etag.startswith("W/") else "W/" + etag
+
+
+def negotiated_etag(etag: str) -> str:
+    """ETag в форме, которую получает клиент текущего запроса.
+
+    Форма зависит только от выбранного представления, а не от того, сжато
+    ли конкретное тело, поэтому ответы 200 и 304 одного клиента совпадают.
+    """
+    return etag if negotiated.get() == (JSON, None) else weak_etag(etag)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.process, self.finish = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.process = self._compressor.compress
+            self.finish = self._compressor.flush
+
+
+class NegotiationMiddleware:
+    """ASGI middleware: выбор представления по Accept и Accept-Encoding.
+
+    Выбранное представление кладется в negotiated, чтобы обработчики с
+    кешем ответов отдавали заранее подготовленные варианты; такие ответы
+    приходят с заголовком Vary и проходят без изменений. Остальные ответы
+    JSON перекодируются в MessagePack и сжимаются здесь, потоковые
+    ответы NDJSON сжимаются по частям.
+    """
+
+    def __init__(self, app: Any, min_size: int = 1024):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name: value.decode("latin-1") for name, value in scope["headers"]
+                   if name in (b"accept", b"accept-encoding")}
+        media = choose_media(headers.get(b"accept"))
+        encoding = choose_encoding(headers.get(b"accept-encoding"))
+        if (media, encoding) == (JSON, None):
+            await self.app(scope, receive, send)
+            return
+
+        token = negotiated.set((media, encoding))
+        start: Optional[Dict[str, Any]] = None
+        stream: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            if stream is not None:
+                body = stream.process(message.get("body", b""))
+                if not message.get("more_body", False):
+                    body += stream.finish()
+                await send({**message, "body": body})
+                return
+
+            response_headers = _Headers(start["headers"])
+            content_type = response_headers.get("content-type", "").split(";")[0].strip()
+            # Ответы из кеша уже в нужном представлении и помечены Vary: Accept-Encoding
+            negotiated_already = "accept-encoding" in response_headers.get("vary", "").lower()
+            if (start["status"] in (204, 304) or "content-encoding" in response_headers
+                    or negotiated_already or content_type not in COMPRESSIBLE_TYPES):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            _add_vary(response_headers)
+            if message.get("more_body", False):
+                if encoding is None or content_type not in STREAMING_TYPES:
+                    passthrough = True
+                    await send({**start, "headers": response_headers.items})
+                    await send(message)
+                    return
+                stream = _StreamCompressor(encoding)
+                response_headers.remove("content-length")
+                response_headers.set("content-encoding", encoding)
+                _weaken(response_headers)
+                await send({**start, "headers": response_headers.items})
+                await send({**message, "body": stream.process(message.get("body", b""))})
+                return
+
+            target = media if content_type == JSON else content_type
+            body, applied = represent(message.get("body", b""), target, encoding, self.min_size)
+            if target == MSGPACK:
+                response_headers.set("content-type", MSGPACK)
+            if applied:
+                response_headers.set("content-encoding", applied)
+            # Как и negotiated_etag: слабый ETag при любом представлении, кроме исходного
+            _weaken(response_headers)
+            response_headers.set("content-length", str(len(body)))
+            await send({**start, "headers": response_headers.items})
+            await send({**message, "body": body})
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            negotiated.reset(token)
+
+
+def _add_vary(headers: "_Headers") -> None:
+    # Vary: Origin от CORS сохраняется
+    vary = headers.get("vary")
+    headers.set("vary", f"{vary}, {VARY}" if vary else VARY)
+
+
+def _weaken(headers: "_Headers") -> None:
+    etag = headers.get("etag")
+    if etag:
+        headers.set("etag", weak_etag(etag))
+
+
+class _Headers:
+    """Заголовки ответа ASGI (список пар байтов) с заменой по имени."""
+
+    def __init__(self, items: List[Tuple[bytes, bytes]]):
+        self.items = list(items)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        key = name.encode("latin-1")
+        for item_name, value in self.items:
+            if item_name.lower() == key:
+                return value.decode("latin-1")
+        return default
+
+    def remove(self, name: str) -> None:
+        key = name.encode("latin-1")
+        self.items = [(n, v) for n, v in self.items if n.lower() != key]
+
+    def set(self, name: str, value: str) -> None:
+        self.remove(name)
+        self.items.append((name.encode("latin-1"), value.encode("latin-1")))
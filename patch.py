@@ -0,0 +1,208 @@
+# patch.py
+from copy import deepcopy
+from typing import Any, Dict, List, Tuple
+
+# Изменение в формате операции JSON Patch: {"op", "path", ["value"]}
+Change = Dict[str, Any]
+
+
+class PatchError(ValueError):
+    """Некорректный патч: неизвестная операция, неверный путь и т.п."""
+
+
+class PatchConflict(PatchError):
+    """Операция test не совпала с текущим состоянием."""
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _escape(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Разбирает JSON Pointer (RFC 6901) на список токенов."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Неверный путь: {pointer}")
+    return [_unescape(token) for token in pointer[1:].split("/")]
+
+
+def _index(container: List[Any], token: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Неверный индекс массива: {token}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Индекс вне массива: {token}")
+    return index
+
+
+def _resolve(doc: Any, tokens: List[str]) -> Any:
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise PatchError(f"Путь не найден: {token}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, token)]
+        else:
+            raise PatchError(f"Путь не найден: {token}")
+    return doc
+
+
+def _copy(container: Any, copied: Dict[int, Any]) -> Any:
+    copy = dict(container) if isinstance(container, dict) else list(container)
+    copied[id(copy)] = copy
+    return copy
+
+
+def _writable(doc: Any, tokens: List[str], copied: Dict[int, Any]) -> Any:
+    """Контейнер по пути tokens, который можно изменять.
+
+    Контейнеры на пути, еще не скопированные этим патчем, заменяются
+    поверхностными копиями; остальная часть документа остается общей с исходным.
+    copied хранит копии по id, заодно не давая их id освободиться.
+    """
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise PatchError(f"Путь не найден: {token}")
+            key: Any = token
+        elif isinstance(doc, list):
+            key = _index(doc, token)
+        else:
+            raise PatchError(f"Путь не найден: {token}")
+        child = doc[key]
+        if isinstance(child, (dict, list)) and id(child) not in copied:
+            child = doc[key] = _copy(child, copied)
+        doc = child
+    return doc
+
+
+def _add(doc: Any, tokens: List[str], value: Any, copied: Dict[int, Any]) -> Any:
+    if not tokens:
+        return value
+    parent = _writable(doc, tokens[:-1], copied)
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, key, allow_end=True), value)
+    else:
+        raise PatchError(f"Нельзя добавить значение по пути: {key}")
+    return doc
+
+
+def _remove(doc: Any, tokens: List[str], copied: Dict[int, Any]) -> Tuple[Any, Any]:
+    if not tokens:
+        raise PatchError("Нельзя удалить корень документа")
+    parent = _writable(doc, tokens[:-1], copied)
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Путь не найден: {key}")
+        return doc, parent.pop(key)
+    if isinstance(parent, list):
+        return doc, parent.pop(_index(parent, key))
+    raise PatchError(f"Путь не найден: {key}")
+
+
+def apply_json_patch(doc: Dict[str, Any], operations: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Change]]:
+    """Применяет JSON Patch (RFC 6902) к копии документа.
+
+    Возвращает новый документ и список изменений без операций test.
+    Копируются только контейнеры на путях изменений, поэтому исходный
+    документ не меняется и при ошибке в середине патча.
+    """
+    copied: Dict[int, Any] = {}
+    result = _copy(doc, copied)
+    changes = []
+
+    for operation in operations:
+        # Корень мог замениться значением из патча или перемещенным из документа
+        if isinstance(result, (dict, list)) and id(result) not in copied:
+            result = _copy(result, copied)
+        op = operation.get("op")
+        if "path" not in operation:
+            raise PatchError("В операции отсутствует path")
+        path = operation["path"]
+        tokens = parse_pointer(path)
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"В операции {op} отсутствует value")
+
+        if op == "add":
+            result = _add(result, tokens, deepcopy(operation["value"]), copied)
+            changes.append({"op": "add", "path": path, "value": operation["value"]})
+        elif op == "remove":
+            result, _ = _remove(result, tokens, copied)
+            changes.append({"op": "remove", "path": path})
+        elif op == "replace":
+            result, _ = _remove(result, tokens, copied)
+            result = _add(result, tokens, deepcopy(operation["value"]), copied)
+            changes.append({"op": "replace", "path": path, "value": operation["value"]})
+        elif op in ("move", "copy"):
+            if "from" not in operation:
+                raise PatchError(f"В операции {op} отсутствует from")
+            from_tokens = parse_pointer(operation["from"])
+            if op == "move":
+                if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                    raise PatchError("Нельзя переместить значение внутрь самого себя")
+                result, value = _remove(result, from_tokens, copied)
+                changes.append({"op": "remove", "path": operation["from"]})
+            else:
+                value = deepcopy(_resolve(result, from_tokens))
+            result = _add(result, tokens, value, copied)
+            changes.append({"op": "add", "path": path, "value": value})
+        elif op == "test":
+            if _resolve(result, tokens) != operation["value"]:
+                raise PatchConflict(f"Значение по пути {path} не совпадает")
+        else:
+            raise PatchError(f"Неизвестная операция: {op}")
+
+    if not isinstance(result, dict):
+        raise PatchError("Результат патча должен быть объектом")
+    return result, changes
+
+
+def apply_merge_patch(doc: Dict[str, Any], patch: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Change]]:
+    """Применяет JSON Merge Patch (RFC 7396) к копии документа.
+
+    Возвращает новый документ и список изменившихся листовых путей.
+    """
+    changes: List[Change] = []
+
+    def merge(target: Any, patch: Any, path: str) -> Any:
+        if not isinstance(patch, dict):
+            if target != patch:
+                changes.append({"op": "replace", "path": path, "value": patch})
+            return deepcopy(patch)
+
+        target = dict(target) if isinstance(target, dict) else {}
+        for key, value in patch.items():
+            child_path = f"{path}/{_escape(key)}"
+            if value is None:
+                if key in target:
+                    del target[key]
+                    changes.append({"op": "remove", "path": child_path})
+            else:
+                target[key] = merge(target.get(key), value, child_path)
+        return target
+
+    if not isinstance(patch, dict):
+        raise PatchError("Merge patch должен быть объектом")
+    return merge(doc, patch, ""), changes
+
+
+def changed_fields(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Поля верхнего уровня, значения которых изменились; удаленные поля - None."""
+    fields = {key: value for key, value in after.items() if before.get(key, object()) != value}
+    for key in before:
+        if key not in after:
+            fields[key] = None
+    return fields
@@ -0,0 +1,173 @@
+# persistence.py
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Запись журнала: (хранилище, операция, аргументы)
+Record = Tuple[str, str, List[Any]]
+
+
+class NullJournal:
+    """Журнал по умолчанию: изменения живут только в памяти процесса."""
+
+    snapshot_provider = None
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Record]]:
+        return None, []
+
+    def append(self, target: str, op: str, args: List[Any]) -> None:
+        pass
+
+    def compact(self, snapshot: Dict[str, Any]) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FileJournal:
+    """Журнал упреждающей записи (WAL) со снимками.
+
+    Каждая мутация хранилищ дописывается в wal.log одной JSON-строкой с
+    порядковым номером. Раз в compact_every записей текущее состояние целиком
+    сохраняется в snapshot.json, а журнал обнуляется. При старте загружается
+    снимок и проигрываются только записи после него.
+
+    fsync выполняется не на каждую запись, а раз в fsync_every записей или
+    когда с прошлой синхронизации прошло больше fsync_interval секунд. Если
+    после пачки записей новых не было, несинхронизированный хвост сбрасывает
+    таймер через fsync_interval секунд, так что граница не зависит от
+    следующей записи.
+    """
+
+    SNAPSHOT_FILE = "snapshot.json"
+    LOG_FILE = "wal.log"
+
+    def __init__(self, directory: str, fsync_every: int = 32,
+                 fsync_interval: float = 0.5, compact_every: int = 10000):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        # Функция, возвращающая полное состояние для снимка
+        self.snapshot_provider: Optional[Callable[[], Dict[str, Any]]] = None
+
+        self._snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self._log_path = os.path.join(directory, self.LOG_FILE)
+        self._lock = threading.Lock()
+        self._file = None
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Record]]:
+        """Читает последний снимок и хвост журнала после него."""
+        snapshot = None
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._seq = snapshot.get("seq", 0)
+
+        records = []
+        if os.path.exists(self._log_path):
+            with open(self._log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        seq, target, op, args = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка после аварийного завершения
+                        break
+                    # Записи, уже вошедшие в снимок, пропускаем
+                    if seq <= self._seq:
+                        continue
+                    self._seq = seq
+                    records.append((target, op, args))
+
+        self._records_since_snapshot = len(records)
+        self._file = open(self._log_path, "a", encoding="utf-8")
+        return snapshot, records
+
+    def append(self, target: str, op: str, args: List[Any]) -> None:
+        with self._lock:
+            self._seq += 1
+            self._file.write(json.dumps([self._seq, target, op, args], ensure_ascii=False) + "\n")
+            # Сбрасываем буфер сразу, чтобы падение процесса не теряло записи;
+            # дорогой fsync выполняем пакетно
+            self._file.flush()
+            self._pending += 1
+            self._records_since_snapshot += 1
+
+            if (self._pending >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self._sync_idle)
+                self._timer.daemon = True
+                self._timer.start()
+
+            if (self.compact_every and self.snapshot_provider
+                    and self._records_since_snapshot >= self.compact_every):
+                self._compact(self.snapshot_provider())
+
+    def compact(self, snapshot: Dict[str, Any]) -> None:
+        with self._lock:
+            self._compact(snapshot)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file and self._pending:
+                self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file:
+                if self._pending:
+                    self._sync()
+                self._file.close()
+                self._file = None
+
+    def _sync_idle(self) -> None:
+        with self._lock:
+            self._timer = None
+            if self._file and self._pending:
+                self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _compact(self, snapshot: Dict[str, Any]) -> None:
+        # Снимок пишем во временный файл и атомарно подменяем старый
+        tmp_path = self._snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**snapshot, "seq": self._seq}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+
+        # Записи до seq теперь в снимке, журнал можно начать заново
+        self._file.close()
+        self._file = open(self._log_path, "w", encoding="utf-8")
+        self._pending = 0
+        self._records_since_snapshot = 0
+        self._last_sync = time.monotonic()
+
+
+def replay(records: List[Record], targets: Dict[str, Any]) -> None:
+    """Повторно применяет записи журнала к хранилищам."""
+    for target, op, args in records:
+        getattr(targets[target], op)(*args)
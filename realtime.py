@@ -0,0 +1,126 @@
+# realtime.py
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Set
+
+from fast_json import dumps as encode_json
+
+
+class Message:
+    """Изменение, сериализованное один раз для всех подписчиков."""
+
+    __slots__ = ("data", "_text", "_sse")
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.data = encode_json(payload)
+        self._text: Optional[str] = None
+        self._sse: Optional[bytes] = None
+
+    @property
+    def text(self) -> str:
+        # Текстовый кадр WebSocket; строка декодируется при первом обращении
+        if self._text is None:
+            self._text = self.data.decode("utf-8")
+        return self._text
+
+    @property
+    def sse(self) -> bytes:
+        # Кадр Server-Sent Events собирается при первом обращении и переиспользуется.
+        # В JSON переводы строк экранированы, поэтому кадр остается одной строкой data
+        if self._sse is None:
+            self._sse = b"data: " + self.data + b"\n\n"
+        return self._sse
+
+
+# Отправляется медленному клиенту вместо потерянных изменений
+RESYNC = Message({"type": "resync"})
+
+
+class Subscription:
+    """Очередь изменений одного клиента.
+
+    Очередь ограничена: если клиент не успевает читать, накопленные изменения
+    отбрасываются и вместо них отправляется одно сообщение resync, после
+    которого клиент должен заново запросить полное состояние.
+    """
+
+    def __init__(self, topics: Set[str], max_queue: int):
+        self.topics = topics
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(max_queue)
+        self.resyncs = 0
+
+    def offer(self, message: Message) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.resyncs += 1
+
+    async def get(self) -> Message:
+        return await self.queue.get()
+
+
+class Hub:
+    """Рассылка изменений подписчикам по темам ("game:<id>", "event:<id>")."""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        # Публикация идет из потоков обработчиков, подписка - из цикла событий
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({sub for subs in self._subscribers.values() for sub in subs})
+
+    def subscribe(self, *topics: str) -> Subscription:
+        # Вызывается из цикла событий сервера
+        subscription = Subscription(set(topics), self.max_queue)
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topics: Any, payload: Dict[str, Any]) -> None:
+        """Отправляет изменение всем подписчикам тем; безопасно вызывать из любого потока."""
+        if not self._subscribers:
+            return
+        recipients = set()
+        with self._lock:
+            for topic in topics:
+                recipients.update(self._subscribers.get(topic, ()))
+        if not recipients:
+            return
+
+        message = Message(payload)
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        for subscription in recipients:
+            if subscription.loop is current_loop:
+                subscription.offer(message)
+            else:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, message)
+                except RuntimeError:
+                    # Цикл событий подписчика уже закрыт
+                    pass
@@ -0,0 +1,92 @@
+# response_cache.py
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from fast_json import dumps as encode_json
+
+T = TypeVar("T")
+
+
+class ResponseCache:
+    """Готовые JSON-ответы, сохраненные по ключу ресурса и его версии.
+
+    Запись действительна, пока версия ресурса не изменилась, поэтому изменения
+    через хранилище не требуют явной очистки. Явно удаляются только записи
+    удаленных ресурсов: их ID может быть выдан заново с той же версией.
+    Ключи - кортежи пути ресурса, например (event_id, table_id), чтобы
+    поддерево удалялось по префиксу. max_entries = 0 отключает кеш.
+    Рядом с JSON хранятся производные варианты тела (сжатые, MessagePack),
+    которые строятся один раз на версию ресурса.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # ключ -> (версия, JSON, производные варианты)
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[str, bytes, Dict[Hashable, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[Hashable, ...], version: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[Hashable, ...], version: str, data: Any) -> bytes:
+        """Сериализует данные и сохраняет результат; возвращает готовое тело ответа."""
+        body = encode_json(data)
+        if self.max_entries <= 0:
+            return body
+        with self._lock:
+            self._entries[key] = (version, body, {})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return body
+
+    def variant(self, key: Tuple[Hashable, ...], version: str, name: Hashable, build: Callable[[], T]) -> T:
+        """Производный вариант записи; build вызывается, только если его еще нет для этой версии."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and name in entry[2]:
+                return entry[2][name]
+        value = build()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                entry[2][name] = value
+        return value
+
+    def invalidate(self, *prefix: Hashable) -> int:
+        """Удаляет записи ресурса и всех вложенных в него ресурсов."""
+        with self._lock:
+            keys = [key for key in self._entries if key[:len(prefix)] == prefix]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / requests, 4) if requests else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,743 @@
+# sqlite_store.py
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from action_log import ActionLog, make_action
+from state_models import MISSING
+from game_stats import build_statistics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    status TEXT,
+    category TEXT,
+    language TEXT,
+    date TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_position ON events(position);
+CREATE INDEX IF NOT EXISTS idx_events_status ON events(status);
+CREATE INDEX IF NOT EXISTS idx_events_category ON events(category);
+CREATE INDEX IF NOT EXISTS idx_events_language ON events(language);
+CREATE INDEX IF NOT EXISTS idx_events_date ON events(date);
+
+CREATE TABLE IF NOT EXISTS tables (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tables_event ON tables(event_id, position);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    table_id INTEGER NOT NULL REFERENCES tables(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    status TEXT,
+    game_status TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_games_table ON games(table_id, position);
+CREATE INDEX IF NOT EXISTS idx_games_game_status ON games(game_status);
+
+CREATE TABLE IF NOT EXISTS game_states (
+    game_id INTEGER PRIMARY KEY,
+    round INTEGER,
+    game_status TEXT,
+    has_scores INTEGER NOT NULL DEFAULT 0,
+    has_players INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_game_states_game_status ON game_states(game_status);
+
+CREATE TABLE IF NOT EXISTS scores (
+    game_id INTEGER NOT NULL REFERENCES game_states(game_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    base_score REAL NOT NULL DEFAULT 0,
+    additional_score REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (game_id, player)
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    game_id INTEGER NOT NULL REFERENCES game_states(game_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    player_id INTEGER,
+    name TEXT,
+    original_role TEXT,
+    is_alive INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (game_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_players_role ON players(game_id, original_role);
+
+CREATE TABLE IF NOT EXISTS game_stats (
+    game_id INTEGER PRIMARY KEY REFERENCES game_states(game_id) ON DELETE CASCADE,
+    data TEXT NOT NULL
+);
+
+-- Журнал действий игр: seq идет подряд с 1 в пределах игры, id - общий счетчик,
+-- по которому отличаются журналы удаленной и заново созданной игры
+CREATE TABLE IF NOT EXISTS game_actions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    round INTEGER,
+    at TEXT NOT NULL,
+    delta TEXT NOT NULL,
+    removed TEXT,
+    UNIQUE (game_id, seq)
+);
+
+-- Лента изменений для остальных процессов, работающих с той же базой
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    topics TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+
+-- Версии удаленных объектов: объект, созданный заново с тем же ID, продолжает
+-- нумерацию, чтобы старые ETag не совпали с новым содержимым. Триггеры
+-- срабатывают и при каскадном удалении столов и игр
+CREATE TABLE IF NOT EXISTS retired_versions (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE TRIGGER IF NOT EXISTS retire_events AFTER DELETE ON events BEGIN
+    INSERT OR REPLACE INTO retired_versions (kind, id, version) VALUES ('events', old.id, old.version);
+END;
+CREATE TRIGGER IF NOT EXISTS revive_events AFTER INSERT ON events
+WHEN EXISTS (SELECT 1 FROM retired_versions WHERE kind = 'events' AND id = new.id) BEGIN
+    UPDATE events SET version = 1 + (SELECT version FROM retired_versions WHERE kind = 'events' AND id = new.id)
+    WHERE id = new.id;
+    DELETE FROM retired_versions WHERE kind = 'events' AND id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS retire_tables AFTER DELETE ON tables BEGIN
+    INSERT OR REPLACE INTO retired_versions (kind, id, version) VALUES ('tables', old.id, old.version);
+END;
+CREATE TRIGGER IF NOT EXISTS revive_tables AFTER INSERT ON tables
+WHEN EXISTS (SELECT 1 FROM retired_versions WHERE kind = 'tables' AND id = new.id) BEGIN
+    UPDATE tables SET version = 1 + (SELECT version FROM retired_versions WHERE kind = 'tables' AND id = new.id)
+    WHERE id = new.id;
+    DELETE FROM retired_versions WHERE kind = 'tables' AND id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS retire_games AFTER DELETE ON games BEGIN
+    INSERT OR REPLACE INTO retired_versions (kind, id, version) VALUES ('games', old.id, old.version);
+END;
+CREATE TRIGGER IF NOT EXISTS revive_games AFTER INSERT ON games
+WHEN EXISTS (SELECT 1 FROM retired_versions WHERE kind = 'games' AND id = new.id) BEGIN
+    UPDATE games SET version = 1 + (SELECT version FROM retired_versions WHERE kind = 'games' AND id = new.id)
+    WHERE id = new.id;
+    DELETE FROM retired_versions WHERE kind = 'games' AND id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS retire_game_states AFTER DELETE ON game_states BEGIN
+    INSERT OR REPLACE INTO retired_versions (kind, id, version) VALUES ('game_states', old.game_id, old.version);
+END;
+CREATE TRIGGER IF NOT EXISTS revive_game_states AFTER INSERT ON game_states
+WHEN EXISTS (SELECT 1 FROM retired_versions WHERE kind = 'game_states' AND id = new.game_id) BEGIN
+    UPDATE game_states
+    SET version = 1 + (SELECT version FROM retired_versions WHERE kind = 'game_states' AND id = new.game_id)
+    WHERE game_id = new.game_id;
+    DELETE FROM retired_versions WHERE kind = 'game_states' AND id = new.game_id;
+END;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('events_version', 1);
+"""
+
+
+class ConnectionPool:
+    """Пул соединений SQLite для обработчиков из пула потоков FastAPI.
+
+    Соединение выдается потоку на время операции. Вложенные вызовы в том же
+    потоке получают то же соединение, поэтому несколько операций хранилища
+    можно объединить в одну транзакцию.
+    """
+
+    def __init__(self, path: str, size: int = 4):
+        self.path = path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._acquire()
+        conn.executescript(SCHEMA)
+        # База, созданная до появления удаления полей в журнале действий
+        if "removed" not in {row["name"] for row in conn.execute("PRAGMA table_info(game_actions)")}:
+            conn.execute("ALTER TABLE game_actions ADD COLUMN removed TEXT")
+        self._idle.put(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """Соединение потока в транзакции; immediate сразу берет блокировку записи."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _split(record: Dict[str, Any], *exclude: str) -> str:
+    return json.dumps({k: v for k, v in record.items() if k not in exclude}, ensure_ascii=False)
+
+
+class SqliteEntityStore:
+    """Мероприятия, столы и игры в SQLite с тем же интерфейсом, что у EntityStore.
+
+    Методы возвращают новые словари, собранные из строк базы; изменять их
+    напрямую бесполезно, все изменения идут через методы хранилища.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self._pool = pool
+
+    def is_empty(self) -> bool:
+        with self._pool.connection() as conn:
+            return conn.execute("SELECT 1 FROM events LIMIT 1").fetchone() is None
+
+    def counts(self) -> Dict[str, int]:
+        with self._pool.connection() as conn:
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ("events", "tables", "games")}
+
+    def transaction(self):
+        """Одна транзакция для операций обоих хранилищ на этом пуле."""
+        return self._pool.connection(immediate=True)
+
+    # Версии
+
+    _VERSION_SQL = {
+        "event": "SELECT version FROM events WHERE id = ?",
+        "table": "SELECT version FROM tables WHERE id = ?",
+        "game": "SELECT version FROM games WHERE id = ?",
+    }
+
+    def version(self, kind: str, entity_id: Optional[int] = None) -> int:
+        with self._pool.connection() as conn:
+            if kind == "events":
+                row = conn.execute("SELECT value FROM meta WHERE key = 'events_version'").fetchone()
+            else:
+                row = conn.execute(self._VERSION_SQL[kind], (entity_id,)).fetchone()
+            return row[0] if row else 1
+
+    @staticmethod
+    def _touch(conn: sqlite3.Connection, event_id: Optional[int] = None, table_id: Optional[int] = None,
+               game_id: Optional[int] = None) -> None:
+        if game_id is not None:
+            conn.execute("UPDATE games SET version = version + 1 WHERE id = ?", (game_id,))
+        if table_id is not None:
+            conn.execute("UPDATE tables SET version = version + 1 WHERE id = ?", (table_id,))
+        if event_id is not None:
+            conn.execute("UPDATE events SET version = version + 1 WHERE id = ?", (event_id,))
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'events_version'")
+
+    # Сборка вложенных структур
+
+    @staticmethod
+    def _game(row: sqlite3.Row) -> Dict[str, Any]:
+        return {"id": row["id"], **json.loads(row["data"])}
+
+    def _games(self, conn: sqlite3.Connection, table_id: int) -> List[Dict[str, Any]]:
+        rows = conn.execute(
+            "SELECT id, data FROM games WHERE table_id = ? ORDER BY position", (table_id,))
+        return [self._game(row) for row in rows]
+
+    def _table(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+        return {"id": row["id"], **json.loads(row["data"]), "games": self._games(conn, row["id"])}
+
+    def _event(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+        tables = conn.execute(
+            "SELECT id, data FROM tables WHERE event_id = ? ORDER BY position", (row["id"],))
+        return {"id": row["id"], **json.loads(row["data"]),
+                "tables": [self._table(conn, t) for t in tables.fetchall()]}
+
+    # Запись вложенных структур
+
+    @staticmethod
+    def _next_position(conn: sqlite3.Connection, sql: str, *params: Any) -> int:
+        return conn.execute(sql, params).fetchone()[0]
+
+    def _insert_game(self, conn: sqlite3.Connection, table_id: int, game: Dict[str, Any]) -> None:
+        position = self._next_position(
+            conn, "SELECT COALESCE(MAX(position), -1) + 1 FROM games WHERE table_id = ?", table_id)
+        conn.execute(
+            "INSERT INTO games (id, table_id, position, status, game_status, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (game["id"], table_id, position, game.get("status"), game.get("gameStatus"), _split(game, "id")))
+
+    def _insert_table(self, conn: sqlite3.Connection, event_id: int, table: Dict[str, Any]) -> None:
+        position = self._next_position(
+            conn, "SELECT COALESCE(MAX(position), -1) + 1 FROM tables WHERE event_id = ?", event_id)
+        conn.execute(
+            "INSERT INTO tables (id, event_id, position, data) VALUES (?, ?, ?, ?)",
+            (table["id"], event_id, position, _split(table, "id", "games")))
+        for game in table.get("games", []):
+            self._insert_game(conn, table["id"], game)
+
+    # Мероприятия
+
+    def list_events(self) -> List[Dict[str, Any]]:
+        with self._pool.connection() as conn:
+            events = conn.execute("SELECT id, data FROM events ORDER BY position").fetchall()
+            tables = conn.execute("SELECT id, event_id, data FROM tables ORDER BY position").fetchall()
+            games = conn.execute("SELECT id, table_id, data FROM games ORDER BY position").fetchall()
+
+        # Собираем дерево за один проход по каждой таблице, без запросов на каждый стол
+        games_by_table: Dict[int, List[Dict[str, Any]]] = {}
+        for row in games:
+            games_by_table.setdefault(row["table_id"], []).append(self._game(row))
+        tables_by_event: Dict[int, List[Dict[str, Any]]] = {}
+        for row in tables:
+            tables_by_event.setdefault(row["event_id"], []).append(
+                {"id": row["id"], **json.loads(row["data"]), "games": games_by_table.get(row["id"], [])})
+        return [{"id": row["id"], **json.loads(row["data"]), "tables": tables_by_event.get(row["id"], [])}
+                for row in events]
+
+    def get_event(self, event_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT id, data FROM events WHERE id = ?", (event_id,)).fetchone()
+            return self._event(conn, row) if row else None
+
+    FILTER_FIELDS = ("status", "category", "language")
+
+    def query_events(self, filters: Dict[str, Any], date_from: Optional[str] = None,
+                     date_to: Optional[str] = None, after: Optional[int] = None,
+                     limit: Optional[int] = None,
+                     with_tables: bool = True) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """То же, что EntityStore.query_events; фильтрация выполняется по индексам таблицы events.
+
+        При with_tables=False вложенные столы и игры не читаются из базы.
+        """
+        conditions, params = [], []
+        for field, value in filters.items():
+            if field not in self.FILTER_FIELDS:
+                raise ValueError(field)
+            conditions.append(f"{field} = ?")
+            params.append(value)
+        if date_from is not None:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            # Как в EntityStore: "\uffff" больше любого суффикса даты, поэтому
+            # дата со временем в день date_to тоже попадает в выборку
+            conditions.append("date <= ?")
+            params.append(date_to + "\uffff")
+        if after is not None:
+            conditions.append("id > ?")
+            params.append(after)
+
+        sql = "SELECT id, data FROM events"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        with self._pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+            page = rows[:limit] if limit is not None else rows
+            if with_tables:
+                events = [self._event(conn, row) for row in page]
+            else:
+                events = [{"id": row["id"], **json.loads(row["data"])} for row in page]
+
+        next_cursor = page[-1]["id"] if limit is not None and len(rows) > limit and page else None
+        return events, next_cursor
+
+    def add_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        with self._pool.connection(immediate=True) as conn:
+            position = self._next_position(conn, "SELECT COALESCE(MAX(position), -1) + 1 FROM events")
+            conn.execute(
+                "INSERT INTO events (id, position, status, category, language, date, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (event["id"], position, event.get("status"), event.get("category"),
+                 event.get("language"), event.get("date"), _split(event, "id", "tables")))
+            for table in event.get("tables", []):
+                self._insert_table(conn, event["id"], table)
+            self._touch(conn)
+        return event
+
+    def update_event(self, event_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            row = conn.execute("SELECT data FROM events WHERE id = ?", (event_id,)).fetchone()
+            if row is None:
+                return None
+            event = {**json.loads(row["data"]), **data}
+            conn.execute(
+                "UPDATE events SET status = ?, category = ?, language = ?, date = ?, data = ? WHERE id = ?",
+                (event.get("status"), event.get("category"), event.get("language"), event.get("date"),
+                 _split(event, "id", "tables"), event_id))
+            if "tables" in data:
+                conn.execute("DELETE FROM tables WHERE event_id = ?", (event_id,))
+                for table in data["tables"] or []:
+                    self._insert_table(conn, event_id, table)
+            self._touch(conn, event_id)
+            return self.get_event(event_id)
+
+    def remove_event(self, event_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            event = self.get_event(event_id)
+            if event is not None:
+                conn.execute("DELETE FROM events WHERE id = ?", (event_id,))
+                self._touch(conn)
+            return event
+
+    # Столы
+
+    def table_event(self, table_id: int) -> Optional[int]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT event_id FROM tables WHERE id = ?", (table_id,)).fetchone()
+            return row["event_id"] if row else None
+
+    def get_table(self, event_id: int, table_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT id, data FROM tables WHERE id = ? AND event_id = ?", (table_id, event_id)).fetchone()
+            return self._table(conn, row) if row else None
+
+    def add_table(self, event_id: int, table: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            if conn.execute("SELECT 1 FROM events WHERE id = ?", (event_id,)).fetchone() is None:
+                return None
+            self._insert_table(conn, event_id, table)
+            self._touch(conn, event_id)
+        return table
+
+    def update_table(self, event_id: int, table_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT data FROM tables WHERE id = ? AND event_id = ?", (table_id, event_id)).fetchone()
+            if row is None:
+                return None
+            table = {**json.loads(row["data"]), **data}
+            conn.execute("UPDATE tables SET data = ? WHERE id = ?", (_split(table, "id", "games"), table_id))
+            if "games" in data:
+                conn.execute("DELETE FROM games WHERE table_id = ?", (table_id,))
+                for game in data["games"] or []:
+                    self._insert_game(conn, table_id, game)
+            self._touch(conn, event_id, table_id)
+            return self.get_table(event_id, table_id)
+
+    def remove_table(self, event_id: int, table_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            table = self.get_table(event_id, table_id)
+            if table is not None:
+                conn.execute("DELETE FROM tables WHERE id = ?", (table_id,))
+                self._touch(conn, event_id)
+            return table
+
+    # Игры
+
+    def get_game(self, event_id: int, table_id: int, game_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT g.id, g.data FROM games g JOIN tables t ON t.id = g.table_id "
+                "WHERE g.id = ? AND g.table_id = ? AND t.event_id = ?",
+                (game_id, table_id, event_id)).fetchone()
+            return self._game(row) if row else None
+
+    def locate_game(self, game_id: int) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+        """Возвращает (мероприятие, стол, игру); мероприятие и стол без вложенных списков."""
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT g.id, g.data, t.id AS table_id, t.data AS table_data, "
+                "e.id AS event_id, e.data AS event_data "
+                "FROM games g JOIN tables t ON t.id = g.table_id JOIN events e ON e.id = t.event_id "
+                "WHERE g.id = ?", (game_id,)).fetchone()
+        if row is None:
+            return None
+        event = {"id": row["event_id"], **json.loads(row["event_data"])}
+        table = {"id": row["table_id"], **json.loads(row["table_data"])}
+        return event, table, self._game(row)
+
+    def add_game(self, event_id: int, table_id: int, game: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            if self.get_table(event_id, table_id) is None:
+                return None
+            self._insert_game(conn, table_id, game)
+            self._touch(conn, event_id, table_id)
+        return game
+
+    def update_game(self, event_id: int, table_id: int, game_id: int,
+                    data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            game = self.get_game(event_id, table_id, game_id)
+            if game is None:
+                return None
+            game.update({**data, "id": game_id})
+            conn.execute(
+                "UPDATE games SET status = ?, game_status = ?, data = ? WHERE id = ?",
+                (game.get("status"), game.get("gameStatus"), _split(game, "id"), game_id))
+            self._touch(conn, event_id, table_id, game_id)
+            return game
+
+    def remove_game(self, event_id: int, table_id: int, game_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            game = self.get_game(event_id, table_id, game_id)
+            if game is not None:
+                conn.execute("DELETE FROM games WHERE id = ?", (game_id,))
+                self._touch(conn, event_id, table_id)
+            return game
+
+
+class SqliteGameStateStore:
+    """Состояния игр в SQLite с тем же интерфейсом, что у GameStateStore.
+
+    Игроки и баллы хранятся отдельными строками, остальные поля состояния -
+    JSON-документом в game_states.data. Журналы действий, прочитанные из
+    game_actions, кешируются в процессе вместе с контрольными точками и
+    дочитываются по мере появления новых записей.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self._pool = pool
+        # game_id -> (id первой записи, журнал)
+        self._logs: Dict[int, Tuple[int, ActionLog]] = {}
+        self._logs_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM game_states").fetchone()[0]
+
+    def transaction(self):
+        """Одна транзакция для операций обоих хранилищ на этом пуле."""
+        return self._pool.connection(immediate=True)
+
+    def _state(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+        game_id = row["game_id"]
+        state = {"gameId": game_id, **json.loads(row["data"])}
+        if row["has_scores"]:
+            scores = conn.execute(
+                "SELECT player, base_score, additional_score FROM scores WHERE game_id = ? ORDER BY position",
+                (game_id,))
+            state["scores"] = {s["player"]: {"baseScore": s["base_score"], "additionalScore": s["additional_score"]}
+                               for s in scores}
+        if row["has_players"]:
+            players = conn.execute(
+                "SELECT data FROM players WHERE game_id = ? ORDER BY position", (game_id,))
+            state["players"] = [json.loads(p["data"]) for p in players]
+        return state
+
+    def _write(self, conn: sqlite3.Connection, game_id: int, state: Dict[str, Any],
+               changed: Dict[str, Any]) -> None:
+        conn.execute(
+            "INSERT INTO game_states (game_id, round, game_status, has_scores, has_players, data) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (game_id) DO UPDATE SET round = excluded.round, "
+            "game_status = excluded.game_status, has_scores = excluded.has_scores, "
+            "has_players = excluded.has_players, data = excluded.data, version = game_states.version + 1",
+            (game_id, state.get("round"), state.get("gameStatus"), "scores" in state, "players" in state,
+             _split(state, "gameId", "scores", "players")))
+
+        # Дочерние строки переписываем только при изменении соответствующего поля.
+        # Записи scores, которые не являются словарями, в таблицу не попадают,
+        # как и в статистику
+        if "scores" in changed:
+            conn.execute("DELETE FROM scores WHERE game_id = ?", (game_id,))
+            conn.executemany(
+                "INSERT INTO scores (game_id, position, player, base_score, additional_score) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(game_id, i, str(player), score.get("baseScore", 0), score.get("additionalScore", 0))
+                 for i, (player, score) in enumerate((changed["scores"] or {}).items())
+                 if isinstance(score, dict)])
+        if "players" in changed:
+            conn.execute("DELETE FROM players WHERE game_id = ?", (game_id,))
+            conn.executemany(
+                "INSERT INTO players (game_id, position, player_id, name, original_role, is_alive, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(game_id, i, p.get("id"), p.get("name"), p.get("originalRole"), p.get("isAlive"),
+                  json.dumps(p, ensure_ascii=False))
+                 for i, p in enumerate(changed["players"] or [])])
+
+        # Статистика считается при записи, чтобы чтение было одним запросом
+        conn.execute(
+            "INSERT INTO game_stats (game_id, data) VALUES (?, ?) "
+            "ON CONFLICT (game_id) DO UPDATE SET data = excluded.data",
+            (game_id, json.dumps(build_statistics(game_id, state), ensure_ascii=False)))
+
+    def get(self, game_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT * FROM game_states WHERE game_id = ?", (game_id,)).fetchone()
+            return self._state(conn, row) if row else None
+
+    def peek(self, game_id: int) -> Optional[Dict[str, Any]]:
+        # Состояния всегда читаются из базы, загружать заранее нечего
+        return self.get(game_id)
+
+    def values(self) -> List[Dict[str, Any]]:
+        with self._pool.connection() as conn:
+            rows = conn.execute("SELECT * FROM game_states ORDER BY game_id").fetchall()
+            return [self._state(conn, row) for row in rows]
+
+    def version(self, game_id: int) -> int:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT version FROM game_states WHERE game_id = ?", (game_id,)).fetchone()
+            return row["version"] if row else 0
+
+    def statistics(self, game_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT data FROM game_stats WHERE game_id = ?", (game_id,)).fetchone()
+            if row is not None:
+                return json.loads(row["data"])
+            # База, созданная до появления game_stats
+            return build_statistics(game_id, self.get(game_id))
+
+    def create(self, game_id: int, state: Dict[str, Any]) -> Dict[str, Any]:
+        with self._pool.connection(immediate=True) as conn:
+            # Состояние заменяется целиком вместе с игроками и баллами
+            self._write(conn, game_id, state, {"scores": state.get("scores"), "players": state.get("players")})
+            conn.execute("DELETE FROM game_actions WHERE game_id = ?", (game_id,))
+            self._log_action(conn, game_id, "create", state.get("round"), state)
+        return state
+
+    def update(self, game_id: int, data: Dict[str, Any],
+               removed: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        """Заменяет поля из data и удаляет поля из removed."""
+        return self._update(game_id, data, "update", removed)
+
+    def set_scores(self, game_id: int, scores: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._update(game_id, {"scores": scores}, "scores")
+
+    def _update(self, game_id: int, data: Dict[str, Any], action: str,
+                removed: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            state = self.get(game_id)
+            if state is None:
+                return None
+            # В журнал действий попадают только поля, которые действительно изменились
+            delta = {key: value for key, value in data.items() if state.get(key, MISSING) != value}
+            removed_fields = [key for key in removed if key in state]
+            state.update({**data, "gameId": game_id})
+            for key in removed:
+                state.pop(key, None)
+            self._write(conn, game_id, state, {**data, **dict.fromkeys(removed)})
+            if conn.execute("SELECT 1 FROM game_actions WHERE game_id = ? LIMIT 1", (game_id,)).fetchone():
+                self._log_action(conn, game_id, action, state.get("round"), delta, removed_fields)
+            else:
+                # Игра из базы, созданной до появления журнала: журнал начинается с текущего состояния
+                self._log_action(conn, game_id, "create", state.get("round"), state)
+            return state
+
+    def undo(self, game_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            log = self._log(game_id)
+            if log is None:
+                return None
+            with self._logs_lock:
+                point = log.undo_point()
+                restored = log.state_at(point) if point is not None else None
+            if restored is None:
+                return None
+            state = {**restored, "gameId": game_id}
+            self._write(conn, game_id, state, {"scores": state.get("scores"), "players": state.get("players")})
+            self._log_action(conn, game_id, "undo", state.get("round"), state)
+            return state
+
+    def remove(self, game_id: int) -> Optional[Dict[str, Any]]:
+        with self._pool.connection(immediate=True) as conn:
+            state = self.get(game_id)
+            if state is not None:
+                conn.execute("DELETE FROM game_states WHERE game_id = ?", (game_id,))
+                conn.execute("DELETE FROM game_actions WHERE game_id = ?", (game_id,))
+            return state
+
+    # Журнал действий
+
+    def _log_action(self, conn: sqlite3.Connection, game_id: int, action: str,
+                    round: Optional[int], delta: Dict[str, Any], removed: Sequence[str] = ()) -> None:
+        record = make_action(0, action, round, delta)
+        conn.execute(
+            "INSERT INTO game_actions (game_id, seq, type, round, at, delta, removed) VALUES "
+            "(?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM game_actions WHERE game_id = ?), ?, ?, ?, ?, ?)",
+            (game_id, game_id, action, round, record["at"], json.dumps(delta, ensure_ascii=False),
+             json.dumps(list(removed)) if removed else None))
+
+    def _log(self, game_id: int) -> Optional[ActionLog]:
+        with self._pool.connection() as conn:
+            first = conn.execute(
+                "SELECT id FROM game_actions WHERE game_id = ? AND seq = 1", (game_id,)).fetchone()
+            if first is None:
+                with self._logs_lock:
+                    self._logs.pop(game_id, None)
+                return None
+
+            with self._logs_lock:
+                cached = self._logs.get(game_id)
+                if cached is None or cached[0] != first["id"]:
+                    cached = self._logs[game_id] = (first["id"], ActionLog())
+                log = cached[1]
+                rows = conn.execute(
+                    "SELECT seq, type, round, at, delta, removed FROM game_actions WHERE game_id = ? AND seq > ? "
+                    "ORDER BY seq", (game_id, len(log))).fetchall()
+                for row in rows:
+                    log.append(make_action(row["seq"], row["type"], row["round"], json.loads(row["delta"]),
+                                           at=row["at"], removed=json.loads(row["removed"] or "null")))
+                return log
+
+    def actions(self, game_id: int, after: int = 0) -> Optional[List[Dict[str, Any]]]:
+        log = self._log(game_id)
+        return log.after(after) if log is not None else None
+
+    def state_at(self, game_id: int, seq: Optional[int] = None,
+                 round: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        log = self._log(game_id)
+        if log is None:
+            return None
+        with self._logs_lock:
+            return log.state_at(seq, round)
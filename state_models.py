@@ -0,0 +1,171 @@
+# state_models.py
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class _Missing:
+    """Отметка поля, которого не было во входных данных."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING: Any = _Missing()
+
+
+class _Slotted:
+    """Запись с известными полями в слотах и прочими полями в словаре extra.
+
+    Поля, которых не было во входном словаре, не появляются и в выходном,
+    поэтому формат данных API не меняется. Методы get и in работают как у
+    словаря, чтобы код, написанный для словарей состояния, принимал и эти объекты.
+    """
+
+    __slots__ = ("extra",)
+    FIELDS: Tuple[str, ...] = ()
+    _field_set: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+
+    def __init__(self, data: Dict[str, Any]):
+        for name in self.FIELDS:
+            setattr(self, name, MISSING)
+        self.extra: Optional[Dict[str, Any]] = None
+        self.update(data)
+
+    def _convert(self, key: str, value: Any) -> Any:
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._field_set:
+            value = getattr(self, key)
+            return default if value is MISSING else value
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, MISSING) is not MISSING
+
+    def keys(self) -> Iterator[str]:
+        for name in self.FIELDS:
+            if getattr(self, name) is not MISSING:
+                yield name
+        if self.extra is not None:
+            yield from self.extra
+
+    def update(self, data: Dict[str, Any]) -> None:
+        for key, value in data.items():
+            if key in self._field_set:
+                setattr(self, key, self._convert(key, value))
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    def remove(self, keys: Iterable[str]) -> None:
+        """Удаляет поля; отсутствующие пропускаются."""
+        for key in keys:
+            if key in self._field_set:
+                setattr(self, key, MISSING)
+            elif self.extra is not None:
+                self.extra.pop(key, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {}
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            if value is not MISSING:
+                result[name] = value
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+class Player(_Slotted):
+    """Игрок за столом; поля совпадают с генератором mock_data.generate_players."""
+
+    FIELDS = ("id", "name", "role", "originalRole", "fouls", "nominated",
+              "isAlive", "isEliminated", "isSilent", "silentNextRound")
+    __slots__ = FIELDS
+
+
+class GameState(_Slotted):
+    """Состояние игры в компактном виде.
+
+    Известные поля хранятся в слотах, игроки - объектами Player, остальные
+    значения - как пришли. to_dict возвращает данные в формате API.
+    """
+
+    FIELDS = ("gameId", "round", "isGameStarted", "gameStatus", "gameSubstatus", "isCriticalRound",
+              "scores", "players", "nominatedPlayers", "votingResults", "shootoutPlayers",
+              "deadPlayers", "eliminatedPlayers", "nightKill", "bestMoveUsed", "noCandidatesRounds",
+              "mafiaTarget", "donTarget", "sheriffTarget", "rolesVisible")
+    __slots__ = FIELDS
+
+    def _convert(self, key: str, value: Any) -> Any:
+        if key == "players" and isinstance(value, list):
+            return [Player(player) if isinstance(player, dict) else player for player in value]
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = super().to_dict()
+        players = result.get("players")
+        if isinstance(players, list):
+            result["players"] = [p.to_dict() if isinstance(p, Player) else p for p in players]
+        return result
+
+
+def _read_only(self, *args: Any, **kwargs: Any) -> None:
+    raise TypeError("Шаблон доступен только для чтения")
+
+
+class FrozenDict(dict):
+    """Словарь шаблона, который нельзя изменить.
+
+    Сериализуется и сравнивается как обычный dict. deepcopy возвращает
+    обычную изменяемую копию, из которой можно собирать новое состояние.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        return thaw(self)
+
+
+class FrozenList(list):
+    """Список шаблона, который нельзя изменить; см. FrozenDict."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self) -> List[Any]:
+        return list(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Any]:
+        return thaw(self)
+
+
+def freeze(value: Any) -> Any:
+    """Неизменяемая копия значения из словарей и списков."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Изменяемая копия значения, в том числе замороженного freeze."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [thaw(item) for item in value]
+    return value
@@ -0,0 +1,788 @@
+# store.py
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from heapq import merge
+from copy import deepcopy
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from action_log import ActionLog, make_action
+from game_stats import GameStatistics
+from persistence import NullJournal
+from state_models import MISSING, GameState
+
+
+class Snapshot:
+    """Точка отката хранилища в памяти (см. snapshot и restore).
+
+    При создании снимка данные не копируются. Перед первым после снимка
+    изменением объекта хранилище кладет в saved его прежнее значение
+    (копирование при записи), поэтому снимок создается за O(1), а откат
+    затрагивает только объекты, измененные после него.
+
+    copies - объекты, созданные копированием после снимка (id -> объект):
+    их можно изменять на месте, не копируя снова.
+    """
+
+    __slots__ = ("saved", "copies")
+
+    def __init__(self):
+        self.saved: Dict[int, Any] = {}
+        self.copies: Dict[int, Any] = {}
+
+
+# Отметка игры, состояние которой к моменту снимка еще не было загружено из lazy
+_PENDING = object()
+
+
+class EntityStore:
+    """Хранилище мероприятий, столов и игр с индексами по ID.
+
+    Данные хранятся во вложенном виде (как их отдает API), а словари-индексы
+    указывают на те же объекты, поэтому поиск по ID не требует обхода списков.
+    Каждая успешная мутация записывается в journal.
+
+    Версии ведутся для списка мероприятий ("events"), каждого мероприятия,
+    стола и игры. Изменение игры увеличивает и версии ее стола и мероприятия,
+    так как они отдаются клиенту вместе с вложенными играми.
+
+    Для фильтрации списка мероприятий поддерживаются вторичные индексы по
+    статусу, категории и языку, а также отсортированные списки ID и дат.
+
+    Снимки (snapshot) сохраняют мероприятие при первом изменении его самого,
+    его столов или игр. Сохраненный объект больше не изменяется: изменение
+    копирует только путь к измененному объекту (мероприятие, список столов,
+    стол, список игр, игру), а остальные столы и игры остаются общими со
+    снимком.
+    """
+
+    FILTER_FIELDS = ("status", "category", "language")
+
+    def __init__(self, events: List[Dict[str, Any]]):
+        self.journal = NullJournal()
+        self._events_list = events
+        self._events: Dict[int, Dict[str, Any]] = {}
+        self._tables: Dict[int, Dict[str, Any]] = {}
+        self._games: Dict[int, Dict[str, Any]] = {}
+        # Обратные ссылки на родителей
+        self._table_event: Dict[int, int] = {}
+        self._game_table: Dict[int, int] = {}
+        self._versions: Dict[Tuple[str, Optional[int]], int] = {}
+        # Вторичные индексы мероприятий
+        self._by_field: Dict[str, Dict[Any, Set[int]]] = {field: {} for field in self.FILTER_FIELDS}
+        self._sorted_ids: List[int] = []
+        self._by_date: List[Tuple[str, int]] = []
+        self._snapshots: List[Snapshot] = []
+        # Порядковый номер мероприятия в списке: по нему откат возвращает мероприятия на места
+        self._order: Dict[int, int] = {}
+        self._next_order = 0
+
+        for event in events:
+            self._set_order(event["id"])
+            self._index_event(event)
+
+    def _set_order(self, event_id: int) -> None:
+        self._order[event_id] = self._next_order
+        self._next_order += 1
+
+    # Индексация
+
+    def _index_event(self, event: Dict[str, Any]) -> None:
+        self._events[event["id"]] = event
+        insort(self._sorted_ids, event["id"])
+        self._index_event_fields(event)
+        for table in event.get("tables", []):
+            self._index_table(event["id"], table)
+
+    def _index_table(self, event_id: int, table: Dict[str, Any]) -> None:
+        self._tables[table["id"]] = table
+        self._table_event[table["id"]] = event_id
+        for game in table.get("games", []):
+            self._index_game(table["id"], game)
+
+    def _index_game(self, table_id: int, game: Dict[str, Any]) -> None:
+        self._games[game["id"]] = game
+        self._game_table[game["id"]] = table_id
+
+    def _index_event_fields(self, event: Dict[str, Any]) -> None:
+        for field in self.FILTER_FIELDS:
+            self._by_field[field].setdefault(event.get(field), set()).add(event["id"])
+        if event.get("date") is not None:
+            insort(self._by_date, (str(event["date"]), event["id"]))
+
+    def _unindex_event_fields(self, event: Dict[str, Any]) -> None:
+        for field in self.FILTER_FIELDS:
+            ids = self._by_field[field].get(event.get(field))
+            if ids is not None:
+                ids.discard(event["id"])
+                if not ids:
+                    del self._by_field[field][event.get(field)]
+        if event.get("date") is not None:
+            key = (str(event["date"]), event["id"])
+            index = bisect_left(self._by_date, key)
+            if index < len(self._by_date) and self._by_date[index] == key:
+                del self._by_date[index]
+
+    def _unindex_event(self, event: Dict[str, Any]) -> None:
+        self._events.pop(event["id"], None)
+        index = bisect_left(self._sorted_ids, event["id"])
+        if index < len(self._sorted_ids) and self._sorted_ids[index] == event["id"]:
+            del self._sorted_ids[index]
+        self._unindex_event_fields(event)
+        for table in event.get("tables", []):
+            self._unindex_table(table)
+
+    def _unindex_table(self, table: Dict[str, Any]) -> None:
+        self._tables.pop(table["id"], None)
+        self._table_event.pop(table["id"], None)
+        for game in table.get("games", []):
+            self._unindex_game(game)
+
+    def _unindex_game(self, game: Dict[str, Any]) -> None:
+        self._games.pop(game["id"], None)
+        self._game_table.pop(game["id"], None)
+
+    # Версии
+
+    def version(self, kind: str, entity_id: Optional[int] = None) -> int:
+        return self._versions.get((kind, entity_id), 1)
+
+    def _bump(self, kind: str, entity_id: Optional[int] = None) -> None:
+        self._versions[(kind, entity_id)] = self.version(kind, entity_id) + 1
+
+    def _touch(self, event_id: Optional[int] = None, table_id: Optional[int] = None,
+               game_id: Optional[int] = None) -> None:
+        if game_id is not None:
+            self._bump("game", game_id)
+        if table_id is not None:
+            self._bump("table", table_id)
+        if event_id is not None:
+            self._bump("event", event_id)
+        self._bump("events")
+
+    @staticmethod
+    def _replace_item(items: List[Dict[str, Any]], item: Dict[str, Any], new: Dict[str, Any]) -> None:
+        for i, candidate in enumerate(items):
+            if candidate is item:
+                items[i] = new
+                return
+
+    @staticmethod
+    def _remove_item(items: List[Dict[str, Any]], item: Dict[str, Any]) -> None:
+        # Сравниваем по идентичности, а не по содержимому словарей
+        for i, candidate in enumerate(items):
+            if candidate is item:
+                del items[i]
+                return
+
+    def counts(self) -> Dict[str, int]:
+        return {"events": len(self._events), "tables": len(self._tables), "games": len(self._games)}
+
+    def transaction(self):
+        """Группа изменений: при исключении мероприятия откатываются к ее началу."""
+        return _rollback_on_error(self)
+
+    # Снимки
+
+    def snapshot(self) -> Snapshot:
+        snapshot = Snapshot()
+        self._snapshots.append(snapshot)
+        return snapshot
+
+    def release(self, snapshot: Snapshot) -> None:
+        """Прекращает вести снимок без отката."""
+        index = self._snapshots.index(snapshot)
+        del self._snapshots[index]
+        # Копии созданы и после предыдущего снимка, для него они тоже свои
+        if index:
+            self._snapshots[index - 1].copies.update(snapshot.copies)
+
+    def restore(self, snapshot: Snapshot) -> None:
+        """Возвращает мероприятия к моменту снимка и закрывает его вместе с
+        более поздними снимками.
+
+        Версии затронутых объектов не откатываются, а растут, чтобы ETag и
+        ключи кеша ответов не повторялись.
+        """
+        index = self._snapshots.index(snapshot)
+        del self._snapshots[index:]
+        for event_id in snapshot.saved:
+            event = self._events.get(event_id)
+            if event is not None:
+                self._remove_item(self._events_list, event)
+                self._unindex_event(event)
+                self._bump_tree(event)
+        for event_id, entry in snapshot.saved.items():
+            if entry is None:
+                self._order.pop(event_id, None)
+            else:
+                self._order[event_id] = entry[0]
+        # Сохраненное мероприятие встает на место без копирования: если оно
+        # принадлежит и внешнему снимку, следующее изменение его скопирует
+        restored = [event for _, event in sorted(
+            (entry for entry in snapshot.saved.values() if entry is not None), key=lambda entry: entry[0])]
+        # Список упорядочен по номерам, поэтому восстановленные мероприятия
+        # встают на прежние места слиянием; список меняется на месте
+        self._events_list[:] = merge(self._events_list, restored, key=lambda item: self._order[item["id"]])
+        for event in restored:
+            self._index_event(event)
+            self._bump_tree(event)
+        self._bump("events")
+        _compact_after_restore(self.journal)
+
+    def _preserve(self, event_id: int) -> None:
+        # Снимок запоминает само мероприятие: дальше изменяются только копии
+        pending = [snapshot for snapshot in self._snapshots if event_id not in snapshot.saved]
+        if not pending:
+            return
+        event = self._events.get(event_id)
+        entry = (self._order[event_id], event) if event is not None else None
+        for snapshot in pending:
+            snapshot.saved[event_id] = entry
+
+    def _fresh(self, item: Any) -> Any:
+        """item, если его можно изменять на месте, иначе его поверхностная копия."""
+        if not self._snapshots:
+            return item
+        copies = self._snapshots[-1].copies
+        if id(item) in copies:
+            return item
+        copy = item.copy()
+        copies[id(copy)] = copy
+        return copy
+
+    # Объекты, которые можно изменять: при активном снимке копируется путь
+    # от мероприятия до объекта, и индексы указывают на копии
+
+    def _writable_event(self, event_id: int) -> Dict[str, Any]:
+        self._preserve(event_id)
+        event = self._events[event_id]
+        copy = self._fresh(event)
+        if copy is not event:
+            self._replace_item(self._events_list, event, copy)
+            self._events[event_id] = copy
+        return copy
+
+    def _writable_tables(self, event_id: int) -> List[Dict[str, Any]]:
+        event = self._writable_event(event_id)
+        tables = event["tables"] = self._fresh(event.get("tables", []))
+        return tables
+
+    def _writable_table(self, event_id: int, table_id: int) -> Dict[str, Any]:
+        tables = self._writable_tables(event_id)
+        table = self._tables[table_id]
+        copy = self._fresh(table)
+        if copy is not table:
+            self._replace_item(tables, table, copy)
+            self._tables[table_id] = copy
+        return copy
+
+    def _writable_games(self, event_id: int, table_id: int) -> List[Dict[str, Any]]:
+        table = self._writable_table(event_id, table_id)
+        games = table["games"] = self._fresh(table.get("games", []))
+        return games
+
+    def _writable_game(self, event_id: int, table_id: int, game_id: int) -> Dict[str, Any]:
+        games = self._writable_games(event_id, table_id)
+        game = self._games[game_id]
+        copy = self._fresh(game)
+        if copy is not game:
+            self._replace_item(games, game, copy)
+            self._games[game_id] = copy
+        return copy
+
+    def _bump_tree(self, event: Dict[str, Any]) -> None:
+        self._bump("event", event["id"])
+        for table in event.get("tables", []):
+            self._bump("table", table["id"])
+            for game in table.get("games", []):
+                self._bump("game", game["id"])
+
+    # Мероприятия
+
+    def list_events(self) -> List[Dict[str, Any]]:
+        return self._events_list
+
+    def get_event(self, event_id: int) -> Optional[Dict[str, Any]]:
+        return self._events.get(event_id)
+
+    def query_events(self, filters: Dict[str, Any], date_from: Optional[str] = None,
+                     date_to: Optional[str] = None, after: Optional[int] = None,
+                     limit: Optional[int] = None,
+                     with_tables: bool = True) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Мероприятия по фильтрам в порядке возрастания ID, начиная после after.
+
+        filters - равенства по полям из FILTER_FIELDS. Возвращает страницу и
+        курсор следующей страницы (ID последнего мероприятия) или None.
+        with_tables оставлен для совместимости с SQLite: здесь мероприятия
+        всегда отдаются вместе с вложенными столами.
+        """
+        candidates: Optional[Set[int]] = None
+        for field, value in filters.items():
+            ids = self._by_field[field].get(value, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+
+        if date_from is not None or date_to is not None:
+            lo = bisect_left(self._by_date, (date_from,)) if date_from is not None else 0
+            # "\uffff" больше любого суффикса даты, поэтому date_to включается целиком
+            hi = bisect_right(self._by_date, (date_to + "\uffff",)) if date_to is not None else len(self._by_date)
+            ids = {event_id for _, event_id in self._by_date[lo:hi]}
+            candidates = ids if candidates is None else candidates & ids
+
+        if candidates is None:
+            start = bisect_right(self._sorted_ids, after) if after is not None else 0
+            ordered = self._sorted_ids[start:start + limit + 1] if limit is not None else self._sorted_ids[start:]
+        else:
+            ordered = sorted(i for i in candidates if after is None or i > after)
+
+        page = ordered[:limit] if limit is not None else ordered
+        next_cursor = page[-1] if limit is not None and len(ordered) > limit and page else None
+        return [self._events[i] for i in page], next_cursor
+
+    def add_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        self._preserve(event["id"])
+        self._set_order(event["id"])
+        self._events_list.append(event)
+        self._index_event(event)
+        self._touch()
+        self.journal.append("events", "add_event", [event])
+        return event
+
+    def update_event(self, event_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if event_id not in self._events:
+            return None
+        event = self._writable_event(event_id)
+
+        if "tables" in data:
+            for table in event.get("tables", []):
+                self._unindex_table(table)
+
+        self._unindex_event_fields(event)
+        event.update({**data, "id": event_id})
+        event.setdefault("tables", [])
+        self._index_event_fields(event)
+
+        if "tables" in data:
+            for table in event["tables"]:
+                self._index_table(event_id, table)
+        self._touch(event_id)
+        self.journal.append("events", "update_event", [event_id, data])
+        return event
+
+    def remove_event(self, event_id: int) -> Optional[Dict[str, Any]]:
+        event = self._events.get(event_id)
+        if event is None:
+            return None
+        self._preserve(event_id)
+        self._remove_item(self._events_list, event)
+        self._unindex_event(event)
+        del self._order[event_id]
+        self._touch()
+        self.journal.append("events", "remove_event", [event_id])
+        return event
+
+    # Столы
+
+    def table_event(self, table_id: int) -> Optional[int]:
+        """ID мероприятия, которому принадлежит стол."""
+        return self._table_event.get(table_id)
+
+    def get_table(self, event_id: int, table_id: int) -> Optional[Dict[str, Any]]:
+        if self._table_event.get(table_id) != event_id:
+            return None
+        return self._tables[table_id]
+
+    def add_table(self, event_id: int, table: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if event_id not in self._events:
+            return None
+        self._writable_tables(event_id).append(table)
+        self._index_table(event_id, table)
+        self._touch(event_id)
+        self.journal.append("events", "add_table", [event_id, table])
+        return table
+
+    def update_table(self, event_id: int, table_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.get_table(event_id, table_id) is None:
+            return None
+        table = self._writable_table(event_id, table_id)
+
+        if "games" in data:
+            for game in table.get("games", []):
+                self._unindex_game(game)
+
+        table.update({**data, "id": table_id})
+        table.setdefault("games", [])
+
+        if "games" in data:
+            for game in table["games"]:
+                self._index_game(table_id, game)
+        self._touch(event_id, table_id)
+        self.journal.append("events", "update_table", [event_id, table_id, data])
+        return table
+
+    def remove_table(self, event_id: int, table_id: int) -> Optional[Dict[str, Any]]:
+        table = self.get_table(event_id, table_id)
+        if table is None:
+            return None
+        self._remove_item(self._writable_tables(event_id), table)
+        self._unindex_table(table)
+        self._touch(event_id)
+        self.journal.append("events", "remove_table", [event_id, table_id])
+        return table
+
+    # Игры
+
+    def get_game(self, event_id: int, table_id: int, game_id: int) -> Optional[Dict[str, Any]]:
+        if self.get_table(event_id, table_id) is None:
+            return None
+        if self._game_table.get(game_id) != table_id:
+            return None
+        return self._games[game_id]
+
+    def locate_game(self, game_id: int) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+        """Возвращает (мероприятие, стол, игру) по одному ID игры."""
+        table_id = self._game_table.get(game_id)
+        if table_id is None:
+            return None
+        event_id = self._table_event[table_id]
+        return self._events[event_id], self._tables[table_id], self._games[game_id]
+
+    def add_game(self, event_id: int, table_id: int, game: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.get_table(event_id, table_id) is None:
+            return None
+        self._writable_games(event_id, table_id).append(game)
+        self._index_game(table_id, game)
+        self._touch(event_id, table_id)
+        self.journal.append("events", "add_game", [event_id, table_id, game])
+        return game
+
+    def update_game(self, event_id: int, table_id: int, game_id: int,
+                    data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.get_game(event_id, table_id, game_id) is None:
+            return None
+        game = self._writable_game(event_id, table_id, game_id)
+        game.update({**data, "id": game_id})
+        self._touch(event_id, table_id, game_id)
+        self.journal.append("events", "update_game", [event_id, table_id, game_id, data])
+        return game
+
+    def remove_game(self, event_id: int, table_id: int, game_id: int) -> Optional[Dict[str, Any]]:
+        game = self.get_game(event_id, table_id, game_id)
+        if game is None:
+            return None
+        self._remove_item(self._writable_games(event_id, table_id), game)
+        self._unindex_game(game)
+        self._touch(event_id, table_id)
+        self.journal.append("events", "remove_game", [event_id, table_id, game_id])
+        return game
+
+
+def _compact_after_restore(journal: Any) -> None:
+    # Откат не выражается операциями журнала, поэтому данные сохраняются новым снимком
+    if journal.snapshot_provider is not None:
+        journal.compact(journal.snapshot_provider())
+
+
+@contextmanager
+def _rollback_on_error(store: Any) -> Iterator[None]:
+    snapshot = store.snapshot()
+    try:
+        yield
+    except BaseException:
+        store.restore(snapshot)
+        raise
+    store.release(snapshot)
+
+
+class GameStateStore:
+    """Состояния игр, индексированные по gameId.
+
+    Для каждой игры хранится номер версии, который растет при каждом изменении,
+    статистика, которая обновляется вместе с состоянием, и журнал действий
+    для чтения прошлых состояний. Состояния хранятся объектами GameState и
+    превращаются в словари только при выдаче.
+
+    Состояние игры - это результат журнала действий, который держится
+    в памяти готовым, чтобы чтение не применяло записи: снимок хранилища
+    (action_logs) содержит только журналы, и при загрузке из него состояние
+    восстанавливается по журналу (параметр actions). Записи update и scores
+    содержат только изменившиеся поля.
+
+    Состояния из lazy (например, синтетического турнира из fixtures.py)
+    загружаются при первом обращении к игре; до этого у игры версия 1, как
+    у загруженной сразу. Если lazy при каждом чтении строит новый словарь,
+    хранилище забирает его без копирования, иначе копирует. values()
+    загружает все такие состояния, а action_logs(load=False) и pending_ids()
+    позволяют снять снимок, не загружая их: после перезапуска хранилище
+    собирается из того же lazy и списка pending.
+
+    Снимки (snapshot) сохраняют объекты игры при первом изменении после
+    снимка, дальше изменяется их копия; журнал действий только дописывается,
+    и для него запоминается длина.
+    """
+
+    def __init__(self, game_states: List[Dict[str, Any]], lazy: Optional[Mapping[int, Dict[str, Any]]] = None,
+                 pending: Optional[Iterable[int]] = None, actions: Optional[List[Dict[str, Any]]] = None):
+        self.journal = NullJournal()
+        self._states: Dict[int, GameState] = {}
+        self._versions: Dict[int, int] = {}
+        self._statistics: Dict[int, GameStatistics] = {}
+        self._logs: Dict[int, ActionLog] = {}
+        self._lazy = lazy
+        # Игры из lazy, состояния которых еще не загружены; из снимка
+        # приходит их список, так как удаленные игры в lazy остаются
+        self._pending: Set[int] = set()
+        if lazy is not None:
+            self._pending = set(lazy if pending is None else pending)
+        self._snapshots: List[Snapshot] = []
+        for state in game_states:
+            self._pending.discard(state["gameId"])
+            self._load(state)
+        for entry in actions or ():
+            self._pending.discard(entry["gameId"])
+            self._load_log(entry["gameId"], entry["actions"])
+
+    def _load(self, state: Dict[str, Any], logged: Optional[Dict[str, Any]] = None) -> GameState:
+        game_id = state["gameId"]
+        game_state = self._states[game_id] = GameState(state)
+        # После отката к снимку у незагруженной игры уже может быть версия
+        self._versions.setdefault(game_id, 1)
+        self._statistics[game_id] = GameStatistics(game_id, game_state)
+        if logged is None:
+            self._log_action(game_id, "create", state, new=True)
+        else:
+            self._log_action(game_id, "create", logged, new=True, copy=False)
+        return game_state
+
+    def _load_log(self, game_id: int, records: List[Dict[str, Any]]) -> None:
+        log = self._logs[game_id] = ActionLog()
+        for record in records:
+            log.append(record)
+        # Значения записей журнала не изменяются, состоянию нужна своя копия
+        game_state = self._states[game_id] = GameState(deepcopy(log.state_at()))
+        self._versions.setdefault(game_id, 1)
+        self._statistics[game_id] = GameStatistics(game_id, game_state)
+
+    def _state(self, game_id: int) -> Optional[GameState]:
+        state = self._states.get(game_id)
+        if state is None and game_id in self._pending:
+            self._pending.discard(game_id)
+            # Генератор (LazyGameStates) строит новый словарь при каждом чтении:
+            # вторая копия для журнала действий дешевле, чем deepcopy первой.
+            # Обычный словарь отдает один и тот же объект, который принадлежит
+            # вызывающему коду, поэтому и состояние, и запись журнала - копии
+            loaded, logged = self._lazy[game_id], self._lazy[game_id]
+            if logged is loaded:
+                loaded, logged = deepcopy(loaded), deepcopy(loaded)
+            state = self._load(loaded, logged)
+        return state
+
+    def __len__(self) -> int:
+        return len(self._states) + len(self._pending)
+
+    def loaded(self) -> int:
+        """Число игр, состояния которых уже загружены в память."""
+        return len(self._states)
+
+    def get(self, game_id: int) -> Optional[Dict[str, Any]]:
+        state = self._state(game_id)
+        return state.to_dict() if state is not None else None
+
+    def peek(self, game_id: int) -> Optional[Dict[str, Any]]:
+        """Как get, но состояние из lazy не загружается в хранилище."""
+        if game_id in self._pending:
+            return self._lazy[game_id]
+        return self.get(game_id)
+
+    def values(self) -> List[Dict[str, Any]]:
+        for game_id in sorted(self._pending):
+            self._state(game_id)
+        return [state.to_dict() for state in self._states.values()]
+
+    def action_logs(self, load: bool = True) -> List[Dict[str, Any]]:
+        """Журналы действий игр для снимка: [{"gameId", "actions"}].
+
+        При load=False игры, которые еще не загружены из lazy, пропускаются.
+        """
+        if load:
+            for game_id in sorted(self._pending):
+                self._state(game_id)
+        return [{"gameId": game_id, "actions": log.records} for game_id, log in self._logs.items()]
+
+    def pending_ids(self) -> List[int]:
+        """gameId игр из lazy, состояния которых еще не загружены."""
+        return sorted(self._pending)
+
+    def version(self, game_id: int) -> int:
+        return self._versions.get(game_id, 1 if game_id in self._pending else 0)
+
+    def statistics(self, game_id: int) -> Optional[Dict[str, Any]]:
+        self._state(game_id)
+        statistics = self._statistics.get(game_id)
+        return statistics.as_dict() if statistics is not None else None
+
+    def actions(self, game_id: int, after: int = 0) -> Optional[List[Dict[str, Any]]]:
+        self._state(game_id)
+        log = self._logs.get(game_id)
+        return log.after(after) if log is not None else None
+
+    def state_at(self, game_id: int, seq: Optional[int] = None,
+                 round: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        self._state(game_id)
+        log = self._logs.get(game_id)
+        return log.state_at(seq, round) if log is not None else None
+
+    def _log_action(self, game_id: int, action: str, delta: Dict[str, Any], new: bool = False,
+                    copy: bool = True, removed: Sequence[str] = ()) -> None:
+        if new:
+            self._logs[game_id] = ActionLog()
+        log = self._logs[game_id]
+        state = self._states[game_id]
+        # Копия отвязывает запись от словарей, которые вызывающий код может изменить
+        log.append(make_action(len(log) + 1, action, state.get("round"), deepcopy(delta) if copy else delta,
+                               removed=list(removed)))
+
+    def _bump(self, game_id: int) -> None:
+        # Версия не сбрасывается и после удаления, чтобы не повторять старые номера
+        self._versions[game_id] = self.version(game_id) + 1
+
+    def transaction(self):
+        """Группа изменений: при исключении состояния игр откатываются к ее началу."""
+        return _rollback_on_error(self)
+
+    # Снимки
+
+    def snapshot(self) -> Snapshot:
+        snapshot = Snapshot()
+        self._snapshots.append(snapshot)
+        return snapshot
+
+    def release(self, snapshot: Snapshot) -> None:
+        """Прекращает вести снимок без отката."""
+        self._snapshots.remove(snapshot)
+
+    def restore(self, snapshot: Snapshot) -> None:
+        """Возвращает состояния игр к моменту снимка и закрывает его вместе с
+        более поздними снимками. Версии затронутых игр растут."""
+        index = self._snapshots.index(snapshot)
+        del self._snapshots[index:]
+        for game_id, entry in snapshot.saved.items():
+            self._states.pop(game_id, None)
+            self._statistics.pop(game_id, None)
+            self._logs.pop(game_id, None)
+            if entry is _PENDING:
+                self._pending.add(game_id)
+            elif entry is not None:
+                state, _, log, length = entry
+                log.truncate(length)
+                # Сохраненные объекты могут принадлежать и внешним снимкам:
+                # как и в _preserve, дальше работаем с копией
+                copy = self._states[game_id] = GameState(state.to_dict())
+                self._statistics[game_id] = GameStatistics(game_id, copy)
+                self._logs[game_id] = log
+            self._bump(game_id)
+        _compact_after_restore(self.journal)
+
+    def _preserve(self, game_id: int) -> None:
+        pending = [snapshot for snapshot in self._snapshots if game_id not in snapshot.saved]
+        if not pending:
+            return
+        state = self._states.get(game_id)
+        entry = _PENDING if game_id in self._pending else None
+        if state is not None:
+            log = self._logs[game_id]
+            entry = (state, self._statistics[game_id], log, len(log))
+            # Сохраненные объекты больше не изменяются: дальше работаем с копией.
+            # Значения полей общие, изменения заменяют их, а не правят на месте
+            copy = self._states[game_id] = GameState(state.to_dict())
+            self._statistics[game_id] = GameStatistics(game_id, copy)
+        for snapshot in pending:
+            snapshot.saved[game_id] = entry
+
+    # Отмена действий
+
+    def undo(self, game_id: int) -> Optional[Dict[str, Any]]:
+        """Отменяет последнее действие игры и возвращает новое состояние;
+        None, если игры нет или отменять нечего.
+
+        Прежнее состояние восстанавливается по журналу действий от ближайшей
+        контрольной точки, отмена записывается в журнал действием undo.
+        """
+        if self._state(game_id) is None:
+            return None
+        log = self._logs[game_id]
+        point = log.undo_point()
+        if point is None:
+            return None
+        self._preserve(game_id)
+        restored = log.state_at(point)
+        game_state = self._states[game_id] = GameState(deepcopy(restored))
+        self._statistics[game_id] = GameStatistics(game_id, game_state)
+        self._bump(game_id)
+        # Значения восстановленного состояния взяты из записей журнала и не изменяются
+        self._log_action(game_id, "undo", restored, copy=False)
+        # Журнал действий попадает в снимок, поэтому при повторе журнала
+        # изменений отмена снова вычисляется по нему
+        self.journal.append("game_states", "undo", [game_id])
+        return game_state.to_dict()
+
+    def create(self, game_id: int, state: Dict[str, Any]) -> Dict[str, Any]:
+        self._preserve(game_id)
+        if game_id in self._pending:
+            # Новое состояние заменяет незагруженное, версия продолжает его версию
+            self._pending.discard(game_id)
+            self._versions.setdefault(game_id, 1)
+        game_state = self._states[game_id] = GameState(state)
+        self._statistics[game_id] = GameStatistics(game_id, game_state)
+        self._bump(game_id)
+        self._log_action(game_id, "create", state, new=True)
+        self.journal.append("game_states", "create", [game_id, state])
+        return game_state.to_dict()
+
+    def update(self, game_id: int, data: Dict[str, Any],
+               removed: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        """Заменяет поля из data и удаляет поля из removed."""
+        return self._update(game_id, data, "update", removed)
+
+    def set_scores(self, game_id: int, scores: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._update(game_id, {"scores": scores}, "scores")
+
+    def _update(self, game_id: int, data: Dict[str, Any], action: str,
+                removed: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        if self._state(game_id) is None:
+            return None
+        self._preserve(game_id)
+        state = self._states[game_id]
+        # Прежние значения полей: если статистика не посчиталась, состояние
+        # возвращается к ним, чтобы версия, журналы и статистика не отстали
+        previous = {key: state.get(key, MISSING) for key in (*data, *removed, "gameId")}
+        try:
+            state.update({**data, "gameId": game_id})
+            state.remove(removed)
+            self._statistics[game_id].apply(state, {**data, **dict.fromkeys(removed)})
+        except BaseException:
+            state.remove([key for key, value in previous.items() if value is MISSING])
+            state.update({key: value for key, value in previous.items() if value is not MISSING})
+            raise
+        self._bump(game_id)
+        # В журнал действий попадают только поля, которые действительно изменились
+        delta = {key: value for key, value in data.items() if previous[key] != value}
+        self._log_action(game_id, action, delta, removed=[key for key in removed if previous[key] is not MISSING])
+        if action == "scores":
+            self.journal.append("game_states", "set_scores", [game_id, data["scores"]])
+        elif removed:
+            self.journal.append("game_states", "update", [game_id, data, list(removed)])
+        else:
+            self.journal.append("game_states", "update", [game_id, data])
+        return state.to_dict()
+
+    def remove(self, game_id: int) -> Optional[Dict[str, Any]]:
+        if self._state(game_id) is not None:
+            self._preserve(game_id)
+        state = self._states.pop(game_id, None)
+        if state is None:
+            return None
+        del self._statistics[game_id]
+        del self._logs[game_id]
+        self._bump(game_id)
+        self.journal.append("game_states", "remove", [game_id])
+        return state.to_dict()
@@ -0,0 +1,55 @@
+# test_action_log.py
+from action_log import ActionLog, make_action
+
+def build_log(checkpoint_every=4):
+    log = ActionLog(checkpoint_every=checkpoint_every)
+    log.append(make_action(1, "create", 1, {"gameId": 1, "round": 1, "nominatedPlayers": []}))
+    for seq in range(2, 12):
+        round = seq // 3 + 1
+        log.append(make_action(seq, "update", round, {"round": round, "nominatedPlayers": [seq]}))
+    return log
+
+def test_state_at_sequence_number():
+    log = build_log()
+    assert log.state_at(seq=1) == {"gameId": 1, "round": 1, "nominatedPlayers": []}
+    assert log.state_at(seq=5)["nominatedPlayers"] == [5]
+    assert log.state_at()["nominatedPlayers"] == [11]
+    assert log.state_at(seq=0) is None
+
+def test_state_at_end_of_round():
+    log = build_log()
+    # Раунд 2 длится с третьей по пятую запись
+    assert log.state_at(round=2) == {"gameId": 1, "round": 2, "nominatedPlayers": [5]}
+    assert log.state_at(round=100) == log.state_at()
+
+def test_checkpoints_match_full_replay():
+    log = build_log()
+    expected = [log.state_at(seq=seq) for seq in range(1, 12)]
+    assert sorted(log._checkpoints) == [4, 8]
+    # Чтение с контрольных точек дает те же состояния, что и с начала журнала
+    assert [log.state_at(seq=seq) for seq in range(1, 12)] == expected
+
+def test_returned_state_does_not_change_log():
+    log = build_log()
+    state = log.state_at(seq=8)
+    state["round"] = 99
+    assert log.state_at(seq=8)["round"] == 3
+
+def test_create_replaces_state():
+    log = build_log()
+    log.append(make_action(12, "create", None, {"gameId": 1}))
+    assert log.state_at() == {"gameId": 1}
+    assert [r["seq"] for r in log.after(10)] == [11, 12]
+
+def test_undo_point_skips_undone_actions():
+    log = build_log()
+    assert log.undo_point() == 10
+    log.append(make_action(12, "undo", 4, log.state_at(seq=10)))
+    # Следующая отмена отменяет действие 10, а не предыдущую отмену
+    assert log.undo_point() == 9
+    assert log.state_at()["nominatedPlayers"] == [10]
+
+    log.truncate(1)
+    assert log.state_at() == {"gameId": 1, "round": 1, "nominatedPlayers": []}
+    assert log.undo_point() is None
+    assert not any(point > 1 for point in log._checkpoints)
@@ -1,25 +1,29 @@
 # test_app.py
+import json
+import fastapi.routing
 import pytest
 from fastapi.testclient import TestClient
+import app as app_module
 from app import app
 import mock_data
-from copy import deepcopy
 
 # Создаем тестовый клиент
 client = TestClient(app)
 
-# Фикстура для сброса данных перед каждым тестом
+# Фикстура для сброса данных после каждого теста
 @pytest.fixture(autouse=True)
 def reset_data():
-    # Сохраняем оригинальные данные
-    original_events = deepcopy(mock_data.events)
-    original_game_states = deepcopy(mock_data.game_states)
+    # Снимки хранилищ в памяти ничего не копируют: после теста откатываются
+    # только измененные им мероприятия и игры. Хранилище SQLite общее для тестов
+    if app_module.STORAGE == "sqlite":
+        yield
+        return
+    snapshots = [(target, target.snapshot()) for target in (app_module.store, app_module.game_states)]
     
     yield
     
-    # Восстанавливаем оригинальные данные после теста
-    mock_data.events = original_events
-    mock_data.game_states = original_game_states
+    for target, snapshot in snapshots:
+        target.restore(snapshot)
 
 # Тесты для корневого маршрута
 def test_read_root():
@@ -312,3 +316,391 @@ def test_game_state_with_new_fields():
     assert response.json()["gameStatus"] == "in_progress"
     assert response.json()["gameSubstatus"] == "discussion"
     assert "scores" in response.json()
+
+def test_game_state_syncs_game_status():
+    event_id = mock_data.events[0]["id"]
+    table_id = mock_data.events[0]["tables"][0]["id"]
+    game_id = mock_data.events[0]["tables"][0]["games"][0]["id"]
+
+    response = client.put(f"/api/games/{game_id}/state", json={"gameStatus": "in_progress", "round": 2})
+    assert response.status_code == 200
+
+    game = client.get(f"/api/events/{event_id}/tables/{table_id}/games/{game_id}").json()
+    assert game["status"] == "in_progress"
+    assert game["gameStatus"] == "in_progress"
+    assert game["currentRound"] == 2
+
+def test_delete_game_removes_state():
+    event_id = mock_data.events[0]["id"]
+    table_id = mock_data.events[0]["tables"][0]["id"]
+    game = client.post(f"/api/events/{event_id}/tables/{table_id}/games", json={"name": "Удаляемая игра"}).json()
+    client.put(f"/api/games/{game['id']}/state", json={"round": 1})
+    assert client.get(f"/api/games/{game['id']}/scores").status_code == 200
+
+    response = client.delete(f"/api/events/{event_id}/tables/{table_id}/games/{game['id']}")
+    assert response.status_code == 200
+    assert client.get(f"/api/games/{game['id']}/scores").status_code == 404
+
+def test_patch_game_state():
+    game_id = mock_data.game_states[1]["gameId"]
+    version = client.patch(f"/api/games/{game_id}/state", json={}).json()["version"]
+
+    operations = [{"op": "replace", "path": "/players/0/fouls", "value": 3}]
+    response = client.patch(f"/api/games/{game_id}/state", json=operations,
+                            headers={"Content-Type": "application/json-patch+json"})
+    assert response.status_code == 200
+    assert response.json()["changes"] == operations
+    assert response.json()["version"] == version + 1
+    assert client.get(f"/api/games/{game_id}/state").json()["players"][0]["fouls"] == 3
+
+def test_patch_remove_deletes_field():
+    game_id = mock_data.game_states[1]["gameId"]
+    headers = {"Content-Type": "application/json-patch+json"}
+    client.patch(f"/api/games/{game_id}/state", json=[{"op": "add", "path": "/note", "value": "x"}], headers=headers)
+    assert client.get(f"/api/games/{game_id}/state").json()["note"] == "x"
+
+    response = client.patch(f"/api/games/{game_id}/state", json=[{"op": "remove", "path": "/note"}], headers=headers)
+    assert response.status_code == 200
+    assert "note" not in client.get(f"/api/games/{game_id}/state").json()
+    # Журнал действий тоже помнит удаление
+    assert "note" not in app_module.game_states.state_at(game_id)
+
+def test_merge_patch_game_state_syncs_status():
+    event_id = mock_data.events[0]["id"]
+    table_id = mock_data.events[0]["tables"][0]["id"]
+    game_id = mock_data.events[0]["tables"][0]["games"][1]["id"]
+
+    response = client.patch(f"/api/games/{game_id}/state", json={"gameStatus": "finished_no_scores"},
+                            headers={"Content-Type": "application/merge-patch+json"})
+    assert response.status_code == 200
+    assert response.json()["changes"] == [{"op": "replace", "path": "/gameStatus", "value": "finished_no_scores"}]
+
+    game = client.get(f"/api/events/{event_id}/tables/{table_id}/games/{game_id}").json()
+    assert game["status"] == "finished"
+
+def test_non_dict_scores_keep_state_consistent():
+    game_id = mock_data.game_states[1]["gameId"]
+    etag = client.get(f"/api/games/{game_id}/state").headers["ETag"]
+    response = client.put(f"/api/games/{game_id}/state", json={"scores": {"1": 5}})
+    assert response.status_code == 200
+    # Запись не словарем статистика пропускает, версия и ETag меняются
+    assert client.get(f"/api/games/{game_id}/statistics").json()["scores"] == {}
+    assert client.get(f"/api/games/{game_id}/state").headers["ETag"] != etag
+
+    response = client.patch(f"/api/games/{game_id}/state", json=[{"op": "add", "path": "/scores/zz", "value": 1}],
+                            headers={"Content-Type": "application/json-patch+json"})
+    assert response.status_code == 200
+    assert client.get(f"/api/games/{game_id}/statistics").json()["scores"] == {}
+
+def test_patch_game_state_errors():
+    game_id = mock_data.game_states[1]["gameId"]
+    response = client.patch(f"/api/games/{game_id}/state", json=[{"op": "test", "path": "/round", "value": -1}],
+                            headers={"Content-Type": "application/json-patch+json"})
+    assert response.status_code == 409
+    response = client.patch(f"/api/games/{game_id}/state", json=[{"op": "remove", "path": "/missing"}],
+                            headers={"Content-Type": "application/json-patch+json"})
+    assert response.status_code == 422
+    assert client.patch("/api/games/9999999/state", json={"round": 1}).status_code == 404
+
+def test_conditional_get_game_state():
+    game_id = mock_data.game_states[1]["gameId"]
+    response = client.get(f"/api/games/{game_id}/state")
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/api/games/{game_id}/state", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    client.patch(f"/api/games/{game_id}/state", json={"round": 6})
+    response = client.get(f"/api/games/{game_id}/state", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_conditional_get_event_follows_nested_changes():
+    event_id = mock_data.events[0]["id"]
+    table_id = mock_data.events[0]["tables"][0]["id"]
+    game_id = mock_data.events[0]["tables"][0]["games"][0]["id"]
+    event_etag = client.get(f"/api/events/{event_id}").headers["ETag"]
+    list_etag = client.get("/api/events").headers["ETag"]
+    assert client.get("/api/events", headers={"If-None-Match": list_etag}).status_code == 304
+
+    client.put(f"/api/events/{event_id}/tables/{table_id}/games/{game_id}", json={"name": "Новое имя"})
+    assert client.get(f"/api/events/{event_id}", headers={"If-None-Match": event_etag}).status_code == 200
+    assert client.get("/api/events", headers={"If-None-Match": list_etag}).status_code == 200
+
+def test_if_match_precondition():
+    game_id = mock_data.game_states[1]["gameId"]
+    etag = client.get(f"/api/games/{game_id}/state").headers["ETag"]
+
+    response = client.put(f"/api/games/{game_id}/state", json={"round": 7}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    new_etag = response.headers["ETag"]
+
+    # Второй судья с устаревшей версией получает отказ
+    response = client.patch(f"/api/games/{game_id}/state", json={"round": 8}, headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert client.get(f"/api/games/{game_id}/state").json()["round"] == 7
+
+    response = client.patch(f"/api/games/{game_id}/state", json={"round": 8}, headers={"If-Match": new_etag})
+    assert response.status_code == 200
+
+    event_id = mock_data.events[0]["id"]
+    response = client.put(f"/api/events/{event_id}", json={"name": "Имя"}, headers={"If-Match": '"event-0-0"'})
+    assert response.status_code == 412
+
+def test_websocket_receives_state_changes():
+    game_id = mock_data.game_states[1]["gameId"]
+    event_id = mock_data.events[0]["id"]
+    with client.websocket_connect(f"/ws/games/{game_id}") as game_ws, \
+            client.websocket_connect(f"/ws/events/{event_id}") as event_ws:
+        client.put(f"/api/games/{game_id}/state", json={"round": 4})
+        message = game_ws.receive_json()
+        assert message["type"] == "state"
+        assert message["delta"] == {"round": 4}
+        assert event_ws.receive_json() == message
+
+        client.put(f"/api/games/{game_id}/scores", json={"1": {"baseScore": 1, "additionalScore": 0}})
+        assert game_ws.receive_json()["type"] == "scores"
+
+def test_get_events_filters_and_pagination():
+    response = client.get("/api/events", params={"status": "planned", "limit": 1})
+    assert response.status_code == 200
+    assert [e["status"] for e in response.json()] == ["planned"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/events", params={"status": "planned", "limit": 1, "cursor": cursor})
+    assert len(response.json()) == 1
+    assert str(response.json()[0]["id"]) != cursor
+
+    assert client.get("/api/events", params={"status": "unknown"}).status_code == 422
+
+def test_get_events_projection():
+    response = client.get("/api/events", params={"fields": "name,date"})
+    assert all(set(e) == {"id", "name", "date"} for e in response.json())
+
+    response = client.get("/api/events", params={"include": "tables", "language": "ru"})
+    event = next(e for e in response.json() if e["id"] == mock_data.events[0]["id"])
+    assert "games" not in event["tables"][0]
+    assert "name" in event
+
+def test_tournament_leaderboard():
+    event = client.post("/api/events", json={"name": "Кубок", "date": "2025-10-01",
+                                             "category": "tournament"}).json()
+    table = client.post(f"/api/events/{event['id']}/tables", json={"name": "Стол"}).json()
+    game = client.post(f"/api/events/{event['id']}/tables/{table['id']}/games", json={"name": "Игра"}).json()
+    players = [{"id": 1, "name": "Анна", "originalRole": "Мирный"},
+               {"id": 2, "name": "Борис", "originalRole": "Мафия"}]
+
+    client.put(f"/api/games/{game['id']}/state", json={"players": players, "gameStatus": "in_progress"})
+    assert client.get(f"/api/events/{event['id']}/leaderboard").json() == []
+
+    client.put(f"/api/games/{game['id']}/state", json={
+        "gameStatus": "finished_with_scores",
+        "scores": {"1": {"baseScore": 1, "additionalScore": 0.5}, "2": {"baseScore": 0, "additionalScore": 0}},
+    })
+    response = client.get(f"/api/events/{event['id']}/leaderboard")
+    leaders = response.json()
+    assert [p["player"] for p in leaders] == ["Анна", "Борис"]
+    assert leaders[0]["totalScore"] == 1.5
+    assert client.get(f"/api/events/{event['id']}/leaderboard",
+                      headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    # Исправление баллов завершенной игры меняет рейтинг
+    client.put(f"/api/games/{game['id']}/scores", json={"1": {"baseScore": 0}, "2": {"baseScore": 1}})
+    leaders = client.get(f"/api/events/{event['id']}/leaderboard", params={"sort": "rating"}).json()
+    assert leaders[0]["player"] == "Борис"
+    assert any(p["player"] == "Борис" for p in client.get("/api/leaderboard").json())
+
+    client.delete(f"/api/events/{event['id']}")
+    assert not any(p["player"] == "Борис" for p in client.get("/api/leaderboard").json())
+
+def test_leaderboard_only_for_tournaments():
+    event = client.post("/api/events", json={"name": "Вечер", "date": "2025-10-02", "category": "funky"}).json()
+    assert client.get(f"/api/events/{event['id']}/leaderboard").status_code == 404
+
+def test_response_cache_hits_and_invalidation():
+    event_id = mock_data.events[0]["id"]
+    before = client.get("/api/cache/stats").json()
+    first = client.get(f"/api/events/{event_id}")
+    second = client.get(f"/api/events/{event_id}")
+    assert first.content == second.content
+    assert client.get("/api/cache/stats").json()["hits"] > before["hits"]
+
+    client.put(f"/api/events/{event_id}", json={"name": "Новое название"})
+    assert client.get(f"/api/events/{event_id}").json()["name"] == "Новое название"
+
+    # Пересоздание игры после удаления не отдает старый ответ
+    event = client.post("/api/events", json={"name": "Кеш", "date": "2025-11-01"}).json()
+    table = client.post(f"/api/events/{event['id']}/tables", json={"name": "Стол"}).json()
+    game = client.post(f"/api/events/{event['id']}/tables/{table['id']}/games", json={"name": "Старая"}).json()
+    url = f"/api/events/{event['id']}/tables/{table['id']}/games/{game['id']}"
+    assert client.get(url).json()["name"] == "Старая"
+    client.delete(url)
+    assert client.get(url).status_code == 404
+
+def test_metrics_endpoint():
+    event_id = mock_data.events[0]["id"]
+    client.get(f"/api/events/{event_id}")
+    text = client.get("/metrics").text
+    assert ('mafia_http_requests_total{method="GET",route="/api/events/{event_id}",status="200"}' in text)
+    assert 'mafia_http_request_duration_seconds_bucket{method="GET",route="/api/events/{event_id}",le="+Inf"}' in text
+    assert 'mafia_store_entities{kind="events"}' in text
+    assert 'mafia_store_operation_duration_seconds_count{store="entities",operation="version"}' in text
+    assert 'mafia_stream_clients{transport="websocket"} 0' in text
+
+def test_setup_event_in_one_request():
+    seating = [{"id": i, "name": f"Участник {i}", "role": "Мафия" if i in (3, 7) else None} for i in range(1, 11)]
+    response = client.post("/api/events/1002/setup", json={"tables": [
+        {"name": "Стол А", "games": [{"name": "Игра 1", "seating": seating}, {"name": "Игра 2"}]},
+        {"name": "Стол Б", "games": [{"name": "Игра 3", "state": {"round": 0}}]},
+    ]})
+    assert response.status_code == 201
+    tables = response.json()["tables"]
+    assert [t["created"] for t in tables] == [True, True]
+    game_ids = [g["id"] for t in tables for g in t["games"]]
+    assert len(set(game_ids)) == 3
+    assert [g["state"] for t in tables for g in t["games"]] == [True, False, True]
+
+    state = client.get(f"/api/games/{game_ids[0]}/state").json()
+    assert [p["name"] for p in state["players"]] == [f"Участник {i}" for i in range(1, 11)]
+    assert state["players"][2]["originalRole"] == "Мафия"
+    assert state["players"][0]["role"] == "Мирный"
+    game = client.get(f"/api/events/1002/tables/{tables[0]['id']}/games/{game_ids[1]}").json()
+    assert game["name"] == "Игра 2"
+
+    # Повторный пакет обновляет существующие столы и игры
+    response = client.post("/api/events/1002/setup", json={"tables": [
+        {"id": tables[0]["id"], "judge": "Ведущий", "games": [{"id": game_ids[1], "seating": seating[:2]}]},
+    ]})
+    assert response.status_code == 201
+    assert response.json()["tables"][0]["games"][0]["created"] is False
+    assert client.get(f"/api/events/1002/tables/{tables[0]['id']}").json()["judge"] == "Ведущий"
+    assert len(client.get(f"/api/games/{game_ids[1]}/state").json()["players"]) == 2
+
+def test_setup_event_is_all_or_nothing():
+    tables_before = client.get("/api/events/1002/tables").json()
+    response = client.post("/api/events/1002/setup", json={"tables": [
+        {"name": "Новый стол", "games": [{"name": "Игра"}]},
+        {"id": 999999, "games": []},
+    ]})
+    assert response.status_code == 404
+    assert client.get("/api/events/1002/tables").json() == tables_before
+
+    seating = [{"id": 1, "name": "Участник"}, {"id": 1, "name": "Другой"}]
+    response = client.post("/api/events/1002/setup", json={"tables": [{"games": [{"seating": seating}]}]})
+    assert response.status_code == 422
+    assert client.get("/api/events/1002/tables").json() == tables_before
+
+def test_game_replay_and_past_states():
+    # Новое состояние, чтобы журнал не зависел от других тестов
+    game_id = 424242
+    client.put(f"/api/games/{game_id}/state", json={"round": 1, "nominatedPlayers": [2]})
+    client.put(f"/api/games/{game_id}/state", json={"round": 2, "nominatedPlayers": [5]})
+    client.put(f"/api/games/{game_id}/scores", json={"1": {"baseScore": 1, "additionalScore": 0}})
+
+    response = client.get(f"/api/games/{game_id}/replay")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    actions = [json.loads(line) for line in response.text.splitlines()]
+    assert actions[-1]["type"] == "scores"
+    assert actions[-2]["delta"] == {"round": 2, "nominatedPlayers": [5]}
+    assert [a["seq"] for a in actions] == list(range(1, len(actions) + 1))
+
+    tail = client.get(f"/api/games/{game_id}/replay", params={"after": len(actions) - 1}).text.splitlines()
+    assert len(tail) == 1
+
+    assert client.get(f"/api/games/{game_id}/state", params={"round": 1}).json()["nominatedPlayers"] == [2]
+    past = client.get(f"/api/games/{game_id}/state", params={"seq": len(actions) - 1}).json()
+    assert past["nominatedPlayers"] == [5]
+    assert client.get("/api/games/999999/state", params={"seq": 1}).status_code == 404
+    assert client.get("/api/games/999999/replay").status_code == 404
+
+def test_undo_game_action():
+    game_id = mock_data.game_states[1]["gameId"]
+    original = client.get(f"/api/games/{game_id}/state").json()
+    client.put(f"/api/games/{game_id}/state", json={"round": 4, "gameStatus": "finished_no_scores"})
+    etag = client.get(f"/api/games/{game_id}/state").headers["etag"]
+    assert client.post(f"/api/games/{game_id}/undo", headers={"If-Match": '"stale"'}).status_code == 412
+
+    response = client.post(f"/api/games/{game_id}/undo", headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == original and response.headers["etag"] != etag
+    # Статус игры в мероприятии возвращается вместе с состоянием
+    assert client.get("/api/events/1001/tables/2001/games/3002").json()["gameStatus"] == original["gameStatus"]
+
+    # Создание состояния не отменяется
+    client.put("/api/games/424243/state", json={"round": 1})
+    assert client.post("/api/games/424243/undo").status_code == 409
+    assert client.post("/api/games/999999/undo").status_code == 404
+
+def test_default_state_is_not_shared():
+    state = client.get("/api/games/999999/state").json()
+    state["players"].append({"id": 11})
+    assert len(mock_data.default_game_state["players"]) == 10
+    with pytest.raises(TypeError):
+        mock_data.default_game_state["round"] = 5
+
+def test_export_and_import_archive():
+    response = client.get("/api/export", params={"eventId": 1001})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[0] == {"kind": "event", "data": {k: v for k, v in client.get("/api/events/1001").json().items()
+                                                    if k != "tables"}}
+    assert {r["kind"] for r in records} == {"event", "table", "game", "state"}
+
+    # Архив переносится в новое мероприятие с новыми ID
+    lines = []
+    for record in records:
+        record = json.loads(json.dumps(record))
+        if record["kind"] == "state":
+            record["data"]["gameId"] += 900000
+        else:
+            record["data"]["id"] += 900000
+            for parent in ("eventId", "tableId"):
+                if parent in record:
+                    record[parent] += 900000
+        lines.append(json.dumps(record, ensure_ascii=False))
+    body = ("\n".join(lines) + "\n").encode()
+    response = client.post("/api/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["imported"]["event"] == 1
+    assert response.json()["imported"]["state"] == sum(r["kind"] == "state" for r in records)
+
+    copied = client.get("/api/events/901001").json()
+    assert len(copied["tables"]) == len(client.get("/api/events/1001").json()["tables"])
+    assert client.get("/api/games/903002/state").json()["round"] == client.get("/api/games/3002/state").json()["round"]
+
+    # Повторная загрузка обновляет те же объекты
+    assert client.post("/api/import", content=body).status_code == 200
+    assert len(client.get("/api/events/901001").json()["tables"]) == len(copied["tables"])
+    client.delete("/api/events/901001")
+
+def test_import_reports_bad_line():
+    body = b'{"kind": "event", "data": {"id": 905000, "name": "A", "status": "planned"}}\n{oops\n'
+    response = client.post("/api/import", content=body)
+    assert response.status_code == 422
+    assert "Строка 2" in response.json()["detail"]
+    client.delete("/api/events/905000")
+
+def test_import_rolls_back_failed_batch():
+    # Ошибка в пакете отменяет и его строки, загруженные до нее
+    body = (b'{"kind": "event", "data": {"id": 906000, "name": "A", "status": "planned"}}\n'
+            b'{"kind": "state", "data": {"gameId": 906001, "round": 1}}\n'
+            b'{"kind": "table", "eventId": 1002, "data": {"id": 2001}}\n')
+    response = client.post("/api/import", content=body)
+    assert response.status_code == 422
+    assert "Строка 3" in response.json()["detail"]
+    assert client.get("/api/events/906000").status_code == 404
+    assert app_module.game_states.get(906001) is None
+
+def test_mutation_responses_skip_jsonable_encoder(monkeypatch):
+    # Ответы изменений кодируются сразу, без обхода данных jsonable_encoder
+    def fail(*args, **kwargs):
+        raise AssertionError("jsonable_encoder")
+    monkeypatch.setattr(fastapi.routing, "jsonable_encoder", fail)
+
+    response = client.post("/api/events", json={"name": "Быстрый", "date": "2025-07-01", "status": "planned"})
+    assert response.status_code == 201
+    event_id = response.json()["id"]
+    response = client.put("/api/games/3002/state", json={"round": 2})
+    assert response.status_code == 200 and response.headers["ETag"]
+    assert client.delete(f"/api/events/{event_id}").json()["deleted"] == event_id
@@ -0,0 +1,65 @@
+# test_archive.py
+import json
+from copy import deepcopy
+
+import pytest
+
+import mock_data
+from archive import ArchiveError, export_records, import_record, parse_record
+from fixtures import SyntheticTournament
+from store import EntityStore, GameStateStore
+
+def stores():
+    return EntityStore(deepcopy(mock_data.events)), GameStateStore(deepcopy(mock_data.game_states))
+
+def test_export_order_and_filters():
+    store, game_states = stores()
+    records = list(export_records(store, game_states, {}))
+    kinds = [r["kind"] for r in records]
+    assert kinds.count("event") == len(mock_data.events)
+    assert kinds.count("state") == len(mock_data.game_states)
+    # Стол идет после своего мероприятия, игра - после стола, состояние - после игры
+    assert kinds[:3] == ["event", "table", "game"]
+    assert "tables" not in records[0]["data"]
+
+    planned = list(export_records(store, game_states, {"status": "planned"}))
+    assert {r["data"]["id"] for r in planned if r["kind"] == "event"} == {1002, 1003}
+    single = list(export_records(store, game_states, {}, event_id=1001))
+    assert [r["data"]["id"] for r in single if r["kind"] == "event"] == [1001]
+
+def test_export_does_not_load_lazy_states():
+    tournament = SyntheticTournament(2, 2, 2)
+    store, game_states = EntityStore(tournament.events()), GameStateStore([], lazy=tournament.game_states())
+    records = list(export_records(store, game_states, {}))
+    assert [r["data"] for r in records if r["kind"] == "state"] == [tournament.game_state(i) for i in range(1, 9)]
+    assert game_states.loaded() == 0
+
+def test_round_trip_into_empty_store():
+    source, source_states = stores()
+    target, target_states = EntityStore([]), GameStateStore([])
+    for number, record in enumerate(export_records(source, source_states, {}), 1):
+        line = json.dumps(record, ensure_ascii=False).encode()
+        import_record(target, target_states, number, parse_record(number, line))
+
+    assert target.list_events() == source.list_events()
+    # Ключи-числа в баллах становятся строками, как и в ответах API
+    by_game = lambda states: {state["gameId"]: json.loads(json.dumps(state)) for state in states.values()}
+    assert by_game(target_states) == by_game(source_states)
+
+def test_import_updates_existing():
+    store, game_states = stores()
+    import_record(store, game_states, 1, {"kind": "event", "data": {"id": 1001, "name": "Новое имя"}})
+    assert store.get_event(1001)["name"] == "Новое имя"
+    assert store.get_event(1001)["tables"]
+
+def test_invalid_lines():
+    with pytest.raises(ArchiveError, match="Строка 3"):
+        parse_record(3, b"{not json")
+    with pytest.raises(ArchiveError):
+        parse_record(1, b'{"kind": "table", "data": {"id": 1}}')
+    with pytest.raises(ArchiveError):
+        parse_record(1, b'{"kind": "unknown", "data": {"id": 1}}')
+
+    store, game_states = stores()
+    with pytest.raises(ArchiveError, match="другом мероприятии"):
+        import_record(store, game_states, 1, {"kind": "table", "eventId": 1002, "data": {"id": 2001}})
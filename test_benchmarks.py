@@ -0,0 +1,47 @@
+# test_benchmarks.py
+import argparse
+import app as app_module
+from benchmarks.run import compare, drive, percentile, run
+from benchmarks.seed import build_dataset
+
+def test_dataset_is_deterministic():
+    events, states = build_dataset(2, 2, 3, seed=7)
+    assert len(events) == 2 and len(states) == 12
+    assert len({state["gameId"] for state in states}) == 12
+    assert (events, states) == build_dataset(2, 2, 3, seed=7)
+
+def test_percentile():
+    assert percentile([3, 1, 2, 4], 50) in (2, 3)
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 99) == 10
+    assert percentile([], 95) == 0.0
+
+def test_small_run_restores_app_stores():
+    store = app_module.store
+    args = argparse.Namespace(storage="memory", events=2, tables=1, games=2, clients=4, requests=40,
+                              think_time=0.0, seed=1, mode="inprocess")
+    report = run(args)
+    result = report["results"]["inprocess"]
+    assert result["requests"] == 40
+    assert all(stats["errors"] == 0 for stats in result["scenarios"].values())
+    assert app_module.store is store
+
+    assert compare(report, report, 0.1) == []
+    slower = {"results": {"inprocess": {**result, "throughput": result["throughput"] * 2}}}
+    assert compare(report, slower, 0.1)
+
+def test_sqlite_run_switches_storage_mode(monkeypatch):
+    # С --storage sqlite обработчики работают так же, как с MAFIA_STORAGE=sqlite
+    settings = (app_module.STORAGE, app_module.STORE_BLOCKS)
+    seen = []
+
+    async def watched_drive(*args, **kwargs):
+        seen.append((app_module.STORAGE, app_module.STORE_BLOCKS))
+        return await drive(*args, **kwargs)
+
+    monkeypatch.setattr("benchmarks.run.drive", watched_drive)
+    args = argparse.Namespace(storage="sqlite", events=1, tables=1, games=2, clients=2, requests=10,
+                              think_time=0.0, seed=1, mode="inprocess")
+    result = run(args)["results"]["inprocess"]
+    assert all(stats["errors"] == 0 for stats in result["scenarios"].values())
+    assert seen and all(mode == ("sqlite", True) for mode in seen)
+    assert (app_module.STORAGE, app_module.STORE_BLOCKS) == settings
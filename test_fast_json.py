@@ -0,0 +1,27 @@
+# test_fast_json.py
+import json
+from datetime import date
+import pytest
+from pydantic import BaseModel
+import fast_json
+import mock_data
+
+class Score(BaseModel):
+    baseScore: float = 1.0
+
+@pytest.fixture(params=["orjson", "json"])
+def dumps(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson не установлен")
+    return fast_json.dumps
+
+def test_matches_stdlib(dumps):
+    data = {"events": mock_data.events, "scores": {1: {"baseScore": 0.5}}, "name": "Турнир"}
+    expected = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert dumps(data) == expected
+
+def test_falls_back_to_jsonable_encoder(dumps):
+    assert json.loads(dumps({"score": Score(), "date": date(2025, 5, 23)})) == {
+        "score": {"baseScore": 1.0}, "date": "2025-05-23"}
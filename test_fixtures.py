@@ -0,0 +1,39 @@
+# test_fixtures.py
+import pytest
+from fixtures import SyntheticTournament, parse_size
+
+def test_parse_size():
+    assert parse_size("1000x10x8") == (1000, 10, 8)
+    assert parse_size("2X3X4") == (2, 3, 4)
+    with pytest.raises(ValueError):
+        parse_size("1000x10")
+    with pytest.raises(ValueError):
+        parse_size("ax1x1")
+
+def test_tournament_is_deterministic():
+    tournament = SyntheticTournament(3, 2, 4, seed=9)
+    assert tournament.events() == SyntheticTournament(3, 2, 4, seed=9).events()
+    assert tournament.game_state(17) == SyntheticTournament(3, 2, 4, seed=9).game_state(17)
+    other = SyntheticTournament(3, 2, 4, seed=10)
+    assert [tournament.game_state(i) for i in range(1, 25)] != [other.game_state(i) for i in range(1, 25)]
+
+def test_game_cards_match_states():
+    tournament = SyntheticTournament(3, 2, 4, seed=9)
+    events = tournament.events()
+    games = [game for event in events for table in event["tables"] for game in table["games"]]
+    assert [game["id"] for game in games] == list(range(1, 25))
+    assert [table["id"] for event in events for table in event["tables"]] == list(range(1, 7))
+    for game in games:
+        state = tournament.game_state(game["id"])
+        assert state["gameId"] == game["id"]
+        assert state["gameStatus"] == game["gameStatus"]
+        assert state["round"] == game["currentRound"]
+        assert len(state["players"]) == 10 and len(state["scores"]) == 10
+
+def test_lazy_game_states_mapping():
+    states = SyntheticTournament(2, 2, 3).game_states()
+    assert len(states) == 12 and list(states) == list(range(1, 13))
+    assert 12 in states and 13 not in states and "1" not in states
+    assert states[3] == states[3] and states[3] is not states[3]
+    with pytest.raises(KeyError):
+        states[0]
@@ -0,0 +1,47 @@
+# test_game_stats.py
+from game_stats import GameStatistics, build_statistics
+
+def make_state():
+    return {
+        "gameId": 1,
+        "round": 2,
+        "gameStatus": "in_progress",
+        "players": [
+            {"id": 1, "originalRole": "Мирный"},
+            {"id": 2, "originalRole": "Мирный", "isAlive": False},
+            {"id": 3, "originalRole": "Мафия"},
+            {"id": 4, "originalRole": "Шериф", "isEliminated": True},
+        ],
+        "deadPlayers": [2],
+        "eliminatedPlayers": [4],
+        "scores": {"1": {"baseScore": 1, "additionalScore": 0.5}},
+    }
+
+def test_counts_roles_and_scores():
+    stats = build_statistics(1, make_state())
+    assert stats["round"] == 2
+    assert (stats["playersAlive"], stats["playersDead"], stats["playersEliminated"]) == (2, 1, 1)
+    assert stats["roleStatistics"]["Мирный"] == {"total": 2, "alive": 1, "dead": 1, "eliminated": 0}
+    assert stats["roleStatistics"]["Шериф"]["eliminated"] == 1
+    assert stats["scores"] == {"1": 1.5}
+
+def test_apply_recounts_only_changed_parts():
+    state = make_state()
+    stats = GameStatistics(1, state)
+    roles = stats.as_dict()["roleStatistics"]
+
+    state.update({"round": 3})
+    stats.apply(state, {"round": 3})
+    assert stats.as_dict()["round"] == 3
+    assert stats.as_dict()["roleStatistics"] is roles
+
+    state["deadPlayers"] = [2, 3]
+    stats.apply(state, {"deadPlayers": [2, 3]})
+    assert stats.as_dict()["roleStatistics"]["Мафия"] == {"total": 1, "alive": 0, "dead": 1, "eliminated": 0}
+    assert stats.as_dict() == build_statistics(1, state)
+
+def test_empty_state():
+    stats = build_statistics(5, {"gameId": 5})
+    assert stats["round"] == 0
+    assert stats["roleStatistics"] == {}
+    assert stats["scores"] == {}
@@ -0,0 +1,99 @@
+# test_leaderboard.py
+from leaderboard import INITIAL_RATING, Leaderboard, Leaderboards, game_results
+
+def result(player, role, outcome, additional=0.0):
+    return {"player": player, "role": role, "score": outcome + additional, "outcome": outcome}
+
+CITY_WIN = [result("Анна", "Мирный", 1.0, 0.5), result("Борис", "Мафия", 0.0)]
+MAFIA_WIN = [result("Анна", "Шериф", 0.0), result("Борис", "Дон", 1.0, 1.0)]
+
+def test_game_results_reads_scores_by_seat():
+    state = {
+        "players": [{"id": 1, "name": "Анна", "originalRole": "Мирный"},
+                    {"id": 2, "name": "Борис", "originalRole": "Мафия"}],
+        "scores": {"1": {"baseScore": 1.0, "additionalScore": 0.5}, 2: {"baseScore": 0.0}},
+    }
+    assert game_results(state) == CITY_WIN
+
+def test_record_and_rank():
+    board = Leaderboard()
+    board.record(1, CITY_WIN)
+    ranking = board.ranking("total")
+    assert [r["player"] for r in ranking] == ["Анна", "Борис"]
+    assert ranking[0]["wins"] == 1
+    assert ranking[0]["winsByRole"] == {"Мирный": 1}
+    assert ranking[0]["rating"] > INITIAL_RATING > ranking[1]["rating"]
+
+def test_retract_restores_totals_and_ratings():
+    board = Leaderboard()
+    board.record(1, CITY_WIN)
+    after_first = board.ranking("rating")
+    board.record(2, MAFIA_WIN)
+    board.retract(2)
+    assert board.ranking("rating") == after_first
+
+    # Отзыв не последней игры пересчитывает рейтинг по оставшимся
+    board.record(2, MAFIA_WIN)
+    board.retract(1)
+    expected = Leaderboard()
+    expected.record(2, MAFIA_WIN)
+    assert board.ranking("rating") == expected.ranking("rating")
+
+def test_correction_keeps_game_order():
+    # Исправление ранней игры не переносит ее в конец последовательности
+    corrected = [result("Анна", "Мирный", 1.0, 1.5), result("Борис", "Мафия", 0.0)]
+    board = Leaderboard()
+    for game_id, results in ((1, CITY_WIN), (2, MAFIA_WIN), (3, CITY_WIN)):
+        board.record(game_id, results)
+    board.record(1, corrected)
+    assert board.games() == [1, 2, 3]
+
+    expected = Leaderboard()
+    for game_id, results in ((1, corrected), (2, MAFIA_WIN), (3, CITY_WIN)):
+        expected.record(game_id, results)
+    assert board.ranking("rating") == expected.ranking("rating")
+
+    # Исправление последней игры откатывает только ее вклад
+    board.record(3, MAFIA_WIN)
+    replay = Leaderboard()
+    for game_id, results in ((1, corrected), (2, MAFIA_WIN), (3, MAFIA_WIN)):
+        replay.record(game_id, results)
+    assert board.ranking("rating") == replay.ranking("rating")
+
+def test_rerecord_same_results_is_noop():
+    board = Leaderboard()
+    board.record(1, CITY_WIN)
+    version = board.version
+    assert not board.record(1, [dict(r) for r in CITY_WIN])
+    assert board.version == version
+
+def test_leaderboards_by_event():
+    leaderboards = Leaderboards()
+    state = {"players": [{"id": 1, "name": "Анна", "originalRole": "Мирный"}],
+             "scores": {"1": {"baseScore": 1.0, "additionalScore": 0}}}
+    leaderboards.record(10, 1, state)
+    leaderboards.record(20, 2, state)
+    assert leaderboards.ranking(None)[0]["games"] == 2
+    assert leaderboards.ranking(10)[0]["games"] == 1
+
+    leaderboards.remove_event(10)
+    assert 1 not in leaderboards
+    assert leaderboards.ranking(None)[0]["games"] == 1
+    assert leaderboards.ranking(10) == []
+
+def test_leaderboards_load_on_first_use():
+    state = {"players": [{"id": 1, "name": "Анна", "originalRole": "Мирный"}],
+             "scores": {"1": {"baseScore": 1.0, "additionalScore": 0}}}
+    calls = []
+
+    def loader(record):
+        calls.append(1)
+        record(10, 1, state)
+
+    leaderboards = Leaderboards(loader)
+    assert calls == []
+    leaderboards.record(10, 2, state)
+    # Игры, завершенные до запуска, учитываются раньше новых
+    assert leaderboards.event(10).games() == [1, 2]
+    assert leaderboards.ranking(None)[0]["games"] == 2
+    assert calls == [1]
@@ -0,0 +1,131 @@
+# test_locks.py
+import asyncio
+import threading
+import time
+
+import httpx
+
+import app as app_module
+from locks import KeyedLocks
+
+def test_same_key_is_serialized():
+    locks = KeyedLocks()
+    order = []
+
+    async def worker(name, key):
+        async with locks.hold(key):
+            order.append(f"{name}+")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}-")
+
+    async def scenario():
+        await asyncio.gather(worker("a", "game:1"), worker("b", "game:1"))
+
+    asyncio.run(scenario())
+    assert order == ["a+", "a-", "b+", "b-"]
+    assert len(locks) == 0
+
+def test_different_keys_run_in_parallel():
+    locks = KeyedLocks()
+    order = []
+
+    async def worker(name, key):
+        async with locks.hold(key):
+            order.append(f"{name}+")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}-")
+
+    async def scenario():
+        await asyncio.gather(worker("a", "game:1"), worker("b", "game:2"))
+
+    asyncio.run(scenario())
+    assert order[:2] == ["a+", "b+"]
+
+def test_overlapping_keys_do_not_deadlock():
+    locks = KeyedLocks()
+
+    async def worker(*keys):
+        async with locks.hold(*keys):
+            await asyncio.sleep(0.001)
+
+    async def scenario():
+        await asyncio.wait_for(asyncio.gather(
+            worker("event:1", "game:2"), worker("game:2", "event:1"), worker("game:2")), timeout=1)
+
+    asyncio.run(scenario())
+    assert len(locks) == 0
+
+def test_concurrent_updates_of_one_game(monkeypatch):
+    # Обработчики выполняются в пуле потоков, как с SQLite, но по очереди для одной игры
+    monkeypatch.setattr(app_module, "STORE_BLOCKS", True)
+    transport = httpx.ASGITransport(app=app_module.app)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*[
+                client.put("/api/games/3002/state", json={"round": i}) for i in range(20)])
+            return [r.json()["round"] for r in responses]
+
+    rounds = asyncio.run(scenario())
+    assert sorted(rounds) == list(range(20))
+    assert app_module.game_states.version(3002) >= 20
+    assert len(app_module.entity_locks) == 0
+
+def test_memory_store_changes_run_one_at_a_time(monkeypatch):
+    # В пуле потоков изменения разных игр в памяти не пересекаются
+    monkeypatch.setattr(app_module, "STORAGE", "memory")
+    monkeypatch.setattr(app_module, "STORE_BLOCKS", True)
+    running, overlaps = [], []
+
+    def change(i):
+        running.append(i)
+        if len(running) > 1:
+            overlaps.append(i)
+        time.sleep(0.001)
+        running.remove(i)
+        return i
+
+    async def scenario():
+        return await asyncio.gather(*[app_module.run_store(change, i) for i in range(20)])
+
+    assert asyncio.run(scenario()) == list(range(20))
+    assert overlaps == []
+
+def test_sqlite_lock_keys_are_read_in_thread(monkeypatch):
+    # С SQLite ключи замков читают базу, поэтому не вычисляются в цикле событий
+    monkeypatch.setattr(app_module, "STORAGE", "sqlite")
+    monkeypatch.setattr(app_module, "STORE_BLOCKS", True)
+    threads = []
+
+    def lock_keys(**kwargs):
+        threads.append(threading.current_thread())
+        return ["event:1"]
+
+    handler = app_module.serialized(lock_keys)(lambda **kwargs: None)
+    asyncio.run(handler())
+    assert threads[0] is not threading.main_thread()
+
+def test_memory_reads_take_lock_with_journal(monkeypatch):
+    # С журналом на диске изменения идут в пуле потоков под memory_lock,
+    # поэтому чтение берет тот же замок
+    monkeypatch.setattr(app_module, "STORAGE", "memory")
+    monkeypatch.setattr(app_module, "STORE_BLOCKS", True)
+    locked = []
+
+    def read(**kwargs):
+        locked.append(app_module.memory_lock.locked())
+
+    asyncio.run(app_module.reads_store(read)())
+    assert locked == [True]
+
+def test_memory_reads_run_in_event_loop(monkeypatch):
+    # Без журнала изменения идут в цикле событий, и чтение тоже
+    monkeypatch.setattr(app_module, "STORAGE", "memory")
+    monkeypatch.setattr(app_module, "STORE_BLOCKS", False)
+    threads = []
+
+    def read(**kwargs):
+        threads.append(threading.current_thread())
+
+    asyncio.run(app_module.reads_store(read)())
+    assert threads == [threading.main_thread()]
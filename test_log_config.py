@@ -0,0 +1,21 @@
+# test_log_config.py
+import json
+import logging
+from log_config import JsonFormatter, SamplingFilter
+
+def make_record(level, **fields):
+    record = logging.LogRecord("mafia", level, __file__, 1, "Сообщение %s", ("1",), None)
+    record.__dict__.update(fields)
+    return record
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(JsonFormatter().format(make_record(logging.INFO, gameId=3002)))
+    assert entry["level"] == "INFO"
+    assert entry["message"] == "Сообщение 1"
+    assert entry["gameId"] == 3002
+
+def test_sampling_filter_only_drops_debug():
+    sampling = SamplingFilter(0)
+    assert not sampling.filter(make_record(logging.DEBUG))
+    assert sampling.filter(make_record(logging.INFO))
+    assert SamplingFilter(1).filter(make_record(logging.DEBUG))
@@ -0,0 +1,57 @@
+# test_metrics.py
+import asyncio
+from metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry, TimedStore
+
+def test_histogram_render_is_cumulative():
+    histogram = Histogram("latency_seconds", "Задержка", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    lines = list(histogram.render())
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+
+def test_registry_renders_all_metrics():
+    registry = Registry()
+    counter = registry.register(Counter("requests_total", "Запросы", ("status",)))
+    registry.register(Gauge("clients", "Клиенты", ("kind",), lambda: [(("ws",), 2)]))
+    counter.inc("200")
+    counter.inc("200")
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="200"} 2' in text
+    assert 'clients{kind="ws"} 2' in text
+
+def test_timed_store_measures_methods():
+    class Store:
+        journal = None
+        def get(self, key):
+            return key * 2
+
+    histogram = Histogram("store_seconds", "Операции", ("store", "operation"))
+    store = TimedStore(Store(), "test", histogram)
+    assert store.get(2) == 4
+    assert store.get(3) == 6
+    assert histogram.count("test", "get") == 2
+    store.journal = "journal"
+    assert store._store.journal == "journal"
+
+def test_middleware_labels_unmatched_requests():
+    requests = Counter("requests_total", "Запросы", ("method", "route", "status"))
+    latency = Histogram("latency_seconds", "Задержка", ("method", "route"))
+    sizes = Histogram("size_bytes", "Размер", ("method", "route"))
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b"missing"})
+
+    async def send(message):
+        pass
+
+    middleware = MetricsMiddleware(app, requests, latency, sizes)
+    asyncio.run(middleware({"type": "http", "path": "/x", "method": "GET"}, None, send))
+    assert requests.value("GET", "unmatched", "404") == 1
+    assert sizes.count("GET", "unmatched") == 1
@@ -0,0 +1,106 @@
+# test_negotiation.py
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import negotiation
+from negotiation import JSON, MSGPACK, choose_encoding, choose_media, represent
+from response_cache import ResponseCache
+
+client = TestClient(app_module.app)
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(app_module, "response_cache", cache)
+    return cache
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(negotiation, "brotli", None)
+    assert choose_encoding("gzip, deflate, br") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*") == "gzip"
+    assert choose_encoding(None) is None
+
+def test_choose_encoding_prefers_brotli():
+    pytest.importorskip("brotli")
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+
+def test_choose_media():
+    pytest.importorskip("msgpack")
+    assert choose_media("application/msgpack") == MSGPACK
+    assert choose_media("application/x-msgpack, application/json;q=0.5") == MSGPACK
+    assert choose_media("application/json, application/msgpack;q=0.5") == JSON
+    assert choose_media("*/*") == JSON
+
+def test_represent_skips_small_bodies():
+    body = json.dumps({"a": 1}).encode()
+    assert represent(body, JSON, "gzip", 1024) == (body, None)
+    large = json.dumps([{"role": "Мирный"}] * 200).encode()
+    compressed, applied = represent(large, JSON, "gzip", 1024)
+    assert applied == "gzip" and gzip.decompress(compressed) == large
+
+def test_cached_response_compressed_once(cache, monkeypatch):
+    monkeypatch.setattr(negotiation, "brotli", None)
+    calls = []
+    monkeypatch.setattr(app_module, "represent",
+                        lambda *args: calls.append(args[2]) or represent(*args))
+    for _ in range(3):
+        response = client.get("/api/events", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"].startswith('W/"events-')
+        assert "Accept-Encoding" in response.headers["vary"]
+    # Сжатие выполнено один раз, повторные запросы получили готовый вариант
+    assert calls == ["gzip"]
+
+    # Слабый ETag сжатого ответа подходит для условного запроса
+    etag = response.headers["etag"]
+    assert client.get("/api/events", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+
+def test_etag_form_matches_for_200_and_304(cache):
+    # Тело стола короче порога сжатия, но ETag все равно слабый, как и у 304
+    headers = {"Accept-Encoding": "gzip"}
+    response = client.get("/api/events/1001/tables/2001/games/3001", headers=headers)
+    assert "content-encoding" not in response.headers
+    etag = response.headers["etag"]
+    assert etag.startswith("W/")
+    response = client.get("/api/games/3002/state", headers=headers)
+    assert client.get("/api/games/3002/state", headers={**headers, "If-None-Match": response.headers["etag"]}
+                      ).headers["etag"] == response.headers["etag"]
+
+    # Без согласования ETag сильный и в ответе 304
+    identity = {"Accept-Encoding": "identity"}
+    strong = client.get("/api/events/1001", headers=identity).headers["etag"]
+    assert not strong.startswith("W/")
+    assert client.get("/api/events/1001", headers={**identity, "If-None-Match": strong}).headers["etag"] == strong
+
+def test_not_modified_skips_serialization(cache):
+    etag = client.get("/api/events/1001").headers["etag"]
+    cache.invalidate()
+    response = client.get("/api/events/1001", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(cache) == 0
+    # Удаленный ресурс по-прежнему отвечает 404, а не 304
+    assert client.get("/api/events/999999", headers={"If-None-Match": "*"}).status_code == 404
+
+def test_msgpack_responses(cache):
+    msgpack = pytest.importorskip("msgpack")
+    headers = {"Accept": "application/msgpack", "Accept-Encoding": "identity"}
+    response = client.get("/api/events/1001", headers=headers)
+    assert response.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(response.content) == client.get("/api/events/1001").json()
+
+    # Ответы вне кеша перекодирует middleware
+    response = client.get("/api/games/3002/statistics", headers=headers)
+    assert response.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(response.content)["gameId"] == 3002
+
+def test_streaming_export_is_compressed():
+    response = client.get("/api/export", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert json.loads(response.text.splitlines()[0])["kind"] == "event"
@@ -0,0 +1,74 @@
+# test_patch.py
+import pytest
+from patch import PatchConflict, PatchError, apply_json_patch, apply_merge_patch, changed_fields
+
+def make_doc():
+    return {
+        "round": 1,
+        "players": [{"id": 1, "fouls": 0}, {"id": 2, "fouls": 1}],
+        "nominatedPlayers": [],
+        "votingResults": {},
+    }
+
+def test_json_patch_operations():
+    doc = make_doc()
+    result, changes = apply_json_patch(doc, [
+        {"op": "test", "path": "/round", "value": 1},
+        {"op": "replace", "path": "/players/1/fouls", "value": 2},
+        {"op": "add", "path": "/nominatedPlayers/-", "value": 7},
+        {"op": "add", "path": "/votingResults/7", "value": 5},
+        {"op": "remove", "path": "/round"},
+    ])
+    assert result["players"][1]["fouls"] == 2
+    assert result["nominatedPlayers"] == [7]
+    assert result["votingResults"] == {"7": 5}
+    assert "round" not in result
+    assert [c["path"] for c in changes] == ["/players/1/fouls", "/nominatedPlayers/-", "/votingResults/7", "/round"]
+    # Исходный документ не изменился
+    assert doc == make_doc()
+
+def test_json_patch_copies_only_touched_paths():
+    doc = make_doc()
+    result, _ = apply_json_patch(doc, [{"op": "replace", "path": "/players/1/fouls", "value": 2}])
+    assert doc == make_doc()
+    assert result is not doc and result["players"] is not doc["players"]
+    assert result["players"][1] is not doc["players"][1]
+    # Нетронутые части остаются общими с исходным документом
+    assert result["players"][0] is doc["players"][0]
+    assert result["votingResults"] is doc["votingResults"]
+
+    # Значение, перемещенное в другое место, тоже копируется перед изменением
+    result, _ = apply_json_patch(doc, [
+        {"op": "move", "from": "/players/0", "path": "/first"},
+        {"op": "replace", "path": "/first/fouls", "value": 4},
+    ])
+    assert result["first"] == {"id": 1, "fouls": 4}
+    assert doc == make_doc()
+
+def test_json_patch_move_and_copy():
+    result, _ = apply_json_patch({"a": {"b": 1}, "c": []}, [
+        {"op": "copy", "from": "/a/b", "path": "/c/0"},
+        {"op": "move", "from": "/a", "path": "/d"},
+    ])
+    assert result == {"c": [1], "d": {"b": 1}}
+
+def test_json_patch_errors():
+    with pytest.raises(PatchConflict):
+        apply_json_patch(make_doc(), [{"op": "test", "path": "/round", "value": 2}])
+    with pytest.raises(PatchError):
+        apply_json_patch(make_doc(), [{"op": "replace", "path": "/players/5/fouls", "value": 1}])
+    with pytest.raises(PatchError):
+        apply_json_patch(make_doc(), [{"op": "jump", "path": "/round"}])
+
+def test_merge_patch():
+    result, changes = apply_merge_patch(make_doc(), {"round": 2, "votingResults": {"3": 4}, "nominatedPlayers": None})
+    assert result["round"] == 2
+    assert result["votingResults"] == {"3": 4}
+    assert "nominatedPlayers" not in result
+    assert {c["path"] for c in changes} == {"/round", "/votingResults/3", "/nominatedPlayers"}
+
+def test_changed_fields():
+    before = make_doc()
+    after = {**before, "round": 3}
+    del after["votingResults"]
+    assert changed_fields(before, after) == {"round": 3, "votingResults": None}
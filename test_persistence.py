@@ -0,0 +1,126 @@
+# test_persistence.py
+import os
+import time
+import app as app_module
+from persistence import FileJournal, replay
+from store import EntityStore, GameStateStore
+
+def open_stores(directory, **options):
+    journal = FileJournal(str(directory), **options)
+    snapshot, records = journal.load()
+    if snapshot:
+        store = EntityStore(snapshot["events"])
+        game_states = GameStateStore(snapshot["game_states"])
+    else:
+        store = EntityStore([])
+        game_states = GameStateStore([])
+    replay(records, {"events": store, "game_states": game_states})
+    store.journal = journal
+    game_states.journal = journal
+    journal.snapshot_provider = lambda: {"events": store.list_events(), "game_states": game_states.values()}
+    return journal, store, game_states
+
+def test_log_replay_after_restart(tmp_path):
+    journal, store, game_states = open_stores(tmp_path)
+    store.add_event({"id": 1, "name": "Турнир", "tables": []})
+    store.add_table(1, {"id": 10, "games": []})
+    store.add_game(1, 10, {"id": 100, "status": "not_started"})
+    store.update_game(1, 10, 100, {"status": "in_progress"})
+    game_states.create(100, {"gameId": 100, "round": 0})
+    game_states.update(100, {"round": 3})
+    journal.close()
+
+    journal, store, game_states = open_stores(tmp_path)
+    assert store.get_game(1, 10, 100)["status"] == "in_progress"
+    assert game_states.get(100)["round"] == 3
+    journal.close()
+
+def test_compaction_writes_snapshot_and_truncates_log(tmp_path):
+    journal, store, game_states = open_stores(tmp_path, compact_every=3)
+    store.add_event({"id": 1, "tables": []})
+    store.add_event({"id": 2, "tables": []})
+    store.add_event({"id": 3, "tables": []})
+    assert os.path.exists(tmp_path / "snapshot.json")
+    assert os.path.getsize(tmp_path / "wal.log") == 0
+
+    store.remove_event(2)
+    journal.close()
+
+    journal, store, game_states = open_stores(tmp_path)
+    assert [e["id"] for e in store.list_events()] == [1, 3]
+    journal.close()
+
+def test_truncated_tail_is_ignored(tmp_path):
+    journal, store, game_states = open_stores(tmp_path)
+    store.add_event({"id": 1, "tables": []})
+    journal.close()
+
+    with open(tmp_path / "wal.log", "a", encoding="utf-8") as f:
+        f.write('[2, "events", "add_ev')
+
+    journal, store, game_states = open_stores(tmp_path)
+    assert [e["id"] for e in store.list_events()] == [1]
+    journal.close()
+
+def test_fsync_batching(tmp_path):
+    journal, store, game_states = open_stores(tmp_path, fsync_every=100, fsync_interval=60)
+    for i in range(10):
+        store.add_event({"id": i, "tables": []})
+    # Записи уже в файле, но fsync еще не выполнялся
+    assert journal._pending == 10
+    journal.flush()
+    assert journal._pending == 0
+    journal.close()
+
+def test_fsync_after_idle(tmp_path):
+    # Хвост пачки синхронизируется по таймеру, без следующей записи
+    journal, store, _ = open_stores(tmp_path, fsync_every=100, fsync_interval=0.05)
+    for i in range(3):
+        store.add_event({"id": i, "tables": []})
+    assert journal._pending == 3
+    deadline = time.monotonic() + 2
+    while journal._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert journal._pending == 0
+    journal.close()
+
+def test_snapshot_keeps_synthetic_states_lazy(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(app_module, "SYNTHETIC", "2x2x3")
+    store, game_states, _, close = app_module.open_memory_stores()
+    # Стартовый снимок не загружает состояния турнира
+    assert game_states.loaded() == 0
+    game_states.update(5, {"round": 9})
+    store.remove_game(1, 1, 1)
+    game_states.remove(1)
+    game_states.journal.compact(game_states.journal.snapshot_provider())
+    state = game_states.get(7)
+    close()
+
+    monkeypatch.setattr(app_module, "SYNTHETIC", None)
+    store, game_states, _, close = app_module.open_memory_stores()
+    assert game_states.loaded() == 1 and len(game_states) == 11
+    assert game_states.get(5)["round"] == 9
+    assert game_states.get(1) is None
+    assert game_states.get(7) == state
+    close()
+
+def test_action_log_survives_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(app_module, "SYNTHETIC", None)
+    _, game_states, _, close = app_module.open_memory_stores()
+    game_id = next(iter(app_module.fixture_data()[1]))
+    game_states.update(game_id, {"round": 7})
+    game_states.journal.compact(game_states.journal.snapshot_provider())
+    game_states.update(game_id, {"round": 8})
+    game_states.undo(game_id)
+    actions = game_states.actions(game_id)
+    close()
+
+    # Состояние восстанавливается по журналу действий из снимка, отмена - повтором
+    _, game_states, _, close = app_module.open_memory_stores()
+    without_time = lambda records: [{**record, "at": None} for record in records]
+    assert without_time(game_states.actions(game_id)) == without_time(actions)
+    assert game_states.get(game_id)["round"] == 7
+    assert game_states.undo(game_id)["round"] == game_states.state_at(game_id, seq=1)["round"]
+    close()
@@ -0,0 +1,45 @@
+# test_realtime.py
+import asyncio
+import json
+from realtime import Hub
+
+def test_publish_serializes_once_for_all_subscribers():
+    async def scenario():
+        hub = Hub()
+        first = hub.subscribe("game:1")
+        second = hub.subscribe("game:1", "event:10")
+        hub.publish(["game:1", "event:10"], {"type": "state", "gameId": 1})
+
+        a = await first.get()
+        b = await second.get()
+        assert a is b
+        assert json.loads(a.text) == {"type": "state", "gameId": 1}
+        # Одни и те же байты для текстовых кадров WebSocket и кадров SSE
+        assert a.sse == b"data: " + a.data + b"\n\n" and a.text.encode() == a.data
+        # Подписчик на обе темы получает изменение один раз
+        assert second.queue.empty()
+
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        assert not hub.active
+
+    asyncio.run(scenario())
+
+def test_slow_subscriber_gets_resync():
+    async def scenario():
+        hub = Hub(max_queue=2)
+        subscription = hub.subscribe("game:1")
+        for i in range(3):
+            hub.publish(["game:1"], {"n": i})
+
+        message = await subscription.get()
+        assert json.loads(message.text) == {"type": "resync"}
+        assert subscription.queue.empty()
+        assert subscription.resyncs == 1
+
+    asyncio.run(scenario())
+
+def test_publish_without_subscribers_is_noop():
+    hub = Hub()
+    hub.publish(["game:1"], {"n": 1})
+    assert hub.subscriber_count() == 0
@@ -0,0 +1,35 @@
+# test_response_cache.py
+import json
+from response_cache import ResponseCache, encode_json
+
+def test_hit_requires_same_version():
+    cache = ResponseCache()
+    assert cache.get(("events",), "v1") is None
+    body = cache.put(("events",), "v1", [{"id": 1, "name": "Турнир"}])
+    assert json.loads(body) == [{"id": 1, "name": "Турнир"}]
+    assert cache.get(("events",), "v1") == body
+    assert cache.get(("events",), "v2") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_invalidate_subtree():
+    cache = ResponseCache()
+    for key in [(1,), (1, "tables"), (1, 10), (1, 10, 100), (2,)]:
+        cache.put(key, "v", {})
+    assert cache.invalidate(1, 10) == 2
+    assert cache.invalidate(1) == 2
+    assert cache.get((2,), "v") is not None
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put((1,), "v", {})
+    cache.put((2,), "v", {})
+    cache.get((1,), "v")
+    cache.put((3,), "v", {})
+    assert cache.get((2,), "v") is None
+    assert cache.get((1,), "v") is not None
+    assert cache.evictions == 1
+
+def test_disabled_cache_still_encodes():
+    cache = ResponseCache(max_entries=0)
+    assert cache.put((1,), "v", {"a": "б"}) == encode_json({"a": "б"})
+    assert len(cache) == 0
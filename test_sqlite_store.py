@@ -0,0 +1,222 @@
+# test_sqlite_store.py
+import threading
+import pytest
+from fastapi.testclient import TestClient
+import app as app_module
+import mock_data
+from changefeed import SqliteChangeFeed
+from response_cache import ResponseCache
+from sqlite_store import ConnectionPool, SqliteEntityStore, SqliteGameStateStore
+from store import EntityStore
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "mafia.db"), size=2)
+    yield pool
+    pool.close()
+
+@pytest.fixture
+def stores(pool):
+    store = SqliteEntityStore(pool)
+    game_states = SqliteGameStateStore(pool)
+    for event in mock_data.events:
+        store.add_event(event)
+    for game_state in mock_data.game_states:
+        game_states.create(game_state["gameId"], game_state)
+    return store, game_states
+
+@pytest.fixture
+def client(stores, monkeypatch):
+    # Подменяем хранилища приложения на SQLite, маршруты остаются прежними
+    monkeypatch.setattr(app_module, "store", stores[0])
+    monkeypatch.setattr(app_module, "game_states", stores[1])
+    monkeypatch.setattr(app_module, "response_cache", ResponseCache())
+    return TestClient(app_module.app)
+
+def test_round_trip(stores):
+    store, game_states = stores
+    assert [e["id"] for e in store.list_events()] == [e["id"] for e in mock_data.events]
+    assert store.get_event(1001)["tables"][0]["games"][1]["gameStatus"] == "in_progress"
+    assert game_states.get(3002)["players"] == mock_data.game_states[1]["players"]
+    assert game_states.get(3002)["scores"]["1"] == {"baseScore": 0, "additionalScore": 0}
+
+def test_lookup_checks_parent(stores):
+    store, _ = stores
+    assert store.get_table(1002, 2001) is None
+    assert store.get_game(1001, 2002, 3001) is None
+    event, table, game = store.locate_game(3004)
+    assert (event["id"], table["id"], game["id"]) == (1001, 2002, 3004)
+
+def test_cascade_delete(stores):
+    store, _ = stores
+    removed = store.remove_event(1001)
+    assert [t["id"] for t in removed["tables"]] == [2001, 2002]
+    assert store.locate_game(3001) is None
+
+def test_state_update_keeps_children(stores):
+    _, game_states = stores
+    game_states.update(3002, {"round": 4})
+    state = game_states.get(3002)
+    assert state["round"] == 4
+    assert len(state["players"]) == 10
+
+    game_states.set_scores(3002, {"1": {"baseScore": 1.0, "additionalScore": 0.5}})
+    assert game_states.get(3002)["scores"] == {"1": {"baseScore": 1.0, "additionalScore": 0.5}}
+
+    assert game_states.remove(3002)["gameId"] == 3002
+    assert game_states.get(3002) is None
+
+def test_routes_run_against_sqlite(client):
+    event = client.post("/api/events", json={"name": "Турнир", "date": "2025-09-01"}).json()
+    table = client.post(f"/api/events/{event['id']}/tables", json={"name": "Стол"}).json()
+    game = client.post(f"/api/events/{event['id']}/tables/{table['id']}/games", json={"name": "Игра"}).json()
+
+    response = client.put(f"/api/games/{game['id']}/state", json={"gameStatus": "in_progress", "round": 1})
+    assert response.status_code == 200
+
+    game = client.get(f"/api/events/{event['id']}/tables/{table['id']}/games/{game['id']}").json()
+    assert game["status"] == "in_progress"
+    assert client.get(f"/api/games/{game['id']}/statistics").json()["round"] == 1
+
+    response = client.delete(f"/api/events/{event['id']}")
+    assert response.status_code == 200
+    assert client.get(f"/api/games/{game['id']}/scores").status_code == 404
+
+def test_query_events(stores):
+    store, _ = stores
+    events, cursor = store.query_events({"status": "planned"}, limit=1, with_tables=False)
+    assert [e["id"] for e in events] == [1002]
+    assert "tables" not in events[0]
+    events, cursor = store.query_events({"status": "planned"}, after=cursor, limit=1)
+    assert [e["id"] for e in events] == [1003]
+    assert cursor is None
+
+    events, _ = store.query_events({}, date_from="2025-06-01", date_to="2025-06-15")
+    assert [e["id"] for e in events] == [1002, 1004]
+
+def test_statistics(stores):
+    _, game_states = stores
+    before = game_states.statistics(3002)
+    assert before["playersAlive"] == sum(1 for p in game_states.get(3002)["players"] if p.get("isAlive", True))
+    game_states.update(3002, {"deadPlayers": [1], "round": 5})
+    after = game_states.statistics(3002)
+    assert after["round"] == 5
+    assert after["playersDead"] == 1
+    game_states.remove(3002)
+    assert game_states.statistics(3002) is None
+
+def test_concurrent_writers(tmp_path):
+    # Запись начинается с BEGIN IMMEDIATE: параллельные писатели ждут
+    # блокировку по busy_timeout, а не получают сразу "database is locked"
+    pool = ConnectionPool(str(tmp_path / "mafia.db"), size=8)
+    game_states = SqliteGameStateStore(pool)
+    for game_id in range(1, 9):
+        game_states.create(game_id, {"gameId": game_id, "round": 0})
+    errors = []
+
+    def write(game_id):
+        try:
+            for round in range(1, 51):
+                game_states.update(game_id, {"round": round})
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write, args=(game_id,)) for game_id in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert [game_states.get(game_id)["round"] for game_id in range(1, 9)] == [50] * 8
+    pool.close()
+
+def test_change_feed_skips_own_changes(pool):
+    first, second = SqliteChangeFeed(pool), SqliteChangeFeed(pool)
+    first.append(["game:1"], {"type": "state", "gameId": 1})
+    assert second.poll() == [(["game:1"], {"type": "state", "gameId": 1})]
+    assert second.poll() == []
+    assert first.poll() == []
+    # Новый процесс читает только изменения после своего запуска
+    assert SqliteChangeFeed(pool).poll() == []
+
+def test_changes_reach_other_workers(client, pool, monkeypatch):
+    monkeypatch.setattr(app_module, "change_feed", SqliteChangeFeed(pool))
+    other = SqliteChangeFeed(pool)
+
+    client.put("/api/games/3002/state", json={"round": 4})
+    [(topics, payload)] = other.poll()
+    assert topics == ["game:3002", "event:1001"]
+    assert payload["delta"] == {"round": 4}
+
+    # Удаление в другом процессе очищает кеш ответов этого процесса
+    client.get("/api/events/1001")
+    assert len(app_module.response_cache) == 1
+    other.append([], {"type": "deleted", "path": [1001], "gameIds": [3002]})
+    assert app_module.apply_remote_changes() == 1
+    assert len(app_module.response_cache) == 0
+
+def test_action_log(stores):
+    _, game_states = stores
+    game_states.update(3002, {"round": 3, "nominatedPlayers": [4]})
+    game_states.set_scores(3002, {"1": {"baseScore": 1.0, "additionalScore": 0.0}})
+    assert [a["type"] for a in game_states.actions(3002)] == ["create", "update", "scores"]
+    assert game_states.state_at(3002, seq=2)["nominatedPlayers"] == [4]
+    assert game_states.state_at(3002) == game_states.get(3002)
+
+    # Журнал заново созданной игры не смешивается с прежним
+    game_states.remove(3002)
+    assert game_states.actions(3002) is None
+    game_states.create(3002, {"gameId": 3002, "round": 0})
+    assert [a["seq"] for a in game_states.actions(3002)] == [1]
+    assert game_states.state_at(3002) == {"gameId": 3002, "round": 0}
+
+def test_update_removes_fields(stores):
+    _, game_states = stores
+    game_states.update(3002, {"round": 4}, ["players", "nightKill"])
+    state = game_states.get(3002)
+    assert "players" not in state and "nightKill" not in state
+    assert game_states.statistics(3002)["playersAlive"] == 0
+    assert game_states.state_at(3002) == state
+
+def test_versions_continue_after_delete(stores):
+    # Старый ETag не должен совпасть с версией заново созданного объекта
+    store, game_states = stores
+    game_states.update(3002, {"round": 4})
+    old_state = game_states.version(3002)
+    game_states.remove(3002)
+    game_states.create(3002, {"gameId": 3002, "round": 0})
+    assert game_states.version(3002) > old_state
+
+    old_event = store.version("event", 1001)
+    old_game = store.version("game", 3001)
+    event = store.remove_event(1001)
+    store.add_event(event)
+    assert store.version("event", 1001) > old_event
+    # Игры удалены каскадом вместе с мероприятием
+    assert store.version("game", 3001) > old_game
+
+def test_undo(stores):
+    _, game_states = stores
+    original = game_states.get(3002)
+    game_states.update(3002, {"round": 4, "nominatedPlayers": [1]})
+    game_states.set_scores(3002, {"1": {"baseScore": 1.0, "additionalScore": 0.0}})
+    assert game_states.undo(3002) == {**original, "round": 4, "nominatedPlayers": [1]}
+    assert game_states.undo(3002) == original
+    assert game_states.get(3002) == original
+    assert game_states.undo(3002) is None
+    assert game_states.statistics(3002)["round"] == original["round"]
+    assert game_states.undo(999) is None
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_date_range_includes_whole_last_day(backend, pool):
+    # Оба хранилища одинаково включают date_to целиком, и для дат со временем
+    events = [{"id": i, "date": date, "tables": []}
+              for i, date in enumerate(["2025-06-01", "2025-06-02T18:00:00", "2025-06-02", "2025-06-03"], 1)]
+    if backend == "memory":
+        store = EntityStore(events)
+    else:
+        store = SqliteEntityStore(pool)
+        for event in events:
+            store.add_event(event)
+    found, _ = store.query_events({}, date_from="2025-06-02", date_to="2025-06-02")
+    assert [event["id"] for event in found] == [2, 3]
@@ -0,0 +1,42 @@
+# test_state_models.py
+import pytest
+from copy import deepcopy
+import mock_data
+from game_stats import build_statistics
+from state_models import GameState, Player, freeze
+
+def test_round_trip_keeps_wire_format():
+    for state in mock_data.game_states:
+        assert GameState(deepcopy(state)).to_dict() == state
+
+def test_missing_fields_are_not_added():
+    state = GameState({"gameId": 1, "players": [{"id": 1, "name": "Анна"}]})
+    assert state.to_dict() == {"gameId": 1, "players": [{"id": 1, "name": "Анна"}]}
+    assert "round" not in state
+    assert state.get("round", 0) == 0
+
+def test_unknown_fields_kept_in_extra():
+    state = GameState({"gameId": 1, "customFlag": True})
+    state.update({"players": [{"id": 2, "avatar": "a.png"}], "round": 2})
+    assert isinstance(state.players[0], Player)
+    assert state.players[0].get("avatar") == "a.png"
+    assert state.to_dict() == {"gameId": 1, "round": 2, "players": [{"id": 2, "avatar": "a.png"}],
+                               "customFlag": True}
+
+def test_statistics_accept_game_state():
+    state = deepcopy(mock_data.game_states[1])
+    assert build_statistics(1, GameState(state)) == build_statistics(1, state)
+
+def test_frozen_template():
+    template = freeze({"scores": {"1": {"baseScore": 0}}, "players": [{"id": 1}]})
+    assert template == {"scores": {"1": {"baseScore": 0}}, "players": [{"id": 1}]}
+    with pytest.raises(TypeError):
+        template["round"] = 1
+    with pytest.raises(TypeError):
+        template["players"].append({"id": 2})
+    with pytest.raises(TypeError):
+        template["scores"]["1"].update(baseScore=1)
+
+    copy = deepcopy(template)
+    copy["players"][0]["id"] = 5
+    assert type(copy["players"]) is list and template["players"][0]["id"] == 1
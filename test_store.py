@@ -0,0 +1,314 @@
+# test_store.py
+import pytest
+from copy import deepcopy
+import mock_data
+from fixtures import SyntheticTournament
+from store import EntityStore, GameStateStore
+
+@pytest.fixture
+def store():
+    return EntityStore(deepcopy(mock_data.events))
+
+def test_lookup_by_id(store):
+    assert store.get_event(1001)["id"] == 1001
+    assert store.get_table(1001, 2002)["id"] == 2002
+    assert store.get_game(1001, 2001, 3002)["id"] == 3002
+
+def test_lookup_checks_parent(store):
+    # Стол и игра должны принадлежать указанным родителям
+    assert store.get_table(1002, 2001) is None
+    assert store.get_game(1001, 2002, 3001) is None
+    assert store.get_game(1002, 2001, 3001) is None
+
+def test_add_and_remove_keep_indexes(store):
+    store.add_event({"id": 1, "name": "Новое", "tables": []})
+    store.add_table(1, {"id": 10, "games": []})
+    store.add_game(1, 10, {"id": 100})
+    assert store.get_game(1, 10, 100) == {"id": 100}
+    assert store.list_events()[-1]["tables"][0]["games"][0]["id"] == 100
+
+    store.remove_event(1)
+    assert store.get_event(1) is None
+    assert store.get_table(1, 10) is None
+    assert store.get_game(1, 10, 100) is None
+    assert all(e["id"] != 1 for e in store.list_events())
+
+def test_update_reindexes_nested(store):
+    store.update_event(1001, {"tables": [{"id": 50, "games": [{"id": 500}]}]})
+    assert store.get_table(1001, 2001) is None
+    assert store.get_game(1001, 50, 500)["id"] == 500
+
+    store.update_table(1001, 50, {"name": "Стол"})
+    assert store.get_table(1001, 50)["games"] == [{"id": 500}]
+
+def test_remove_game(store):
+    removed = store.remove_game(1001, 2001, 3001)
+    assert removed["id"] == 3001
+    assert store.get_game(1001, 2001, 3001) is None
+    assert [g["id"] for g in store.get_table(1001, 2001)["games"]] == [3002, 3003, 3005]
+
+def test_locate_game(store):
+    event, table, game = store.locate_game(3004)
+    assert (event["id"], table["id"], game["id"]) == (1001, 2002, 3004)
+    assert store.locate_game(9999) is None
+
+def test_locate_game_after_cascade_delete(store):
+    store.remove_table(1001, 2002)
+    assert store.locate_game(3004) is None
+    store.remove_event(1001)
+    assert store.locate_game(3001) is None
+
+def test_game_state_store():
+    states = GameStateStore(deepcopy(mock_data.game_states))
+    assert states.get(3002)["gameId"] == 3002
+
+    states.update(3002, {"round": 4})
+    assert states.get(3002)["round"] == 4
+
+    states.create(1, {"gameId": 1, "round": 0})
+    assert len(states) == len(mock_data.game_states) + 1
+
+    assert states.remove(1)["gameId"] == 1
+    assert states.get(1) is None
+    assert states.remove(1) is None
+
+def test_query_events_filters(store):
+    events, cursor = store.query_events({"status": "planned"})
+    assert [e["id"] for e in events] == [1002, 1003]
+    assert cursor is None
+
+    events, _ = store.query_events({"status": "planned", "language": "en"})
+    assert [e["id"] for e in events] == [1003]
+
+    events, _ = store.query_events({}, date_from="2025-06-01", date_to="2025-06-15")
+    assert [e["id"] for e in events] == [1002, 1004]
+
+def test_query_events_pagination(store):
+    events, cursor = store.query_events({}, limit=3)
+    assert [e["id"] for e in events] == [1001, 1002, 1003]
+    events, cursor = store.query_events({}, after=cursor, limit=3)
+    assert [e["id"] for e in events] == [1004]
+    assert cursor is None
+
+def test_query_events_follows_updates(store):
+    store.update_event(1003, {"status": "active", "date": "2025-01-01"})
+    assert [e["id"] for e in store.query_events({"status": "active"})[0]] == [1001, 1003]
+    assert [e["id"] for e in store.query_events({}, date_to="2025-02-01")[0]] == [1003]
+    store.remove_event(1003)
+    assert [e["id"] for e in store.query_events({"status": "active"})[0]] == [1001]
+
+def test_game_state_statistics_follow_updates():
+    game_states = GameStateStore([{"gameId": 1, "players": [{"id": 1, "originalRole": "Мафия"}]}])
+    assert game_states.statistics(1)["roleStatistics"]["Мафия"]["alive"] == 1
+    game_states.update(1, {"deadPlayers": [1]})
+    assert game_states.statistics(1)["roleStatistics"]["Мафия"]["dead"] == 1
+    game_states.set_scores(1, {"1": {"baseScore": 2, "additionalScore": 0}})
+    assert game_states.statistics(1)["scores"] == {"1": 2}
+    game_states.remove(1)
+    assert game_states.statistics(1) is None
+
+def test_game_state_update_keeps_state_consistent():
+    game_states = GameStateStore([{"gameId": 1, "round": 1, "scores": {"1": {"baseScore": 1}}}])
+    # Записи scores, которые не являются словарями, статистика пропускает
+    game_states.update(1, {"scores": {"1": 5, "2": {"baseScore": 2}}})
+    assert game_states.statistics(1)["scores"] == {"2": 2}
+    assert game_states.version(1) == 2
+    assert game_states.state_at(1) == game_states.get(1)
+
+    # Если статистика не посчиталась, состояние не меняется
+    version = game_states.version(1)
+    before = game_states.get(1)
+    with pytest.raises(AttributeError):
+        game_states.update(1, {"round": 2, "players": [2]}, removed=["scores"])
+    assert game_states.get(1) == before
+    assert game_states.version(1) == version
+    assert game_states.statistics(1)["round"] == 1
+
+def test_game_state_action_log():
+    game_states = GameStateStore(deepcopy(mock_data.game_states))
+    game_states.update(3002, {"round": 3, "nominatedPlayers": [4]})
+    game_states.set_scores(3002, {"1": {"baseScore": 1, "additionalScore": 0}})
+    game_states.update(3002, {"round": 4, "nominatedPlayers": []})
+
+    actions = game_states.actions(3002)
+    assert [a["type"] for a in actions] == ["create", "update", "scores", "update"]
+    # Раунд уже был третьим: в записи только изменившиеся поля
+    assert actions[1]["delta"] == {"nominatedPlayers": [4]}
+    assert game_states.state_at(3002, round=3)["nominatedPlayers"] == [4]
+    assert game_states.state_at(3002, seq=2)["scores"] == mock_data.game_states[1]["scores"]
+    assert game_states.state_at(3002) == game_states.get(3002)
+
+    game_states.remove(3002)
+    assert game_states.actions(3002) is None
+
+def test_game_states_load_lazily():
+    tournament = SyntheticTournament(2, 2, 3, seed=5)
+    game_states = GameStateStore([], lazy=tournament.game_states())
+    assert len(game_states) == 12 and game_states.loaded() == 0
+    assert game_states.version(7) == 1
+
+    assert game_states.peek(7) == tournament.game_state(7)
+    assert game_states.loaded() == 0
+    assert game_states.get(7) == tournament.game_state(7)
+    assert game_states.loaded() == 1 and game_states.version(7) == 1
+
+    game_states.update(8, {"round": 9})
+    assert game_states.version(8) == 2
+    assert [a["type"] for a in game_states.actions(8)] == ["create", "update"]
+    assert game_states.state_at(8, seq=1) == tournament.game_state(8)
+
+    game_states.create(9, {"gameId": 9})
+    assert game_states.version(9) == 2
+    assert game_states.remove(10)["gameId"] == 10
+    assert game_states.get(10) is None and len(game_states) == 11
+    assert len(game_states.values()) == 11 and game_states.loaded() == 11
+
+def test_entity_snapshot_restores_changed_events(store):
+    before = deepcopy(store.list_events())
+    version = store.version("event", 1001)
+    snapshot = store.snapshot()
+    store.update_game(1001, 2001, 3001, {"status": "finished"})
+    store.remove_event(1002)
+    store.add_event({"id": 1, "name": "Новое", "tables": []})
+    store.add_table(1003, {"id": 10, "games": [{"id": 100}]})
+
+    store.restore(snapshot)
+    assert store.list_events() == before
+    assert store.get_event(1) is None and store.get_game(1003, 10, 100) is None
+    assert store.get_game(1001, 2001, 3001)["status"] == "not_started"
+    assert store.get_table(1002, 2003)["id"] == 2003
+    assert [e["id"] for e in store.query_events({"status": "planned"})[0]] == [1002, 1003]
+    # Версии не откатываются, чтобы ETag не повторялись
+    assert store.version("event", 1001) > version
+
+def test_nested_snapshots(store):
+    outer = store.snapshot()
+    store.update_event(1001, {"name": "Первое"})
+    inner = store.snapshot()
+    store.update_event(1001, {"name": "Второе"})
+    store.restore(inner)
+    assert store.get_event(1001)["name"] == "Первое"
+    store.restore(outer)
+    assert store.get_event(1001)["name"] == mock_data.events[0]["name"]
+    with pytest.raises(ValueError):
+        store.restore(inner)
+
+def test_restore_keeps_outer_snapshot(store):
+    # Изменения после отката к внутреннему снимку не попадают во внешний
+    outer = store.snapshot()
+    inner = store.snapshot()
+    store.update_event(1001, {"name": "b"})
+    store.restore(inner)
+    store.update_event(1001, {"name": "c"})
+    store.restore(outer)
+    assert store.get_event(1001)["name"] == mock_data.events[0]["name"]
+
+def test_snapshot_copies_only_changed_path(store):
+    other_table = store.get_table(1001, 2002)
+    other_game = store.get_table(1001, 2001)["games"][1]
+    snapshot = store.snapshot()
+    store.update_game(1001, 2001, 3001, {"status": "finished"})
+    saved = snapshot.saved[1001][1]
+    # Изменился путь до игры, остальные столы и игры общие со снимком
+    assert store.get_event(1001) is not saved
+    assert store.get_table(1001, 2002) is other_table is saved["tables"][1]
+    assert store.get_table(1001, 2001)["games"][1] is other_game
+    assert saved["tables"][0]["games"][0]["status"] == "not_started"
+    # Повторное изменение не копирует снова
+    game = store.get_game(1001, 2001, 3001)
+    store.update_game(1001, 2001, 3001, {"status": "in_progress"})
+    assert store.get_game(1001, 2001, 3001) is game
+    store.restore(snapshot)
+    assert store.get_event(1001) is saved
+
+def test_released_snapshot_keeps_outer_copies(store):
+    outer = store.snapshot()
+    store.update_event(1001, {"name": "a"})
+    inner = store.snapshot()
+    store.update_event(1001, {"name": "b"})
+    store.release(inner)
+    # Копия из внутреннего снимка принадлежит и внешнему, она изменяется на месте
+    event = store.get_event(1001)
+    store.update_event(1001, {"name": "c"})
+    assert store.get_event(1001) is event
+    store.restore(outer)
+    assert store.get_event(1001)["name"] == mock_data.events[0]["name"]
+
+def test_game_state_snapshot_and_undo():
+    game_states = GameStateStore(deepcopy(mock_data.game_states))
+    original = game_states.get(3002)
+    snapshot = game_states.snapshot()
+    game_states.update(3002, {"round": 4})
+    game_states.set_scores(3002, {"1": {"baseScore": 1, "additionalScore": 0}})
+    game_states.remove(3004)
+    game_states.create(1, {"gameId": 1})
+
+    assert game_states.undo(3002)["scores"] == original["scores"]
+    assert game_states.undo(3002) == original
+    assert game_states.undo(3002) is None
+    assert [a["type"] for a in game_states.actions(3002)] == ["create", "update", "scores", "undo", "undo"]
+
+    game_states.restore(snapshot)
+    assert game_states.get(3002) == original and game_states.version(3002) > 1
+    assert [a["type"] for a in game_states.actions(3002)] == ["create"]
+    assert game_states.get(3004)["gameId"] == 3004
+    assert game_states.get(1) is None
+    assert game_states.statistics(3002)["round"] == original["round"]
+
+def test_game_state_restore_keeps_outer_snapshot():
+    game_states = GameStateStore(deepcopy(mock_data.game_states))
+    original = game_states.get(3002)
+    outer = game_states.snapshot()
+    inner = game_states.snapshot()
+    game_states.update(3002, {"round": 3})
+    game_states.restore(inner)
+    game_states.update(3002, {"round": 5})
+    game_states.restore(outer)
+    assert game_states.get(3002) == original
+    assert game_states.statistics(3002)["round"] == original["round"]
+
+def test_game_state_snapshot_keeps_lazy_games():
+    tournament = SyntheticTournament(1, 1, 2)
+    game_states = GameStateStore([], lazy=tournament.game_states())
+    snapshot = game_states.snapshot()
+    game_states.update(1, {"round": 9})
+    game_states.create(2, {"gameId": 2})
+    game_states.restore(snapshot)
+    assert game_states.get(1) == tournament.game_state(1) and game_states.version(1) == 3
+    # Игра, замененная до загрузки, снова загружается из lazy
+    assert game_states.loaded() == 1 and game_states.version(2) == 3
+    assert game_states.get(2) == tournament.game_state(2) and game_states.version(2) == 3
+
+def test_update_removes_fields():
+    game_states = GameStateStore(deepcopy(mock_data.game_states))
+    game_states.update(3002, {"round": 4}, ["nightKill", "note"])
+    state = game_states.get(3002)
+    assert state["round"] == 4 and "nightKill" not in state
+    assert game_states.actions(3002)[-1]["removed"] == ["nightKill"]
+    assert game_states.state_at(3002) == state
+    assert game_states.undo(3002)["nightKill"] == mock_data.game_states[1]["nightKill"]
+
+def test_transaction_rolls_back_on_error(store):
+    game_states = GameStateStore(deepcopy(mock_data.game_states))
+    original = game_states.get(3002)
+    with pytest.raises(RuntimeError):
+        with store.transaction(), game_states.transaction():
+            store.update_event(1001, {"name": "Новое"})
+            game_states.update(3002, {"round": 9})
+            raise RuntimeError
+    assert store.get_event(1001)["name"] == mock_data.events[0]["name"]
+    assert game_states.get(3002) == original
+
+    with store.transaction(), game_states.transaction():
+        store.update_event(1001, {"name": "Новое"})
+    assert store.get_event(1001)["name"] == "Новое"
+
+def test_lazy_states_from_plain_dict_are_copied():
+    source = {"gameId": 1, "round": 1, "scores": {"1": {"baseScore": 1}}}
+    game_states = GameStateStore([], lazy={1: source})
+    game_states.update(1, {"round": 2})
+    # Словарь вызывающего кода не связан ни с состоянием, ни с журналом действий
+    source["round"] = 5
+    source["scores"]["1"]["baseScore"] = 0
+    assert game_states.get(1)["scores"] == {"1": {"baseScore": 1}}
+    assert game_states.state_at(1, seq=1) == {"gameId": 1, "round": 1, "scores": {"1": {"baseScore": 1}}}